@@ -0,0 +1,4 @@
+# Description: This program keeps "from ChessVar import ChessVar" working now that the ChessVar class is
+# part of the chess_variant package, in chess_variant/chess_var.py. It gives the same names as that module.
+
+from chess_variant.chess_var import *
@@ -0,0 +1,431 @@
+# Description: This program benchmarks ChessVar and checks its move generation. The perft section counts
+# the positions reached from a set of fixed positions to a given depth, following this variant's rules
+# (no castling, en passant or promotion, and a game ends when all pieces of one type are captured), and
+# compares the counts with the reference counts below. The make_move section replays a set of recorded
+# games and measures the moves made per second. The memory section measures the bytes held per game by
+# ChessVar objects and by games in a GamePool. The batch section checks many moves at once with the
+# NumPy BoardBatch and compares its answers and speed with is_valid_move; it is skipped if NumPy is not
+# installed. The instrumentation section measures make_move before the instrumentation is enabled, while
+# it is enabled and after it is disabled again. The imports section times importing the core and the
+# heavier modules, each in a new interpreter. The concurrency section plays recorded games in a SharedGame
+# while reader threads check every snapshot they read, and compares the reads and moves per second with
+# readers that share a lock with the writer instead. The results are printed as JSON, and the program exits
+# with status 1 if any count differs from its reference count, the batch answers differ from
+# is_valid_move, the instrumentation left a ChessVar method wrapped after it was disabled, or importing
+# the core took longer than IMPORT_BUDGET or loaded a module it should only load on first use, or a
+# reader of a SharedGame saw a half-made move.
+#
+#     python benchmark.py                 # every section
+#     python benchmark.py perft --deep    # the perft section, including the slower depths
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+from chess_variant.chess_var import ChessVar, encode_move
+from chess_variant.game_pool import GamePool
+
+
+# Fixed positions, in the notation of ChessVar.to_fen, with the reference number of positions reached at
+# each depth. The deeper counts are only checked with --deep.
+REFERENCE_POSITIONS = [
+    ('start', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 000000/000000 0 0',
+     {1: 20, 2: 400, 3: 8982, 4: 201378}),
+    ('open-game', 'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w 000000/000000 2 2',
+     {1: 28, 2: 896, 3: 26696}),
+    ('middle-game', '1rb1kbnr/1p1pp3/p1p4p/5pp1/P1N1P1P1/q2PBK2/1Pn1QPBP/6NR w 100100/000000 15 15',
+     {1: 35, 2: 1074, 3: 37338}),
+    ('one-capture-from-winning', 'r2qk3/p7/8/2b1n3/8/2N1B3/P7/R2QK3 w 711100/711100 20 20',
+     {1: 39, 2: 1460, 3: 53508}),
+]
+DEEP_DEPTH = 4 # Depths from this one up are only checked with --deep
+
+# The modules timed by the imports section. The first two are the core, which must import within
+# IMPORT_BUDGET seconds without loading any of the modules the chess_variant package loads on first use.
+IMPORT_MODULES = ('ChessVar', 'chess_variant', 'chess_variant.engine', 'chess_variant.batch', 'chess_variant.server',
+                  'chess_variant.tablebase', 'chess_variant.mcts')
+CORE_MODULES = ('ChessVar', 'chess_variant')
+IMPORT_BUDGET = 0.025
+
+# The program run in a new interpreter to time one import. It prints the seconds taken and the modules
+# from the given list that were loaded.
+IMPORT_PROGRAM = '''
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps([elapsed, [name for name in {watched!r} if name in sys.modules]]))
+'''
+
+
+def perft(game, depth):
+    """Takes as parameters a ChessVar game and a depth, and returns the number of positions reached by
+    playing every sequence of moves of that length. A won game is counted as one position and is not
+    played on from. The game is searched with push and pop, so it is left as it was."""
+    if depth == 0 or game.get_game_state() != 'UNFINISHED':
+        return 1
+    if depth == 1:
+        return len(list(game.legal_moves()))
+    nodes = 0
+    for move in list(game.legal_moves()):
+        game.push(move)
+        nodes += perft(game, depth - 1)
+        game.pop()
+    return nodes
+
+
+def record_games(count, seed=0, max_plies=200):
+    """Takes as parameters the number of games to record, the random seed and the most moves a game may
+    last. The method plays random games from the starting position and returns the list of each game's moves."""
+    chooser = random.Random(seed)
+    games = []
+    for number in range(count):
+        game = ChessVar()
+        moves = []
+        while game.get_game_state() == 'UNFINISHED' and len(moves) < max_plies:
+            move = chooser.choice(sorted(game.legal_moves()))
+            game.make_move(*move)
+            moves.append(move)
+        games.append(moves)
+    return games
+
+
+def run_perft(arguments):
+    """Takes as a parameter the command line arguments and returns the results of the perft section: for
+    each reference position and depth, the positions counted, the reference count, whether they agree,
+    and the positions counted per second."""
+    results = []
+    for name, fen, expected_counts in REFERENCE_POSITIONS:
+        for depth, expected in sorted(expected_counts.items()):
+            if depth >= DEEP_DEPTH and not arguments.deep:
+                continue
+            game = ChessVar.from_fen(fen)
+            started = time.perf_counter()
+            nodes = perft(game, depth)
+            elapsed = time.perf_counter() - started
+            results.append({'position': name, 'depth': depth, 'nodes': nodes, 'expected': expected,
+                            'ok': nodes == expected, 'seconds': elapsed, 'nodes_per_second': nodes / elapsed})
+    return results
+
+
+def replay_seconds(games, repeats):
+    """Takes as parameters a list of recorded games and a number of repeats, replays the games through
+    make_move that many times, and returns the seconds taken by the fastest repeat."""
+    best = None
+    for repeat in range(repeats):
+        started = time.perf_counter()
+        for recorded in games:
+            game = ChessVar()
+            for start_square, end_square in recorded:
+                game.make_move(start_square, end_square)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_make_move(arguments):
+    """Takes as a parameter the command line arguments and returns the results of the make_move section:
+    the recorded games are replayed through make_move several times, and the best rate is reported. The
+    games are also replayed from encoded moves through make_encoded_move, which skips parsing the squares."""
+    games = record_games(arguments.games, arguments.seed)
+    moves = sum(len(moves) for moves in games)
+    best = replay_seconds(games, arguments.repeats)
+
+    encoded_games = [[encode_move(start_square, end_square) for start_square, end_square in recorded]
+                     for recorded in games]
+    best_encoded = None
+    for repeat in range(arguments.repeats):
+        started = time.perf_counter()
+        for recorded in encoded_games:
+            game = ChessVar()
+            for move in recorded:
+                game.make_encoded_move(move)
+        elapsed = time.perf_counter() - started
+        best_encoded = elapsed if best_encoded is None else min(best_encoded, elapsed)
+
+    return {'games': len(games), 'moves': moves, 'seconds': best, 'moves_per_second': moves / best,
+            'games_per_second': len(games) / best, 'encoded_moves_per_second': moves / best_encoded}
+
+
+def run_memory(arguments):
+    """Takes as a parameter the command line arguments and returns the results of the memory section: the
+    bytes allocated per game when many games are held at once, as ChessVar objects and as games in a GamePool.
+    Each game is set up in a position twenty moves into a recorded game, so its bitboards hold a real position."""
+    positions = []
+    for recorded in record_games(min(arguments.games, arguments.memory_games), arguments.seed):
+        game = ChessVar()
+        for start_square, end_square in recorded[:20]:
+            game.make_move(start_square, end_square)
+        positions.append(game.to_bytes())
+
+    count = arguments.memory_games
+    results = {'games': count}
+    for name in ('chess_var', 'game_pool'):
+        tracemalloc.start()
+        pool = GamePool()
+        games = [None] * count
+        before = tracemalloc.get_traced_memory()[0]
+        for number in range(count):
+            game = ChessVar.from_bytes(positions[number % len(positions)])
+            games[number] = game if name == 'chess_var' else pool.new_game(game)
+        game = None
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        results[name + '_bytes_per_game'] = used / count
+        del games, pool
+
+    results['game_pool_ratio'] = results['chess_var_bytes_per_game'] / results['game_pool_bytes_per_game']
+    return results
+
+
+def run_batch(arguments):
+    """Takes as a parameter the command line arguments and returns the results of the batch section. Random
+    moves, half of them starting on an occupied square, are checked on positions taken from the recorded
+    games, once one at a time with is_valid_move and once all together with BoardBatch's validate. The
+    section reports the moves checked per second by each, and whether their answers agree. It is skipped
+    if NumPy is not installed."""
+    try:
+        from chess_variant.batch import BoardBatch
+    except ImportError:
+        return {'skipped': 'NumPy is not installed', 'ok': True}
+
+    generator = random.Random(arguments.seed)
+    games = []
+    for recorded in record_games(arguments.games, arguments.seed):
+        game = ChessVar()
+        for start_square, end_square in recorded[:generator.randrange(len(recorded) + 1)]:
+            game.make_move(start_square, end_square)
+        games.append(game)
+    occupied = [[square for square in range(64) if game.get_game_board()[square // 8][square % 8] != '-']
+                for game in games]
+
+    board_indices, starts, ends = [], [], []
+    for number in range(arguments.batch_moves):
+        board_index = generator.randrange(len(games))
+        board_indices.append(board_index)
+        starts.append(generator.choice(occupied[board_index]) if number % 2 else generator.randrange(64))
+        ends.append(generator.randrange(64))
+
+    batch = BoardBatch.from_games(games)
+    best = None
+    for repeat in range(arguments.repeats):
+        started = time.perf_counter()
+        valid, captured = batch.validate(board_indices, starts, ends)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    agree = True
+    started = time.perf_counter()
+    for number in range(len(starts)):
+        start, end = starts[number], ends[number]
+        game = games[board_indices[number]]
+        if game.is_valid_move(start // 8, start % 8, end // 8, end % 8) != valid[number]:
+            agree = False
+    single = time.perf_counter() - started
+
+    return {'boards': len(games), 'moves': len(starts), 'valid_moves': int(valid.sum()),
+            'is_valid_move_per_second': len(starts) / single, 'batch_moves_per_second': len(starts) / best,
+            'speedup': single / best, 'ok': agree}
+
+
+def run_instrumentation(arguments):
+    """Takes as a parameter the command line arguments and returns the results of the instrumentation
+    section: the moves made per second by make_move before the instrumentation is enabled, while it is
+    enabled and after it is disabled, and the cost of each relative to the first. The section is ok if
+    disabling the instrumentation put back every original ChessVar method, so that the disabled cost is
+    only timing noise."""
+    from chess_variant.instrumentation import Instrumentation
+    games = record_games(arguments.games, arguments.seed)
+    moves = sum(len(moves) for moves in games)
+    originals = dict(vars(ChessVar))
+
+    never_enabled = replay_seconds(games, arguments.repeats)
+    instrumentation = Instrumentation()
+    with instrumentation:
+        enabled = replay_seconds(games, arguments.repeats)
+    disabled = replay_seconds(games, arguments.repeats)
+
+    restored = all(vars(ChessVar).get(name) is value for name, value in originals.items())
+    return {'moves': moves, 'never_enabled_moves_per_second': moves / never_enabled,
+            'enabled_moves_per_second': moves / enabled, 'disabled_moves_per_second': moves / disabled,
+            'enabled_cost': enabled / never_enabled, 'disabled_cost': disabled / never_enabled,
+            'methods_restored': restored, 'ok': restored}
+
+
+def run_imports(arguments):
+    """Takes as a parameter the command line arguments and returns the results of the imports section: the
+    fastest of several imports of each module in IMPORT_MODULES, each in a new interpreter so that nothing is
+    already loaded. The section is ok if each core module imports within IMPORT_BUDGET seconds and loads
+    none of the modules that the chess_variant package only loads on first use. The timings include
+    compiling the modules when Python isn't writing bytecode files, which the results note."""
+    from chess_variant import LAZY_NAMES
+    watched = sorted({'chess_variant.' + module for module in LAZY_NAMES.values()} | {'numpy', 'asyncio', 'random'})
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    ok = True
+    for module in IMPORT_MODULES:
+        best, loaded = None, []
+        for repeat in range(arguments.repeats):
+            program = IMPORT_PROGRAM.format(module=module, watched=watched)
+            output = subprocess.run([sys.executable, '-c', program], cwd=directory, capture_output=True, text=True)
+            if output.returncode != 0: # An optional module whose dependency is not installed
+                best, loaded = None, output.stderr.strip().splitlines()[-1:]
+                break
+            elapsed, loaded = json.loads(output.stdout)
+            best = elapsed if best is None else min(best, elapsed)
+        results[module] = {'milliseconds': None if best is None else best * 1000, 'loaded': loaded}
+        if module in CORE_MODULES:
+            within_budget = best is not None and best <= IMPORT_BUDGET and not loaded
+            results[module]['within_budget'] = within_budget
+            ok = ok and within_budget
+    return {'modules': results, 'budget_milliseconds': IMPORT_BUDGET * 1000,
+            'writes_bytecode': not sys.dont_write_bytecode, 'ok': ok}
+
+
+def run_readers(games, readers, read):
+    """Takes as parameters a list of recorded games, the number of reader threads and a function that a
+    reader calls over and over with the game being played, returning False if what it read was not
+    consistent. The games are played in this thread through the game's make_move while the readers run, with
+    Python switching threads far more often than usual so that reads land in the middle of moves. The method
+    returns a tuple of the moves made, the reads, the inconsistent reads and the seconds the moves took."""
+    current = [None]
+    stopping = threading.Event()
+    totals = []
+
+    def reader():
+        reads = inconsistent = 0
+        while not stopping.is_set():
+            game = current[0]
+            try:
+                consistent = read(game)
+            except (KeyError, TypeError): # The board was read with a piece half moved
+                consistent = False
+            reads += 1
+            inconsistent += not consistent
+        totals.append((reads, inconsistent))
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    threads = [threading.Thread(target=reader) for number in range(readers)]
+    moves = 0
+    try:
+        current[0] = games[0][0]
+        for thread in threads:
+            thread.start()
+        started = time.perf_counter()
+        for game, recorded in games:
+            current[0] = game
+            for start_square, end_square in recorded:
+                game.make_move(start_square, end_square)
+                moves += 1
+        elapsed = time.perf_counter() - started
+    finally:
+        stopping.set()
+        for thread in threads:
+            thread.join()
+        sys.setswitchinterval(switch_interval)
+    return moves, sum(reads for reads, inconsistent in totals), sum(inconsistent for reads, inconsistent in totals), elapsed
+
+
+class LockedGame:
+    """A class representing the simplest way to share a ChessVar game: one lock, taken by the writer for each
+    move and by the readers for each read. The concurrency section compares it with SharedGame."""
+    def __init__(self):
+        """Takes no parameters and initializes a new game and its lock."""
+        self.game = ChessVar()
+        self.lock = threading.Lock()
+
+    def make_move(self, start_square, end_square):
+        """Takes as parameters the squares of a move and makes it while holding the lock."""
+        with self.lock:
+            return self.game.make_move(start_square, end_square)
+
+
+def run_concurrency(arguments):
+    """Takes as a parameter the command line arguments and returns the results of the concurrency section.
+    The recorded games are played while reader threads read the game being played: first with no readers,
+    then through SharedGame snapshots, then with the readers taking a lock shared with the writer, and last
+    from a bare ChessVar with no protection. Each snapshot read checks that the pieces and capture counts
+    agree and that versions never go backwards. The section reports the moves per second of the writer and
+    the reads per second of the readers in each mode, and is ok if no snapshot read was inconsistent. The
+    bare ChessVar's inconsistent reads show what the snapshots prevent."""
+    from chess_variant.shared_game import SharedGame, is_consistent
+    recorded_games = record_games(arguments.concurrency_games, arguments.seed)
+    readers = arguments.reader_threads
+    results = {'readers': readers}
+
+    def snapshot_read(shared):
+        snapshot = shared.snapshot()
+        last = versions.get(threading.get_ident(), (None, -1))
+        versions[threading.get_ident()] = (shared, snapshot.get_version())
+        if last[0] is shared and snapshot.get_version() < last[1]:
+            return False # The version went backwards
+        return snapshot.is_consistent() and snapshot.get_version() == \
+            snapshot.get_white_turn_count() + snapshot.get_black_turn_count()
+
+    def locked_read(locked):
+        with locked.lock:
+            return is_consistent(locked.game)
+
+    versions = {}
+    modes = (('no_readers', SharedGame, 0, None), ('snapshots', SharedGame, readers, snapshot_read),
+             ('locked', LockedGame, readers, locked_read), ('unprotected', ChessVar, readers, is_consistent))
+    for name, make_game, reader_count, read in modes:
+        games = [(make_game(), recorded) for recorded in recorded_games]
+        moves, reads, inconsistent, elapsed = run_readers(games, reader_count, read)
+        results[name] = {'moves_per_second': moves / elapsed, 'reads_per_second': reads / elapsed,
+                         'inconsistent_reads': inconsistent}
+    results['ok'] = results['snapshots']['inconsistent_reads'] == 0
+    return results
+
+
+# The sections of the benchmark, in the order they run.
+SECTIONS = {
+    'perft': run_perft,
+    'make_move': run_make_move,
+    'memory': run_memory,
+    'batch': run_batch,
+    'instrumentation': run_instrumentation,
+    'imports': run_imports,
+    'concurrency': run_concurrency,
+}
+
+
+def main():
+    """Takes no parameters and runs the benchmark sections named on the command line, or all of them,
+    printing the results as JSON. The exit status is 1 if a perft count differs from its reference, the
+    batch answers differ from is_valid_move, the instrumentation left a method wrapped or the core imports
+    too slowly or a SharedGame reader saw a half-made move."""
+    parser = argparse.ArgumentParser(description='Benchmark and check ChessVar move generation.')
+    parser.add_argument('sections', nargs='*', help='sections to run: ' + ', '.join(SECTIONS) + ' (default: all)')
+    parser.add_argument('--deep', action='store_true', help='also check the slower perft depths')
+    parser.add_argument('--games', type=int, default=200, help='recorded games replayed by the make_move section')
+    parser.add_argument('--repeats', type=int, default=3, help='times each timed section is repeated')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the recorded games')
+    parser.add_argument('--memory-games', type=int, default=10000, help='games held at once by the memory section')
+    parser.add_argument('--batch-moves', type=int, default=200000, help='moves checked by the batch section')
+    parser.add_argument('--concurrency-games', type=int, default=40, help='games played by the concurrency section')
+    parser.add_argument('--reader-threads', type=int, default=4, help='reader threads in the concurrency section')
+    arguments = parser.parse_args()
+    for name in arguments.sections:
+        if name not in SECTIONS:
+            parser.error('unknown section ' + repr(name))
+
+    output = {'python': platform.python_version(), 'implementation': platform.python_implementation()}
+    for name in arguments.sections or SECTIONS:
+        output[name] = SECTIONS[name](arguments)
+    output['ok'] = all(result['ok'] for result in output.get('perft', [])) and \
+        all(output[name]['ok'] for name in ('batch', 'instrumentation', 'imports', 'concurrency') if name in output)
+    print(json.dumps(output, indent=2))
+    return 0 if output['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+# Description: This program runs the command line of chess_variant/book.py, which builds and probes opening
+# books, so that python book.py keeps working now that the module is part of the chess_variant package. It
+# takes the same arguments as python -m chess_variant.book.
+
+import sys
+
+from chess_variant.book import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
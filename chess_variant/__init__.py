@@ -0,0 +1,62 @@
+# Description: This package holds the ChessVar game and the modules built on it, and imports quickly.
+# Importing it loads only the core: the ChessVar class, its move encoding and the attack tables, which are
+# read from their cache file. Everything else, such as the search engine, the NumPy batch checks, the game
+# server and the tablebases, is loaded from its module the first time one of its names is used, so a
+# short-lived process that only checks moves never pays for imports it doesn't use. The programs with a
+# command line can be run as modules, as in python -m chess_variant.tablebase, or through the scripts of
+# the same names at the top of the repository.
+#
+#     import chess_variant
+#     game = chess_variant.ChessVar()        # the core, already loaded
+#     engine = chess_variant.Engine()        # imports chess_variant/engine.py now
+
+import importlib
+
+from .chess_var import (MOVE_LIMIT, PIECES, SQUARE_INDEX, SQUARE_NAMES, STARTING_COUNTS, ChessVar,
+                        TranspositionTable, decode_move, encode_move)
+
+
+# The module each lazily loaded name is imported from on first use.
+LAZY_NAMES = {
+    'Engine': 'engine',
+    'SearchResult': 'engine',
+    'evaluate': 'engine',
+    'BoardBatch': 'batch',
+    'GameServer': 'server',
+    'LoadClient': 'server',
+    'Tablebase': 'tablebase',
+    'ResultCache': 'result_cache',
+    'BookBuilder': 'book',
+    'OpeningBook': 'book',
+    'MonteCarloPlayer': 'mcts',
+    'ColumnarWriter': 'columnar',
+    'ColumnarReader': 'columnar',
+    'Instrumentation': 'instrumentation',
+    'SamplingProfiler': 'instrumentation',
+    'GamePool': 'game_pool',
+    'SharedGame': 'shared_game',
+    'parallel_search': 'parallel',
+    'batch_self_play': 'parallel',
+    'replay_game': 'replay',
+    'replay_lines': 'replay',
+}
+
+__all__ = ['MOVE_LIMIT', 'PIECES', 'SQUARE_INDEX', 'SQUARE_NAMES', 'STARTING_COUNTS', 'ChessVar',
+           'TranspositionTable', 'decode_move', 'encode_move'] + list(LAZY_NAMES)
+
+
+def __getattr__(name):
+    """Takes as a parameter a name that isn't yet loaded in the package, imports the module it comes from and
+    returns it. The name is then kept in the package, so it is only looked up once. A name the package
+    doesn't have raises AttributeError."""
+    module_name = LAZY_NAMES.get(name)
+    if module_name is None:
+        raise AttributeError('module ' + repr(__name__) + ' has no attribute ' + repr(name))
+    value = getattr(importlib.import_module('.' + module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """Takes no parameters and returns the names of the package, including those not yet loaded."""
+    return sorted(set(globals()) | set(LAZY_NAMES))
@@ -0,0 +1,142 @@
+# Description: This program builds the attack and ray tables used by the ChessVar bitboards. The tables
+# give for each square the bitboard of the squares a knight, king or pawn on it attacks, the rays running
+# from it in each of the eight directions, and the squares between it and every other square on the same
+# line. The attacks of the rook, bishop and queen are found from the rays: the first occupied square on
+# each ray stops the ray, which is one table lookup and a bit scan rather than a walk along the board.
+# The built tables are cached on disk by table_cache, so later imports read them instead of building them again.
+
+from .table_cache import load_tables
+
+# The (row, column) steps of the eight directions. The first four increase the bit position of the
+# square, so the nearest square on a ray in one of them is its lowest set bit, and the nearest square
+# in one of the last four is its highest set bit.
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1), (-1, 0), (0, -1), (-1, -1), (-1, 1))
+ROOK_DIRECTIONS = (0, 1, 4, 5)
+BISHOP_DIRECTIONS = (2, 3, 6, 7)
+
+KNIGHT_OFFSETS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_OFFSETS = DIRECTIONS
+
+
+def _offset_attacks(offsets):
+    """Takes as a parameter a list of (row, column) steps and returns a list holding, for each square,
+    the bitboard of the squares one step away that are on the board."""
+    attacks = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        bitboard = 0
+        for row_step, col_step in offsets:
+            if 0 <= row + row_step < 8 and 0 <= col + col_step < 8:
+                bitboard |= 1 << ((row + row_step) * 8 + col + col_step)
+        attacks.append(bitboard)
+    return attacks
+
+
+def _rays():
+    """Takes no parameters and returns a list holding, for each direction, a list of the bitboard of the
+    squares from each square to the edge of the board in that direction, not counting the square itself."""
+    rays = []
+    for row_step, col_step in DIRECTIONS:
+        direction_rays = []
+        for square in range(64):
+            row, col = divmod(square, 8)
+            bitboard = 0
+            row, col = row + row_step, col + col_step
+            while 0 <= row < 8 and 0 <= col < 8:
+                bitboard |= 1 << (row * 8 + col)
+                row, col = row + row_step, col + col_step
+            direction_rays.append(bitboard)
+        rays.append(direction_rays)
+    return rays
+
+
+def _between(rays):
+    """Takes as a parameter the rays of each direction and returns a 64 by 64 list of the bitboard of the
+    squares strictly between each pair of squares."""
+    between = [[0] * 64 for square in range(64)]
+    for direction_rays in rays:
+        for start in range(64):
+            remaining = direction_rays[start]
+            while remaining:
+                lowest_bit = remaining & -remaining
+                remaining ^= lowest_bit
+                end = lowest_bit.bit_length() - 1
+                # The ray from the start includes the end and the squares past it, which are the ray from the end.
+                between[start][end] = direction_rays[start] ^ direction_rays[end] ^ lowest_bit
+    return between
+
+
+def _sources(*tables):
+    """Takes as parameters any number of tables of bitboards indexed by square, and returns a list holding,
+    for each square, the bitboard of the squares whose entry in one of the tables includes it."""
+    sources = [0] * 64
+    for table in tables:
+        for square, targets in enumerate(table):
+            while targets:
+                lowest_bit = targets & -targets
+                targets ^= lowest_bit
+                sources[lowest_bit.bit_length() - 1] |= 1 << square
+    return sources
+
+
+def _build_tables():
+    """Takes no parameters and builds the tables, returning them as a tuple in the order they are unpacked
+    below."""
+    pawn_attacks = (_offset_attacks(((1, -1), (1, 1))), _offset_attacks(((-1, -1), (-1, 1))))
+    pawn_pushes = (_offset_attacks(((1, 0),)), _offset_attacks(((-1, 0),)))
+    pawn_double_pushes = ([1 << (square + 16) if 8 <= square < 16 else 0 for square in range(64)],
+                          [1 << (square - 16) if 48 <= square < 56 else 0 for square in range(64)])
+    pawn_sources = tuple(_sources(pawn_pushes[side], pawn_double_pushes[side], pawn_attacks[side]) for side in (0, 1))
+    rays = _rays()
+    return (_offset_attacks(KNIGHT_OFFSETS), _offset_attacks(KING_OFFSETS), pawn_attacks, pawn_pushes,
+            pawn_double_pushes, pawn_sources, rays, _between(rays))
+
+
+# The tables are read from a cache file when the module hasn't changed since they were last built.
+# Pawn tables are indexed first by player (0 for white, whose pawns move up the board, and 1 for black).
+# A pawn on the last row of the board has no moves, since there is no pawn promotion.
+# PAWN_SOURCES[player][square] is the bitboard of the squares from which a pawn of the player could move
+# to or capture on the square, so that a change on the square can only change the moves of those pawns.
+# BETWEEN[start][end] is the bitboard of the squares strictly between two squares on the same rank, file
+# or diagonal, and 0 for two squares that are not on a line.
+(KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, PAWN_PUSHES, PAWN_DOUBLE_PUSHES, PAWN_SOURCES, RAYS,
+ BETWEEN) = load_tables(__file__, 'attack_tables', _build_tables)
+
+ROOK_LINES = [RAYS[0][square] | RAYS[1][square] | RAYS[4][square] | RAYS[5][square] for square in range(64)]
+BISHOP_LINES = [RAYS[2][square] | RAYS[3][square] | RAYS[6][square] | RAYS[7][square] for square in range(64)]
+
+
+def sliding_attacks(square, occupied, directions):
+    """Takes as parameters the bit position of a square, the bitboard of occupied squares and the
+    directions a piece slides in, and returns the bitboard of the squares the piece attacks. Each ray
+    stops at, and includes, the first occupied square on it."""
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            if direction < 4:
+                nearest = (blockers & -blockers).bit_length() - 1
+            else:
+                nearest = blockers.bit_length() - 1
+            ray ^= RAYS[direction][nearest] # The squares past the nearest blocker are taken off the ray
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(square, occupied):
+    """Takes as parameters the bit position of a square and the bitboard of occupied squares, and returns
+    the bitboard of the squares a rook on the square attacks."""
+    return sliding_attacks(square, occupied, ROOK_DIRECTIONS)
+
+
+def bishop_attacks(square, occupied):
+    """Takes as parameters the bit position of a square and the bitboard of occupied squares, and returns
+    the bitboard of the squares a bishop on the square attacks."""
+    return sliding_attacks(square, occupied, BISHOP_DIRECTIONS)
+
+
+def queen_attacks(square, occupied):
+    """Takes as parameters the bit position of a square and the bitboard of occupied squares, and returns
+    the bitboard of the squares a queen on the square attacks."""
+    return sliding_attacks(square, occupied, ROOK_DIRECTIONS) | sliding_attacks(square, occupied, BISHOP_DIRECTIONS)
@@ -0,0 +1,144 @@
+# Description: This program creates a BoardBatch class, which holds many ChessVar game boards in one NumPy
+# array and checks many moves on them at once. Each board is an 8 by 8 array of int8 piece codes, with the
+# first row being rank 1 as in ChessVar's game board: 0 for a vacant square, 1 to 6 for a white pawn,
+# knight, bishop, rook, queen and king, and -1 to -6 for the black pieces. A move is checked with array
+# operations across the whole batch, following the same rules as ChessVar's is_valid_move, including
+# which captures are allowed and, optionally, counting the captured pieces. This module needs NumPy.
+
+import numpy as np
+
+from .chess_var import PIECES, SQUARE_INDEX
+
+
+# The int8 code of each game piece.
+PIECE_CODES = {piece: (index % 6 + 1) * (1 if index < 6 else -1) for index, piece in enumerate(PIECES)}
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+
+
+def board_to_array(board):
+    """Takes as a parameter a game board, a list of eight rows of game pieces as returned by ChessVar's
+    get_game_board method, and returns it as an 8 by 8 int8 array of piece codes."""
+    return np.array([[PIECE_CODES.get(piece, 0) for piece in row] for row in board], dtype=np.int8)
+
+
+def square_indices(squares):
+    """Takes as a parameter a sequence of squares in algebraic notation and returns an int64 array of
+    their bit positions (row * 8 + column). A square that is not on the board becomes -1."""
+    return np.array([SQUARE_INDEX.get(square, -1) for square in squares], dtype=np.int64)
+
+
+def capture_column(captured):
+    """Takes as a parameter an array of captured piece codes (none of them 0) and returns the index of each
+    in PIECES, which is its column in the capture counts."""
+    return np.where(captured > 0, captured - 1, 5 - captured).astype(np.int64)
+
+
+class BoardBatch:
+    """A class representing a batch of game boards held in one (N, 8, 8) int8 NumPy array, together with
+    an (N, 12) array of capture counts in the order of PIECES."""
+    def __init__(self, boards, capture_counts=None):
+        """Takes as parameters an array-like of shape (N, 8, 8) holding piece codes, and an optional array-like
+        of shape (N, 12) holding the capture counts of each board, which start at 0 if not given."""
+        self.__boards = np.ascontiguousarray(boards, dtype=np.int8)
+        if self.__boards.ndim != 3 or self.__boards.shape[1:] != (8, 8):
+            raise ValueError('expected boards of shape (N, 8, 8), not ' + str(self.__boards.shape))
+        if capture_counts is None:
+            self.__capture_counts = np.zeros((len(self.__boards), len(PIECES)), dtype=np.int64)
+        else:
+            self.__capture_counts = np.array(capture_counts, dtype=np.int64).reshape(len(self.__boards), len(PIECES))
+
+    @classmethod
+    def from_games(cls, games):
+        """Takes as a parameter a sequence of ChessVar games and returns a BoardBatch holding their boards and
+        capture counts."""
+        boards = np.stack([board_to_array(game.get_game_board()) for game in games]) if games else \
+            np.zeros((0, 8, 8), dtype=np.int8)
+        counts = [[game.get_capture_counts()[piece] for piece in PIECES] for game in games]
+        return cls(boards, counts if games else None)
+
+    def __len__(self):
+        """Takes no parameters and returns the number of boards in the batch."""
+        return len(self.__boards)
+
+    def get_boards(self):
+        """Takes no parameters and returns the boards data member, the (N, 8, 8) int8 array of piece codes."""
+        return self.__boards
+
+    def get_capture_counts(self):
+        """Takes no parameters and returns the capture_counts data member, the (N, 12) array of capture counts."""
+        return self.__capture_counts
+
+    def validate(self, board_indices, starts, ends, update_captures=False):
+        """Takes as parameters equal-length arrays of board indices, starting squares and ending squares, each
+        square given as its bit position (row * 8 + column), and whether to count captured pieces. The method
+        checks every move at once with the rules of ChessVar's is_valid_move, and returns a tuple of a bool
+        array that is True for each valid move and an int8 array of the code of the piece each valid move
+        captures (0 if it captures nothing). With update_captures, the capture counts of the boards are
+        increased for each captured piece, as make_move does when it makes a capture."""
+        board_indices = np.asarray(board_indices, dtype=np.int64)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+
+        # Moves with a square off the board, or a board not in the batch, are invalid. Their indices are
+        # clipped so that the lookups below stay in bounds.
+        in_range = (starts >= 0) & (starts < 64) & (ends >= 0) & (ends < 64) & \
+            (board_indices >= 0) & (board_indices < len(self.__boards))
+        starts = np.where(in_range, starts, 0)
+        ends = np.where(in_range, ends, 0)
+        board_indices = np.where(in_range, board_indices, 0)
+
+        squares = self.__boards.reshape(len(self.__boards), 64)
+        game_piece = squares[board_indices, starts].astype(np.int64)
+        target = squares[board_indices, ends].astype(np.int64)
+        color = np.sign(game_piece) # 1 for a white piece, -1 for a black piece and 0 for a vacant square
+        kind = np.abs(game_piece)
+
+        start_row, start_col = starts // 8, starts % 8
+        row_change = ends // 8 - start_row
+        col_change = ends % 8 - start_col
+        row_distance, col_distance = np.abs(row_change), np.abs(col_change)
+
+        # The starting square must hold a piece, and a piece can't land on one of its own player's pieces.
+        valid = in_range & (color != 0) & (np.sign(target) != color)
+        opponent_target = target * color < 0
+
+        # The pawn moves up one square onto a vacant square, or two squares from its starting row (the square
+        # it passes over is not checked), and captures diagonally.
+        pawn_row = np.where(color > 0, 1, 6)
+        pawn_push = (col_change == 0) & (target == 0) & \
+            ((row_change == color) | ((row_change == 2 * color) & (start_row == pawn_row)))
+        pawn_capture = (col_distance == 1) & (row_change == color) & opponent_target
+        pawn_move = pawn_push | pawn_capture
+
+        knight_move = ((row_distance == 1) & (col_distance == 2)) | ((row_distance == 2) & (col_distance == 1))
+        king_move = (row_distance <= 1) & (col_distance <= 1)
+
+        straight = (row_change == 0) | (col_change == 0)
+        diagonal = row_distance == col_distance
+        sliding_piece = (kind == BISHOP) | (kind == ROOK) | (kind == QUEEN)
+        on_line = np.where(kind == ROOK, straight, np.where(kind == BISHOP, diagonal, straight | diagonal))
+
+        # The squares between the starting and ending square are checked one step at a time, for every
+        # move at once. A sliding move passes over at most six squares.
+        distance = np.maximum(row_distance, col_distance)
+        row_step, col_step = np.sign(row_change), np.sign(col_change)
+        blocked = np.zeros(len(starts), dtype=bool)
+        checking = sliding_piece & on_line & valid
+        for step in range(1, 7):
+            passing = checking & (step < distance)
+            if not passing.any():
+                break
+            passed = np.clip((start_row + step * row_step) * 8 + start_col + step * col_step, 0, 63)
+            blocked |= passing & (squares[board_indices, passed] != 0)
+        sliding_move = on_line & ~blocked
+
+        valid &= np.select([kind == PAWN, kind == KNIGHT, kind == KING, sliding_piece],
+                           [pawn_move, knight_move, king_move, sliding_move], default=False)
+        captured = np.where(valid & opponent_target, target, 0).astype(np.int8)
+
+        if update_captures:
+            capturing = captured != 0
+            np.add.at(self.__capture_counts, (board_indices[capturing], capture_column(captured[capturing])), 1)
+
+        return valid, captured
@@ -0,0 +1,362 @@
+# Description: This program builds an opening book from archived ChessVar games and looks positions up in
+# it. The games are merged into one graph of positions keyed on ChessVar's Zobrist position hash, so a
+# position reached by different move orders is one entry, and each move from a position records the number
+# of games that played it and how many of them white and black won. Games are read one line at a time and
+# their moves are counted in memory only until a set number of records is held; the records are then sorted
+# and written to a run file, and the run files are merged at the end, so the games never need to fit in
+# memory. Games share their opening moves, so the moves from each position already reached are remembered,
+# with a copy of the game they lead to, and a game is only replayed through make_move from the first move
+# that isn't remembered. The book file is a short header followed by fixed-size records sorted by position
+# hash and move, which is read through a memory map and searched by bisection.
+#
+#     python book.py build games.log --book opening.book --plies 20
+#     python book.py probe opening.book e2e4e7e5
+
+import argparse
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+from .chess_var import MOVE_LIMIT, ChessVar, decode_move, encode_move
+from .replay import is_game_line, parse_game
+
+
+# The header of the file: a magic string, the format version, the size of a record and the number of records.
+HEADER_FORMAT = '<4sHHQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAGIC = b'CVBK'
+VERSION = 1
+
+# A record: the position hash, the move (encoded by ChessVar's encode_move), the number of games that
+# played the move from the position, and how many of them the white and the black player won.
+RECORD_FORMAT = '<QHIII'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+RECORD = struct.Struct(RECORD_FORMAT)
+
+DEFAULT_PLIES = 20 # Moves from the start of each game that go in the book
+DEFAULT_MEMORY_RECORDS = 1 << 20 # Records counted in memory before they are written to a run file
+DEFAULT_CACHE_SIZE = 1 << 16 # Moves remembered with the game they lead to, a few hundred bytes each
+READ_RECORDS = 4096 # Records read from a run file at a time while merging
+
+BookMove = namedtuple('BookMove', ['move', 'games', 'white_wins', 'black_wins'])
+
+
+def read_runs(path):
+    """Takes as a parameter the path of a run file and yields its records in order, each as a tuple of the
+    combined key (the position hash times MOVE_LIMIT plus the move) and the games, white wins and black wins."""
+    with open(path, 'rb') as run_file:
+        while True:
+            block = run_file.read(RECORD_SIZE * READ_RECORDS)
+            if not block:
+                return
+            for position_hash, move, games, white_wins, black_wins in RECORD.iter_unpack(block):
+                yield position_hash * MOVE_LIMIT + move, games, white_wins, black_wins
+
+
+def write_records(path, records):
+    """Takes as parameters a file path and an iterable of records in key order, each a tuple of the combined
+    key, games, white wins and black wins, and writes them as a book file. The header is written last, once
+    the number of records is known. The method returns the number of records and of distinct positions."""
+    count, positions, last_hash = 0, 0, None
+    with open(path, 'wb') as book_file:
+        book_file.write(bytes(HEADER_SIZE))
+        for key, games, white_wins, black_wins in records:
+            position_hash = key // MOVE_LIMIT
+            book_file.write(RECORD.pack(position_hash, key % MOVE_LIMIT, games, white_wins, black_wins))
+            count += 1
+            if position_hash != last_hash:
+                positions += 1
+                last_hash = position_hash
+        book_file.seek(0)
+        book_file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, RECORD_SIZE, count))
+    return count, positions
+
+
+def merge_records(runs):
+    """Takes as a parameter a list of iterables of records, each in key order, and yields their records in key
+    order with the counts of records that share a key added together."""
+    current = None
+    for key, games, white_wins, black_wins in heapq.merge(*runs):
+        if current is not None and current[0] == key:
+            current[1] += games
+            current[2] += white_wins
+            current[3] += black_wins
+            continue
+        if current is not None:
+            yield tuple(current)
+        current = [key, games, white_wins, black_wins]
+    if current is not None:
+        yield tuple(current)
+
+
+class BookBuilder:
+    """A class representing the builder of an opening book. Games are added one at a time, and finish writes
+    the book file. The builder's memory is bounded by the number of records it counts before writing a run
+    file and by the number of moves it remembers, however many games are added."""
+    def __init__(self, path, plies=DEFAULT_PLIES, memory_records=DEFAULT_MEMORY_RECORDS,
+                 cache_size=DEFAULT_CACHE_SIZE):
+        """Takes as parameters the path of the book file to write, the number of moves from the start of each
+        game that go in the book, the most records to count in memory before writing a run file, and the
+        most moves to remember with the positions they lead to. The run files are kept in a temporary
+        directory next to the book file."""
+        self.__path = path
+        self.__plies = plies
+        self.__memory_records = memory_records
+        self.__cache_size = cache_size
+        self.__counts = {} # The games, white wins and black wins of each combined key not yet in a run file
+        self.__moves = {} # The game that each (position hash, move) pair leads to, never changed once stored
+        self.__runs = []
+        self.__run_directory = tempfile.mkdtemp(prefix='book-runs-', dir=os.path.dirname(os.path.abspath(path)))
+        self.__start = ChessVar()
+        self.__statistics = {'games': 0, 'skipped': 0, 'replayed_moves': 0, 'remembered_moves': 0}
+
+    def __enter__(self):
+        """Takes no parameters and returns the builder, for use in a with statement."""
+        return self
+
+    def __exit__(self, *exception):
+        """Takes the exception details of the with statement and removes the run files. The book is only
+        written by finish, so a builder left by an exception writes nothing."""
+        self.close()
+
+    def get_statistics(self):
+        """Takes no parameters and returns a dictionary of the games added, the games skipped because they
+        held an illegal move, the moves replayed through make_move and the moves found among the remembered ones."""
+        return dict(self.__statistics)
+
+    def add_moves(self, moves):
+        """Takes as parameters the moves of a game, each a tuple of the starting square and ending square in
+        algebraic notation. The game is played to its end to find its result, and the moves of its first
+        plies are counted with the result. A move from a position the game has already reached is counted
+        once, so repeating a position doesn't count the game twice. A game holding a move that is not legal
+        is skipped. The method returns the game's final state, or None if it was skipped."""
+        try:
+            encoded = [encode_move(start_square, end_square) for start_square, end_square in moves]
+        except ValueError:
+            self.__statistics['skipped'] += 1
+            return None
+
+        remembered = self.__moves
+        reached = self.__start # The remembered game in the position reached so far
+        game = None # Copied from the remembered game at the first move that isn't remembered
+        keys = []
+        for ply, move in enumerate(encoded):
+            in_book = ply < self.__plies
+            if game is None:
+                position_hash = reached.get_position_hash()
+                following = remembered.get((position_hash, move)) if in_book else None
+                if following is not None:
+                    keys.append(position_hash * MOVE_LIMIT + move)
+                    reached = following
+                    self.__statistics['remembered_moves'] += 1
+                    continue
+                game = reached.copy()
+            position_hash = game.get_position_hash()
+            if not game.make_encoded_move(move):
+                self.__statistics['skipped'] += 1
+                return None
+            self.__statistics['replayed_moves'] += 1
+            if in_book:
+                keys.append(position_hash * MOVE_LIMIT + move)
+                if len(remembered) < self.__cache_size:
+                    remembered[(position_hash, move)] = game.copy()
+
+        if game is None: # Every move was remembered
+            game = reached
+        game_state = game.get_game_state()
+        white_win = 1 if game_state == 'WHITE_WON' else 0
+        black_win = 1 if game_state == 'BLACK_WON' else 0
+        counts = self.__counts
+        for key in set(keys):
+            entry = counts.get(key)
+            if entry is None:
+                counts[key] = [1, white_win, black_win]
+            else:
+                entry[0] += 1
+                entry[1] += white_win
+                entry[2] += black_win
+        self.__statistics['games'] += 1
+        if len(counts) >= self.__memory_records:
+            self.__write_run()
+        return game_state
+
+    def add_log(self, lines):
+        """Takes as a parameter an iterable of game log lines, in a format read by replay.py, and adds each
+        game in turn, skipping blank lines and comments. A line that can't be parsed is skipped. The method
+        returns the number of games added."""
+        added = 0
+        for line in lines:
+            if not is_game_line(line):
+                continue
+            try:
+                moves = parse_game(line)
+            except ValueError:
+                self.__statistics['skipped'] += 1
+                continue
+            if self.add_moves(moves) is not None:
+                added += 1
+        return added
+
+    def finish(self):
+        """Takes no parameters, merges the run files and the records still in memory into the book file, and
+        removes the run files. The book is written under a temporary name and renamed when it is complete.
+        The method returns the builder's statistics with the number of records and positions in the book."""
+        self.__write_run()
+        temporary_path = self.__path + '.tmp'
+        records, positions = write_records(temporary_path, merge_records([read_runs(run) for run in self.__runs]))
+        os.replace(temporary_path, self.__path)
+        self.close()
+        statistics = self.get_statistics()
+        statistics.update(records=records, positions=positions, runs=len(self.__runs))
+        return statistics
+
+    def close(self):
+        """Takes no parameters and removes the run files and their directory, and the partly written book
+        file left if finish failed."""
+        shutil.rmtree(self.__run_directory, ignore_errors=True)
+        try:
+            os.remove(self.__path + '.tmp')
+        except FileNotFoundError: # Finish renamed it, or never started writing it
+            pass
+
+    def __write_run(self):
+        """Takes no parameters and writes the records counted in memory to a new run file, sorted by key,
+        then empties the counts."""
+        if not self.__counts:
+            return
+        path = os.path.join(self.__run_directory, 'run_%06d' % len(self.__runs))
+        with open(path, 'wb') as run_file:
+            for key in sorted(self.__counts):
+                games, white_wins, black_wins = self.__counts[key]
+                run_file.write(RECORD.pack(key // MOVE_LIMIT, key % MOVE_LIMIT, games, white_wins, black_wins))
+        self.__runs.append(path)
+        self.__counts = {}
+
+
+class OpeningBook:
+    """A class representing an opening book file opened through a memory map. Looking up a position reads
+    only the pages its bisection touches, so opening and probing the book take about the same time however
+    large it is."""
+    def __init__(self, path):
+        """Takes as a parameter the path of a book file made by BookBuilder and opens it. A file that is not
+        an opening book raises ValueError."""
+        self.__path = path
+        with open(path, 'rb') as book_file:
+            header = book_file.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE:
+                raise ValueError(path + ' is not an opening book')
+            magic, version, record_size, count = struct.unpack(HEADER_FORMAT, header)
+            if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+                raise ValueError(path + ' is not an opening book of version ' + str(VERSION))
+            if os.fstat(book_file.fileno()).st_size < HEADER_SIZE + count * RECORD_SIZE:
+                raise ValueError(path + ' is shorter than its header says')
+            self.__map = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+        self.__count = count
+
+    def __len__(self):
+        """Takes no parameters and returns the number of records, one for each move from each position."""
+        return self.__count
+
+    def __enter__(self):
+        """Takes no parameters and returns the book, for use in a with statement."""
+        return self
+
+    def __exit__(self, *exception):
+        """Takes the exception details of the with statement and closes the book."""
+        self.close()
+
+    def close(self):
+        """Takes no parameters and closes the memory map."""
+        if self.__map is not None and not self.__map.closed:
+            self.__map.close()
+
+    def probe(self, position_hash):
+        """Takes as a parameter the hash of a position and returns the list of BookMoves recorded from it,
+        each holding the move as a tuple of the starting square and ending square, the games that played it
+        and the white and black wins among them. A position not in the book gives an empty list."""
+        low, high = 0, self.__count
+        while low < high: # Finds the first record of the position
+            middle = (low + high) // 2
+            if struct.unpack_from('<Q', self.__map, HEADER_SIZE + middle * RECORD_SIZE)[0] < position_hash:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        while low < self.__count:
+            stored_hash, move, games, white_wins, black_wins = RECORD.unpack_from(self.__map, HEADER_SIZE + low * RECORD_SIZE)
+            if stored_hash != position_hash:
+                break
+            moves.append(BookMove(decode_move(move), games, white_wins, black_wins))
+            low += 1
+        return moves
+
+    def probe_game(self, game):
+        """Takes as a parameter a ChessVar game and returns the BookMoves recorded from its position."""
+        return self.probe(game.get_position_hash())
+
+    def choose_move(self, game, min_games=1):
+        """Takes as parameters a ChessVar game and the fewest games a move must have been played in, and
+        returns the book move with the best score for the current player, counting a win as 1 and any other
+        result as half, or None if the book has no such move for the position."""
+        best_move, best_score = None, None
+        for book_move in self.probe_game(game):
+            if book_move.games < min_games:
+                continue
+            wins, losses = book_move.white_wins, book_move.black_wins
+            if game.get_current_player() == 'Black':
+                wins, losses = losses, wins
+            score = (wins + (book_move.games - wins - losses) / 2) / book_move.games
+            if best_score is None or score > best_score:
+                best_move, best_score = book_move.move, score
+        return best_move
+
+
+def main():
+    """Takes no parameters and builds a book or probes one, as given on the command line, printing the
+    results as JSON."""
+    parser = argparse.ArgumentParser(description='Build or probe a ChessVar opening book.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_command = commands.add_parser('build', help='build a book from game logs')
+    build_command.add_argument('logs', nargs='+', help='game log files, one game per line (- for standard input)')
+    build_command.add_argument('--book', required=True, help='book file to write')
+    build_command.add_argument('--plies', type=int, default=DEFAULT_PLIES, help='moves of each game in the book')
+    build_command.add_argument('--memory-records', type=int, default=DEFAULT_MEMORY_RECORDS,
+                               help='records counted in memory before a run file is written')
+    build_command.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                               help='moves remembered with the positions they lead to')
+    probe_command = commands.add_parser('probe', help='look up a position in a book')
+    probe_command.add_argument('book', help='book file to read')
+    probe_command.add_argument('moves', nargs='?', default='', help="moves played from the start, such as 'e2e4e7e5'")
+    arguments = parser.parse_args()
+
+    if arguments.command == 'build':
+        started = time.perf_counter()
+        with BookBuilder(arguments.book, arguments.plies, arguments.memory_records, arguments.cache_size) as builder:
+            for path in arguments.logs:
+                if path == '-':
+                    builder.add_log(sys.stdin)
+                else:
+                    with open(path) as log:
+                        builder.add_log(log)
+            results = builder.finish()
+        results['seconds'] = time.perf_counter() - started
+        results['games_per_second'] = results['games'] / (results['seconds'] or 1e-9)
+    else:
+        from .parallel import replay
+        game = replay(arguments.moves)
+        with OpeningBook(arguments.book) as book:
+            results = {'fen': game.to_fen(), 'moves': [book_move._asdict() for book_move in book.probe_game(game)],
+                       'book_move': book.choose_move(game)}
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,891 @@
+# Author: Matthew Holmstrom
+# GitHub username: matthewholmstrom
+# Date: 12/6/2023
+# Description: This program creates a ChessVar class, which is used for playing a variant of the game chess.
+# The program allows two players to play the game. In this game, each of the chess pieces moves and captures
+# the same way it does in regular chess, except that there is no castling, en passant, or pawn promotion.
+# The winner of the game is the first player to capture all the opponent's pieces of one type. For example,
+# a player would win the game if they captured the opponent's two rooks, 1 king, or 8 pawns. As in
+# standard chess, the two players are black and white. The starting position is the same as in standard chess,
+# and the white player moves first.
+
+import struct
+
+from .attack_tables import (BETWEEN, BISHOP_LINES, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, PAWN_DOUBLE_PUSHES,
+                            PAWN_PUSHES, PAWN_SOURCES, ROOK_LINES, bishop_attacks, queen_attacks, rook_attacks)
+from .table_cache import load_tables
+
+
+# The starting position of the game. The white pieces are lower case and the black pieces are upper cased.
+# - signs represent vacant squares. The first row is rank 1 in algebraic notation.
+STARTING_BOARD = (
+    'rnbqkbnr',
+    'pppppppp',
+    '--------',
+    '--------',
+    '--------',
+    '--------',
+    'PPPPPPPP',
+    'RNBQKBNR',
+)
+
+# The twelve types of game piece, white pieces first. Each type of piece has its own bitboard, which is
+# a 64 bit integer where bit (row * 8 + col) is set when a piece of that type is on the square.
+PIECES = 'pnbrqkPNBRQK'
+PIECE_INDICES = {piece: index for index, piece in enumerate(PIECES)}
+
+# The number of pieces of each type that each player starts with. A player loses when all of them are captured.
+STARTING_COUNTS = {piece: ''.join(STARTING_BOARD).count(piece) for piece in PIECES}
+STARTING_TOTALS = bytes(STARTING_COUNTS[piece] for piece in PIECES) # The same counts, indexed by piece code
+
+# The packed binary form of a position made by to_bytes: the occupancy bitboard, the piece code (its index
+# in PIECES) of each occupied square at four bits per square, the twelve capture counts at four bits each,
+# a flag byte that is 1 when the black player is the current player, and the two turn counts.
+POSITION_FORMAT = struct.Struct('<Q16s6sBHH')
+POSITION_SIZE = POSITION_FORMAT.size
+
+# The algebraic notation of each square, in the order of the bit positions of the bitboards, and the bit
+# position of each square's algebraic notation. Looking a square up in SQUARE_INDEX both parses and
+# validates it, so a malformed square such as 'z9' is rejected before the board is used.
+SQUARE_NAMES = tuple(chr(ord('a') + col) + str(row + 1) for row in range(8) for col in range(8))
+SQUARE_INDEX = {name: square for square, name in enumerate(SQUARE_NAMES)}
+
+# A move can be encoded as a 16 bit integer: the bit position of its starting square times 64 plus the bit
+# position of its ending square. Every encoded move is below MOVE_LIMIT.
+MOVE_LIMIT = 64 * 64
+
+# Random 64 bit keys for Zobrist hashing. The hash of a position is the exclusive or of the key of each
+# piece on its square, the key for the black player being the current player, and the key for each
+# type of piece's capture count. A fixed seed keeps the hashes the same between runs and processes.
+# The keys are cached on disk by table_cache, so the random module is only imported when they are built.
+def _zobrist_keys():
+    """Takes no parameters and returns the piece keys, the key for the black player and the capture keys."""
+    import random
+    zobrist_random = random.Random(20231206)
+    piece_keys = [[zobrist_random.getrandbits(64) for square in range(64)] for piece in PIECES]
+    black_to_move = zobrist_random.getrandbits(64)
+    capture_keys = [[zobrist_random.getrandbits(64) for count in range(9)] for piece in PIECES]
+    return piece_keys, black_to_move, capture_keys
+
+
+ZOBRIST_PIECE_KEYS, ZOBRIST_BLACK_TO_MOVE, ZOBRIST_CAPTURE_KEYS = load_tables(__file__, 'zobrist_keys', _zobrist_keys)
+
+
+def encode_move(start_square, end_square):
+    """Takes as parameters the starting square and ending square of a move in algebraic notation, and
+    returns the move encoded as an integer, for ChessVar's make_encoded_move method. A square that is not
+    on the board raises ValueError."""
+    start = SQUARE_INDEX.get(start_square)
+    end = SQUARE_INDEX.get(end_square)
+    if start is None or end is None:
+        raise ValueError('not a move between two squares on the board: ' + repr((start_square, end_square)))
+    return start << 6 | end
+
+
+def decode_move(move):
+    """Takes as a parameter an encoded move and returns it as a tuple of the starting square and ending
+    square in algebraic notation."""
+    return SQUARE_NAMES[move >> 6], SQUARE_NAMES[move & 63]
+
+
+class ChessVar:
+    """A class representing a ChassVar variable. The Chessvar class contains methods for creating
+    a chessboard, and implementing a variation of the game of chess. In this variation of chess, the winner
+    is (black or white) the player who captures all opponent's pieces of one type. For example capturing
+    the opponents 1 king or 8 pawns. The ChessVar class keeps track of which player's turn it is and the number (of each type)
+    of pieces that have been captured for both players. One of ChessVar class's methods (make_move) is a method which allows the
+    current player to try and move their chosen piece, from a starting square to an ending square, if the move
+    is a valid move. The game board is stored as bitboards, one for each type of piece, along with
+    an occupancy bitboard for each player. The data members are kept in slots rather than an instance
+    dictionary, so that a process can hold many games at once."""
+    __slots__ = ('__piece_boards', '__white_pieces', '__black_pieces', '__position_hash', '__current_player',
+                 '__game_state', '__white_turn_count', '__black_turn_count', '__capture_counts', '__last_capture',
+                 '__undo_stack', '__destinations')
+
+    def __init__(self):
+        """A method that takes no parameters, and initializes data members of the ChessVar
+        object. The initialized data members include the game board, the current player,
+        the turn count of each player, and the count of each player's pieces that have been captured."""
+        self.__piece_boards = [0] * len(PIECES) # One bitboard for each type of piece, in the order of PIECES.
+        self.__white_pieces = 0 # Bitboard of the squares holding any white piece.
+        self.__black_pieces = 0 # Bitboard of the squares holding any black piece.
+        self.__position_hash = 0 # The Zobrist hash of the position, updated as pieces move and are captured.
+        for index in range(len(PIECES)): # Every capture count starts at 0
+            self.__position_hash ^= ZOBRIST_CAPTURE_KEYS[index][0]
+
+        for row in range(8):
+            for col in range(8):
+                if STARTING_BOARD[row][col] != '-':
+                    self.__place_piece(STARTING_BOARD[row][col], row * 8 + col)
+
+        self.__current_player = 'White'
+        self.__game_state = 'UNFINISHED'
+        self.__white_turn_count = 0
+        self.__black_turn_count = 0
+
+        self.__capture_counts = bytearray(len(PIECES)) # The number of each type of piece captured, indexed by piece code
+        self.__last_capture = None # The piece code of the piece captured by the latest move, if it captured
+
+        self.__undo_stack = None # One entry for each move made with push, so that pop can take it back. The list is made by the first push.
+        self.__destinations = None # The destinations bitboard of the piece on each square, made by the first get_destinations call and then kept up to date by each move.
+
+
+    def get_game_state(self):
+        """Takes no parameters and returns the game_state data member, which is
+        the data member representing the current state of the game (either UNFINISHED, WHITE_WON,
+        or  BLACK_WON.)"""
+        return self.__game_state
+
+    def get_game_board(self):
+        """Takes no parameters and returns the game board as a list of eight rows, where each row
+        is a list of eight one-character strings. The board is built from the bitboards, so changing
+        the returned list does not change the game."""
+
+        return [[self.__piece_at(row * 8 + col) for col in range(8)] for row in range(8)]
+
+    def print_game_board(self):
+        """Takes no parameters and prints out the chessboard."""
+
+        for row in self.get_game_board():
+            for i in row:
+                print(i, end = ' ')
+            print(' ', sep = '\n')
+
+    def copy(self):
+        """Takes no parameters and returns a new ChessVar game in the same position, with the same capture
+        counts, turn counts and moves to pop. The bitboards are integers, so only the list holding them, the
+        capture counts and the undo stack are copied, and the game board is never rebuilt."""
+        game = ChessVar.__new__(type(self))
+        game.__piece_boards = self.__piece_boards[:]
+        game.__white_pieces = self.__white_pieces
+        game.__black_pieces = self.__black_pieces
+        game.__position_hash = self.__position_hash
+        game.__current_player = self.__current_player
+        game.__game_state = self.__game_state
+        game.__white_turn_count = self.__white_turn_count
+        game.__black_turn_count = self.__black_turn_count
+        game.__capture_counts = self.__capture_counts[:]
+        game.__last_capture = self.__last_capture
+        game.__undo_stack = None if self.__undo_stack is None else self.__undo_stack[:]
+        game.__destinations = None if self.__destinations is None else self.__destinations[:]
+        return game
+
+    def get_capture_counts(self):
+        """Takes no parameters and returns a dictionary mapping each game piece, such as 'p' for a white
+        pawn or 'P' for a black pawn, to the number of pieces of that type that have been captured."""
+        return dict(zip(PIECES, self.__capture_counts))
+
+    def get_w_pawn_count(self):
+        """Takes no parameters and returns the number of white pawns captured."""
+        return self.__capture_counts[PIECE_INDICES['p']]
+
+    def get_b_pawn_count(self):
+        """Takes no parameters and returns the number of black pawns captured."""
+        return self.__capture_counts[PIECE_INDICES['P']]
+
+    def get_white_turn_count(self):
+        """Takes no parameters and returns the white_turn_count data member, the number of turns the
+        white player has moved."""
+        return self.__white_turn_count
+
+    def get_black_turn_count(self):
+        """Takes no parameters and returns the black_turn_count data member, the number of turns the
+        black player has moved."""
+        return self.__black_turn_count
+
+    def get_current_player(self):
+        """Takes no parameters and returns the current_player data member."""
+        return self.__current_player
+
+    def get_position_hash(self):
+        """Takes no parameters and returns the position_hash data member, which is the 64 bit Zobrist
+        hash of the pieces on the board, the current player and the capture counts."""
+        return self.__position_hash
+
+    @classmethod
+    def from_fen(cls, fen):
+        """Takes as a parameter a position in the FEN-like notation made by to_fen and returns a ChessVar
+        game set up in that position. The method raises ValueError if the notation is not valid."""
+        fields = fen.split()
+        if len(fields) != 5:
+            raise ValueError('expected 5 fields in position: ' + repr(fen))
+        placement, player, counts, white_turn_count, black_turn_count = fields
+
+        ranks = placement.split('/')
+        if len(ranks) != 8:
+            raise ValueError('expected 8 ranks in position: ' + repr(fen))
+        board = []
+        for rank in reversed(ranks): # The notation lists rank 8 first, but the board starts with rank 1
+            row = ''
+            for letter in rank:
+                if letter.isdigit():
+                    row += '-' * int(letter)
+                elif letter.swapcase() in PIECE_INDICES:
+                    row += letter.swapcase()
+                else:
+                    raise ValueError('unknown piece ' + repr(letter) + ' in position: ' + repr(fen))
+            if len(row) != 8:
+                raise ValueError('expected 8 squares in rank ' + repr(rank))
+            board.append(row)
+
+        if player not in ('w', 'b'):
+            raise ValueError('expected w or b as the current player, not ' + repr(player))
+        capture_counts = [int(count) for count in counts.replace('/', '') if count.isdigit()]
+        if len(counts) != 13 or counts[6] != '/' or len(capture_counts) != 12:
+            raise ValueError('expected the capture counts as six digits, a slash and six digits, not ' + repr(counts))
+        if not white_turn_count.isdigit() or not black_turn_count.isdigit():
+            raise ValueError('expected the turn counts as numbers in position: ' + repr(fen))
+
+        game = cls.__new__(cls) # The starting position made by __init__ would only be replaced
+        game.__set_position(board, 'White' if player == 'w' else 'Black', capture_counts,
+                            int(white_turn_count), int(black_turn_count))
+        return game
+
+    def to_fen(self):
+        """Takes no parameters and returns the position in a FEN-like notation. As in FEN, the ranks are
+        listed from rank 8 down to rank 1, white pieces are upper case and black pieces lower case (the
+        opposite of the game board), and a digit counts vacant squares. The placement is followed by the
+        current player (w or b), the capture counts, and the white and black turn counts. The capture counts
+        are the number of white pawns, knights, bishops, rooks, queens and kings captured, a slash, and the
+        same for black, for example 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w 000000/000000 0 0'."""
+        ranks = []
+        for row in reversed(self.get_game_board()):
+            rank = ''
+            vacant = 0
+            for game_piece in row:
+                if game_piece == '-':
+                    vacant += 1
+                    continue
+                if vacant:
+                    rank += str(vacant)
+                    vacant = 0
+                rank += game_piece.swapcase()
+            if vacant:
+                rank += str(vacant)
+            ranks.append(rank)
+
+        counts = ''.join(str(count) for count in self.__capture_counts)
+        return '/'.join(ranks) + ' ' + self.__current_player[0].lower() + ' ' + counts[:6] + '/' + counts[6:] + \
+            ' ' + str(self.__white_turn_count) + ' ' + str(self.__black_turn_count)
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """Takes as parameters a bytes-like object holding a position packed by to_bytes, and the offset
+        of the position in it. The position is read in place, so many positions can be stored back to back
+        in one buffer or memory map and read without copying. The method returns a ChessVar game set up in
+        that position, and raises ValueError if the position is not valid or the buffer is too short to
+        hold one at the offset."""
+        if offset < 0 or len(data) - offset < POSITION_SIZE:
+            raise ValueError('expected ' + str(POSITION_SIZE) + ' bytes of packed position at offset ' + str(offset) +
+                             ', but the buffer holds ' + str(max(len(data) - offset, 0)))
+        occupancy, codes, counts, flags, white_turn_count, black_turn_count = POSITION_FORMAT.unpack_from(data, offset)
+
+        board = [['-'] * 8 for row in range(8)]
+        remaining = occupancy
+        number = 0
+        while remaining: # The piece codes are stored in the order of the occupied squares
+            lowest_bit = remaining & -remaining
+            remaining ^= lowest_bit
+            square = lowest_bit.bit_length() - 1
+            code = codes[number >> 1] >> (4 * (number & 1)) & 15
+            if number >= 32 or code >= len(PIECES):
+                raise ValueError('packed position has an invalid piece code')
+            board[square >> 3][square & 7] = PIECES[code]
+            number += 1
+
+        capture_counts = [counts[index >> 1] >> (4 * (index & 1)) & 15 for index in range(len(PIECES))]
+        if flags > 1:
+            raise ValueError('packed position has invalid flags')
+
+        game = cls.__new__(cls) # The starting position made by __init__ would only be replaced
+        game.__set_position(board, 'Black' if flags else 'White', capture_counts, white_turn_count, black_turn_count)
+        return game
+
+    def to_bytes(self):
+        """Takes no parameters and returns the position packed into POSITION_SIZE (35) bytes: the occupancy
+        bitboard, four bits for the type of each piece in the order of its square, four bits for each capture
+        count, the current player, and the white and black turn counts. The method raises ValueError if the
+        board holds more than 32 pieces."""
+        occupancy = self.__white_pieces | self.__black_pieces
+        codes = bytearray(16)
+        remaining = occupancy
+        number = 0
+        while remaining:
+            lowest_bit = remaining & -remaining
+            remaining ^= lowest_bit
+            if number >= 32:
+                raise ValueError('a packed position holds at most 32 pieces')
+            code = PIECE_INDICES[self.__piece_at(lowest_bit.bit_length() - 1)]
+            codes[number >> 1] |= code << (4 * (number & 1))
+            number += 1
+
+        counts = bytearray(6)
+        for index, count in enumerate(self.__capture_counts):
+            counts[index >> 1] |= count << (4 * (index & 1))
+
+        return POSITION_FORMAT.pack(occupancy, bytes(codes), bytes(counts), self.__current_player == 'Black',
+                                    self.__white_turn_count, self.__black_turn_count)
+
+    def __set_position(self, board, current_player, capture_counts, white_turn_count, black_turn_count):
+        """Takes as parameters a board of eight rows of game pieces, starting with rank 1, the current player,
+        the twelve capture counts in the order of PIECES, and the white and black turn counts. The method
+        sets every data member from the given position, so it can set up a game made without __init__,
+        and finds the game state from the capture counts. It raises ValueError if a capture count is more than the number of pieces
+        of that type a player starts with."""
+        for index, count in enumerate(capture_counts):
+            if count > STARTING_TOTALS[index]:
+                raise ValueError('capture count ' + str(count) + ' is more than the number of ' + PIECES[index] + ' pieces')
+
+        self.__piece_boards = [0] * len(PIECES)
+        self.__white_pieces = 0
+        self.__black_pieces = 0
+        self.__position_hash = 0
+        self.__capture_counts = bytearray(capture_counts)
+        for index, count in enumerate(capture_counts):
+            self.__position_hash ^= ZOBRIST_CAPTURE_KEYS[index][count]
+        for row in range(8):
+            for col in range(8):
+                if board[row][col] != '-':
+                    self.__place_piece(board[row][col], row * 8 + col)
+
+        self.__current_player = current_player
+        if current_player == 'Black':
+            self.__position_hash ^= ZOBRIST_BLACK_TO_MOVE
+        self.__white_turn_count = white_turn_count
+        self.__black_turn_count = black_turn_count
+        self.__undo_stack = None
+        self.__destinations = None
+
+        self.__game_state = 'UNFINISHED'
+        for index in range(len(PIECES)): # Every count is checked, since any of them may be complete
+            if self.__capture_counts[index] == STARTING_TOTALS[index]:
+                self.__game_state = 'BLACK_WON' if index < 6 else 'WHITE_WON'
+        self.__last_capture = None
+
+    def get_piece_board(self, game_piece):
+        """Takes as a parameter a game piece, such as 'p' for a white pawn, and returns the bitboard
+        of the squares holding that type of piece."""
+        return self.__piece_boards[PIECE_INDICES[game_piece]]
+
+
+    def make_move(self, start_square, end_square):
+        """Takes as parameters the start_square and end_square, which are string variables containing
+        the algebraic notation for the squares that the current player wants their piece to move from and
+        to. The make_move method returns false if the square being moved from does not contain a piece
+        belonging to the player whose turn it is, or if the indicated move is not legal, or if the
+        game has already been won. Otherwise, the method makes the indicated move, removes any captured piece,
+        updates the game state if necessary, update whose turn it is, and return True. The squares are looked
+        up in SQUARE_INDEX, so a square that is not on the game board, or is not a square at all, makes the
+        method return False before the board is used. A move made with make_move is made for good, so it
+        can't be taken back with pop, and neither can the moves made with push before it."""
+
+        if self.__game_state == 'WHITE_WON' or self.__game_state == 'BLACK_WON': # The game has already been won so make_move returns false.
+            return False
+
+        start = SQUARE_INDEX.get(start_square) # The bit positions of the squares, or None if a square is not on the game board.
+        end = SQUARE_INDEX.get(end_square)
+        if start is None or end is None:
+            return False
+
+        if not self.__move_piece(start, end):
+            return False
+        self.__undo_stack = None # The entries describe the moves before this one, which pop could no longer take back
+        return True
+
+    def make_encoded_move(self, move):
+        """Takes as a parameter a move encoded as an integer by encode_move, the bit position of the starting
+        square times 64 plus the bit position of the ending square. The method makes the move in the same way
+        as make_move, without parsing any algebraic notation, and returns True if the move was made and False
+        if it was not, including when the number is not an encoded move. As with make_move, the move can't be
+        taken back with pop, and neither can the moves made with push before it."""
+        if self.__game_state == 'WHITE_WON' or self.__game_state == 'BLACK_WON':
+            return False
+        if not 0 <= move < MOVE_LIMIT:
+            return False
+        if not self.__move_piece(move >> 6, move & 63):
+            return False
+        self.__undo_stack = None
+        return True
+
+    def __move_piece(self, start, end):
+        """Takes as parameters the bit positions of the starting square and ending square of a move in an
+        unfinished game. The method makes the move if the starting square holds one of the current player's
+        pieces and the move is valid, as described in make_move, and returns True if it was made."""
+        if self.__current_player == 'White' and not self.__white_pieces & (1 << start): # The starting square contains none of the white player's pieces
+            return False
+        if self.__current_player == 'Black' and not self.__black_pieces & (1 << start): # The starting square contains none of the black player's pieces
+            return False
+
+
+        if self.is_valid_move(start >> 3, start & 7, end >> 3, end & 7): # Checks to see if the intended move is a legal move.
+            occupied = self.__white_pieces | self.__black_pieces
+            captured_piece = self.__piece_at(end)
+            if captured_piece != '-':
+                self.update_captured_piece(captured_piece) # Counted before the piece is taken off the board
+                self.__remove_piece(captured_piece, end)
+            game_piece = self.__piece_at(start)
+            self.__remove_piece(game_piece, start)
+            self.__place_piece(game_piece, end)
+
+
+            self.update_game_state()
+
+            if self.__current_player == 'White':
+                self.update_white_turn_count() # Updates the number of turns the white player has made
+                self.__current_player = 'Black'
+            else:
+                self.update_black_turn_count()
+                self.__current_player = 'White'
+            self.__position_hash ^= ZOBRIST_BLACK_TO_MOVE
+            if self.__destinations is not None:
+                self.__update_destinations(start, end, occupied)
+
+            return True # The move is valid
+
+        return False # The move is not valid
+
+    def convert_to_indices(self, square):
+        """Takes as parameters a square of the chessboard in algebraic notation. The method
+        converts the algebraic notation of the game board square into list indices of the game board.
+        The method returns the row and column in the game board corresponding to the algebraic notation of the
+        game board square from the parameter."""
+        row = int(square[1]) - 1
+        col = ord(square[0]) - ord('a')
+
+        return row, col
+
+    def is_in_game_board(self, row, col):
+        """Takes as parameters the row and column indices of a game board square
+        and returns true if row and column indices are within the game board's valid
+        indices."""
+        return 0 <= row < 8 and 0 <= col < 8
+
+    def __place_piece(self, game_piece, square):
+        """Takes as parameters a game piece and the bit position of a square, and puts the game piece
+        on the square by setting the square's bit in the piece's bitboard and in its player's occupancy bitboard."""
+        bit = 1 << square
+        self.__piece_boards[PIECE_INDICES[game_piece]] |= bit
+        self.__position_hash ^= ZOBRIST_PIECE_KEYS[PIECE_INDICES[game_piece]][square]
+        if game_piece.islower():
+            self.__white_pieces |= bit
+        else:
+            self.__black_pieces |= bit
+
+    def __remove_piece(self, game_piece, square):
+        """Takes as parameters a game piece and the bit position of the square it is on, and takes
+        the game piece off the square by clearing the square's bit in the bitboards."""
+        bit = ~(1 << square)
+        self.__piece_boards[PIECE_INDICES[game_piece]] &= bit
+        self.__position_hash ^= ZOBRIST_PIECE_KEYS[PIECE_INDICES[game_piece]][square]
+        if game_piece.islower():
+            self.__white_pieces &= bit
+        else:
+            self.__black_pieces &= bit
+
+    def __piece_at(self, square):
+        """Takes as parameters the bit position of a square and returns the game piece on the square,
+        or '-' if the square is vacant. Only the bitboards of the player occupying the square are searched."""
+        bit = 1 << square
+        if self.__white_pieces & bit:
+            first = 0
+        elif self.__black_pieces & bit:
+            first = 6
+        else:
+            return '-'
+        for index in range(first, first + 6):
+            if self.__piece_boards[index] & bit:
+                return PIECES[index]
+
+
+    def is_valid_move(self, start_row, start_col, end_row, end_col):
+        """Takes as parameters the row and column of the starting square and the ending square.
+        The method gets the game piece corresponding to the row and column of the starting square.
+        The method then determines what type of chess piece the game piece is and determines if the
+        type of chess piece can make a valid move from the starting square to the ending square. If the
+        type of chess piece is able to move from the starting square to the ending square, then the method
+        returns True. It returns false if otherwise. Checking a move changes nothing: a capture is counted by
+        make_move when the move is made, so is_valid_move can be called any number of times.
+        """
+
+        if not self.is_in_game_board(start_row, start_col) or not self.is_in_game_board(end_row, end_col):
+            return False
+
+        start = start_row * 8 + start_col
+        end = end_row * 8 + end_col
+        start_bit = 1 << start
+        end_bit = 1 << end
+
+        if self.__white_pieces & start_bit: # The game piece is a white piece
+            own_pieces, opponent_pieces, side = self.__white_pieces, self.__black_pieces, 0
+        elif self.__black_pieces & start_bit: # The game piece is a black piece
+            own_pieces, opponent_pieces, side = self.__black_pieces, self.__white_pieces, 1
+        else: # The starting square contains no game piece
+            return False
+
+        if own_pieces & end_bit: # A piece can't land on a square holding one of its own player's pieces
+            return False
+
+        game_piece = self.__piece_at(start).lower()
+
+        # The pawn moves up one square onto a vacant square, or two squares from its starting row, and
+        # captures diagonally. The square it passes over on a two square move is not checked.
+        if game_piece == 'p':
+            reachable = (PAWN_PUSHES[side][start] | PAWN_DOUBLE_PUSHES[side][start]) & ~(own_pieces | opponent_pieces) | \
+                PAWN_ATTACKS[side][start] & opponent_pieces
+
+        # The knight moves in an L shape, first 2 squares in one direction, and the one square in another direction.
+        elif game_piece == 'n':
+            reachable = KNIGHT_ATTACKS[start]
+
+        # The king moves one square, and either forwards, backwards, side to side, or diagonally in any direction.
+        elif game_piece == 'k':
+            reachable = KING_ATTACKS[start]
+
+        # The rook moves forwards, backwards and side to side, the bishop moves diagonally, and the queen
+        # moves either way. They move as many squares as is desired, but can't pass over another piece.
+        else:
+            if game_piece == 'r':
+                lines = ROOK_LINES[start]
+            elif game_piece == 'b':
+                lines = BISHOP_LINES[start]
+            else:
+                lines = ROOK_LINES[start] | BISHOP_LINES[start]
+            if BETWEEN[start][end] & (own_pieces | opponent_pieces):
+                return False
+            reachable = lines
+
+        return bool(reachable & end_bit)
+
+    def push(self, move):
+        """Takes as a parameter a move, which is a tuple of the starting square and ending square in
+        algebraic notation, such as a move yielded by legal_moves. The method makes the move as make_move does
+        and returns what make_move would return. When the move is made, the method also records the moved piece,
+        the captured piece and the game state before the move, so that pop can take the move back."""
+        start_square, end_square = move
+        start = SQUARE_INDEX.get(start_square)
+        end = SQUARE_INDEX.get(end_square)
+        if start is None or end is None:
+            return False
+
+        captured_piece = self.__piece_at(end) # Read before the move, since the move takes the piece off the board
+        game_state = self.__game_state
+
+        if game_state != 'UNFINISHED' or not self.__move_piece(start, end):
+            return False
+
+        if self.__undo_stack is None:
+            self.__undo_stack = []
+        self.__undo_stack.append((start, end, self.__piece_at(end), captured_piece, game_state))
+        return True
+
+    def pop(self):
+        """Takes no parameters and takes back the most recent move made with push. The moved piece goes
+        back to its starting square, any captured piece goes back on the board and its capture count is
+        reduced, and the game state, current player and turn count are restored. Nothing on the board is
+        copied. The method returns the move that was taken back, or None if there is no move to take back."""
+        if not self.__undo_stack:
+            return None
+
+        start, end, game_piece, captured_piece, game_state = self.__undo_stack.pop()
+        occupied = self.__white_pieces | self.__black_pieces
+
+        self.__remove_piece(game_piece, end)
+        self.__place_piece(game_piece, start)
+        if captured_piece != '-':
+            self.__place_piece(captured_piece, end)
+            self.update_captured_piece(captured_piece, -1)
+
+        self.__game_state = game_state
+        if self.__current_player == 'White': # The black player made the move being taken back
+            self.__black_turn_count -= 1
+            self.__current_player = 'Black'
+        else:
+            self.__white_turn_count -= 1
+            self.__current_player = 'White'
+        self.__position_hash ^= ZOBRIST_BLACK_TO_MOVE
+        if self.__destinations is not None:
+            self.__update_destinations(start, end, occupied)
+
+        return SQUARE_NAMES[start], SQUARE_NAMES[end]
+
+    def legal_moves(self, player=None):
+        """Takes as a parameter the player (White or Black) whose moves are wanted, which defaults to
+        the current player. The method yields every move that the player's pieces can make, as a tuple
+        of the starting square and ending square in algebraic notation. The moves follow the same rules
+        as is_valid_move, but they are generated from each piece's movement pattern, and the count of
+        captured pieces is never changed. No moves are yielded once the game has been won."""
+
+        if self.__game_state != 'UNFINISHED':
+            return
+
+        if player is None:
+            player = self.__current_player
+
+        if player == 'White':
+            own_pieces, opponent_pieces, side = self.__white_pieces, self.__black_pieces, 0
+        else:
+            own_pieces, opponent_pieces, side = self.__black_pieces, self.__white_pieces, 1
+        first = side * 6
+
+        for index in range(first, first + 6):
+            game_piece = PIECES[index].lower()
+            remaining = self.__piece_boards[index]
+            while remaining: # Takes the pieces of this type off the bitboard one at a time, lowest square first
+                lowest_bit = remaining & -remaining
+                remaining ^= lowest_bit
+                start = lowest_bit.bit_length() - 1
+                destinations = self.__piece_destinations(game_piece, start, own_pieces, opponent_pieces, side)
+                while destinations:
+                    end_bit = destinations & -destinations
+                    destinations ^= end_bit
+                    yield SQUARE_NAMES[start], SQUARE_NAMES[end_bit.bit_length() - 1]
+
+    def legal_encoded_moves(self, player=None):
+        """Takes as a parameter the player (White or Black) whose moves are wanted, which defaults to
+        the current player. The method yields the same moves as legal_moves, in the same order, but each
+        encoded as an integer for make_encoded_move rather than as a tuple of squares."""
+
+        if self.__game_state != 'UNFINISHED':
+            return
+
+        if player is None:
+            player = self.__current_player
+
+        if player == 'White':
+            own_pieces, opponent_pieces, side = self.__white_pieces, self.__black_pieces, 0
+        else:
+            own_pieces, opponent_pieces, side = self.__black_pieces, self.__white_pieces, 1
+        first = side * 6
+
+        for index in range(first, first + 6):
+            game_piece = PIECES[index].lower()
+            remaining = self.__piece_boards[index]
+            while remaining:
+                lowest_bit = remaining & -remaining
+                remaining ^= lowest_bit
+                start = lowest_bit.bit_length() - 1
+                destinations = self.__piece_destinations(game_piece, start, own_pieces, opponent_pieces, side)
+                while destinations:
+                    end_bit = destinations & -destinations
+                    destinations ^= end_bit
+                    yield start << 6 | end_bit.bit_length() - 1
+
+    def get_destinations(self, square):
+        """Takes as a parameter a square in algebraic notation and returns the list of the squares the piece
+        on it can move to, in algebraic notation. The list is empty if the square is vacant, is not on the
+        game board, or the game has been won. The pieces of both players are answered, the player not on
+        move for the moves they could make on their turn."""
+        destinations = self.get_destination_board(square)
+        squares = []
+        while destinations:
+            end_bit = destinations & -destinations
+            destinations ^= end_bit
+            squares.append(SQUARE_NAMES[end_bit.bit_length() - 1])
+        return squares
+
+    def get_destination_board(self, square):
+        """Takes as a parameter a square in algebraic notation and returns the bitboard of the squares the
+        piece on it can move to, as described in get_destinations. The destinations of every piece are
+        found by the first call and then kept up to date as moves are made and taken back, so a call
+        between moves is a single lookup."""
+        index = SQUARE_INDEX.get(square)
+        if index is None or self.__game_state != 'UNFINISHED':
+            return 0
+        if self.__destinations is None:
+            self.__destinations = [0] * 64
+            remaining = self.__white_pieces | self.__black_pieces
+            while remaining:
+                lowest_bit = remaining & -remaining
+                remaining ^= lowest_bit
+                occupied_square = lowest_bit.bit_length() - 1
+                self.__destinations[occupied_square] = self.__destinations_from(occupied_square)
+        return self.__destinations[index]
+
+    def __destinations_from(self, square):
+        """Takes as a parameter the bit position of an occupied square and returns the bitboard of the
+        squares the piece on it can move to."""
+        game_piece = self.__piece_at(square)
+        if game_piece.islower(): # A white piece
+            return self.__piece_destinations(game_piece, square, self.__white_pieces, self.__black_pieces, 0)
+        return self.__piece_destinations(game_piece.lower(), square, self.__black_pieces, self.__white_pieces, 1)
+
+    def __update_destinations(self, start, end, occupied_before):
+        """Takes as parameters the bit positions of the two squares a move (or the taking back of a move)
+        changed and the occupancy bitboard from before it. The method recomputes the destinations of only
+        the pieces that a change on those squares can affect: the pieces on them, the knights, kings and
+        pawns that could move to them, and the rooks, bishops and queens whose lines reach them with the
+        board as it was before or is after."""
+        boards = self.__piece_boards
+        white_pieces, black_pieces = self.__white_pieces, self.__black_pieces
+        changed = 1 << start | 1 << end
+        unchanged = occupied_before & (white_pieces | black_pieces) # Seen through, a line reaches a changed square either way
+        rook_reach = rook_attacks(start, unchanged) | rook_attacks(end, unchanged)
+        bishop_reach = bishop_attacks(start, unchanged) | bishop_attacks(end, unchanged)
+        knight_reach = KNIGHT_ATTACKS[start] | KNIGHT_ATTACKS[end]
+        king_reach = KING_ATTACKS[start] | KING_ATTACKS[end]
+        piece_reach = (knight_reach, bishop_reach, rook_reach, rook_reach | bishop_reach, king_reach)
+        reach = ((PAWN_SOURCES[0][start] | PAWN_SOURCES[0][end],) + piece_reach +
+                 (PAWN_SOURCES[1][start] | PAWN_SOURCES[1][end],) + piece_reach) # Indexed like the piece boards
+
+        destinations = self.__destinations
+        destinations[start] = destinations[end] = 0
+        for index in range(12):
+            affected = boards[index] & (reach[index] | changed)
+            if not affected:
+                continue
+            if index < 6:
+                game_piece, own_pieces, opponent_pieces, side = PIECES[index], white_pieces, black_pieces, 0
+            else:
+                game_piece, own_pieces, opponent_pieces, side = PIECES[index].lower(), black_pieces, white_pieces, 1
+            while affected:
+                lowest_bit = affected & -affected
+                affected ^= lowest_bit
+                square = lowest_bit.bit_length() - 1
+                destinations[square] = self.__piece_destinations(game_piece, square, own_pieces, opponent_pieces, side)
+
+    def __piece_destinations(self, game_piece, start, own_pieces, opponent_pieces, side):
+        """Takes as parameters the type of a game piece (in lower case), the bit position of its square, the
+        occupancy bitboards of its player and of the opponent, and its player's side (0 for white, 1 for black).
+        The method returns the bitboard of the squares the piece can move to, found from the attack tables."""
+        occupied = own_pieces | opponent_pieces
+        if game_piece == 'p': # As in is_valid_move, the square passed over on a two square move is not checked
+            return (PAWN_PUSHES[side][start] | PAWN_DOUBLE_PUSHES[side][start]) & ~occupied | \
+                PAWN_ATTACKS[side][start] & opponent_pieces
+        if game_piece == 'n':
+            return KNIGHT_ATTACKS[start] & ~own_pieces
+        if game_piece == 'k':
+            return KING_ATTACKS[start] & ~own_pieces
+        if game_piece == 'r':
+            return rook_attacks(start, occupied) & ~own_pieces
+        if game_piece == 'b':
+            return bishop_attacks(start, occupied) & ~own_pieces
+        return queen_attacks(start, occupied) & ~own_pieces
+
+    def update_white_turn_count(self):
+        """Takes no parameters and updates the number of turns that the white player has moved."""
+        self.__white_turn_count +=1
+
+    def update_black_turn_count(self):
+        """Takes no parameters and updates the number of turns that the black player has moved."""
+        self.__black_turn_count +=1
+
+    def update_game_state(self):
+        """Takes no parameters and updates the state of the game. The player wins if the count of an
+        opponent's piece is the number of total pieces of that type that the opponent has. For example
+        if the white pawn count = 8 or the white bishop count = 2, then the black player wins.
+        Only the count of the piece captured by the latest move can have changed, so it is the only
+        count compared. The method also updates the game_state data member to reflect the outcome of the game.
+        """
+        index = self.__last_capture
+        if index is None: # The latest move didn't capture a piece
+            return
+        self.__last_capture = None
+        if self.__capture_counts[index] == STARTING_TOTALS[index]:
+            if index < 6: # All of the white player's pieces of this type have been captured
+                self.__game_state = 'BLACK_WON'
+            else:
+                self.__game_state = 'WHITE_WON'
+
+    def update_captured_piece(self, captured_piece, change=1):
+        """Takes as parameters the type of opponent's piece the current player has captured.
+        The method updates the count of the opponent's piece of that type that was captured, which is
+        stored at the piece's code in the capture_counts array. For example, if the captured piece
+        is a black pawn, then the black pawn count is incremented by 1. The optional change parameter
+        is the amount the count changes by, which is -1 when a capture is taken back. The position hash
+        is updated for the new count, and a capture is noted so that update_game_state can check it. A change
+        that would take the count below 0 or above the number of pieces of that type raises ValueError.
+        """
+        index = PIECE_INDICES.get(captured_piece)
+        if index is None:
+            return
+        count = self.__capture_counts[index] + change
+        if not 0 <= count <= STARTING_TOTALS[index]:
+            raise ValueError('a capture count of ' + str(count) + ' ' + captured_piece + ' pieces is not possible')
+        self.__capture_counts[index] = count
+        capture_keys = ZOBRIST_CAPTURE_KEYS[index]
+        self.__position_hash ^= capture_keys[count - change] ^ capture_keys[count]
+        if change > 0:
+            self.__last_capture = index
+
+
+class TranspositionTable:
+    """A class representing a transposition table, which stores search results for positions keyed on
+    the Zobrist hash from ChessVar's get_position_hash method. The table has a fixed number of slots, and
+    a position is stored in the slot given by its hash modulo the size of the table. When two positions
+    share a slot, the replacement policy decides which one is kept: 'depth-preferred' keeps the result
+    that was searched deeper, and 'always-replace' keeps the newest result."""
+    def __init__(self, size=1 << 18, replacement='depth-preferred'):
+        """Takes as parameters the number of slots in the table and the replacement policy, either
+        'depth-preferred' or 'always-replace'. The method initializes the empty table."""
+        if replacement not in ('depth-preferred', 'always-replace'):
+            raise ValueError('unknown replacement policy: ' + repr(replacement))
+        self.__size = size
+        self.__replacement = replacement
+        self.__slots = [None] * size
+        self.__stored = 0
+
+    def __len__(self):
+        """Takes no parameters and returns the number of slots that hold a result."""
+        return self.__stored
+
+    def get_size(self):
+        """Takes no parameters and returns the number of slots in the table."""
+        return self.__size
+
+    def probe(self, key):
+        """Takes as a parameter the hash of a position and returns the stored entry for the position,
+        as a tuple of (key, depth, value, bound, best_move), or None if the position is not stored."""
+        entry = self.__slots[key % self.__size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, value, bound, best_move=None):
+        """Takes as parameters the hash of a position, the depth it was searched to, its value, the bound
+        type of the value ('EXACT', 'LOWER' or 'UPPER') and the best move found. The method stores the entry
+        unless the replacement policy keeps the entry already in the slot, and returns True if it was stored."""
+        index = key % self.__size
+        entry = self.__slots[index]
+        if entry is None:
+            self.__stored += 1
+        elif self.__replacement == 'depth-preferred' and entry[0] != key and entry[1] > depth:
+            return False # A deeper result for a different position is kept
+        self.__slots[index] = (key, depth, value, bound, best_move)
+        return True
+
+    def clear(self):
+        """Takes no parameters and removes every entry from the table."""
+        self.__slots = [None] * self.__size
+        self.__stored = 0
+
+
+
+#Testing the code
+#game = ChessVar()
+
+#move_result = game.make_move('a2', 'a4')
+#game.make_move('g1', 'f1')
+#state = game.get_game_state()
+
+
+#print(state)
+
+#game.print_game_board()
+
+#print()
+
+#print(game.get_game_board()[1][1])
+#print(game.get_game_board()[7][2])
+
+#print()
+#print(game.print_game_board())
+
+
+
+
+
+
+
+
+
+
@@ -0,0 +1,385 @@
+# Description: This program stores finished ChessVar games in a columnar, chunked format for bulk analysis,
+# and reads them back without parsing. A store is a directory of chunks, each holding up to a fixed number
+# of games in three tables: games (one row per game: its outcome, the type of piece whose capture decided
+# it, the turn counts of each player and where its moves and captures start), moves (one row per move: the
+# move encoded as by encode_move and the piece that moved) and captures (one row per capture: the game, the
+# ply, the captured piece, the capturing piece and the square). Each column of a table is a NumPy .npy file
+# of one typed array, so a column can be scanned straight from a memory map without copying. The writer
+# only needs the standard library: it replays each game's moves, keeps each column in an array.array and
+# writes the .npy header itself. A ChessVar game doesn't keep the moves that were made in it, so a finished
+# game is written together with its moves, which are checked to lead to it. A chunk only becomes visible
+# to readers once all of its files are written and it is listed in the store's manifest. Reading needs NumPy.
+#
+#     python columnar.py export games.log games.columns
+#     python columnar.py summary games.columns
+
+import argparse
+import array
+import json
+import os
+import sys
+
+from .chess_var import PIECE_INDICES, PIECES, SQUARE_INDEX, STARTING_BOARD, ChessVar
+from .replay import is_game_line, parse_game
+
+
+# The game states, in the order of their codes in the outcome column.
+GAME_STATES = ('UNFINISHED', 'WHITE_WON', 'BLACK_WON')
+
+# The columns of each table, as (name, array.array type code, .npy type) triples. Piece columns hold the
+# index of the piece in PIECES, and -1 for none.
+TABLES = {
+    'games': (('game_number', 'q', '<i8'), ('outcome', 'b', '|i1'), ('deciding_piece', 'b', '|i1'),
+              ('white_turns', 'i', '<i4'), ('black_turns', 'i', '<i4'), ('first_illegal_move', 'i', '<i4'),
+              ('move_offset', 'q', '<i8'), ('capture_offset', 'q', '<i8')),
+    'moves': (('move', 'H', '<u2'), ('moved_piece', 'b', '|i1')),
+    'captures': (('game', 'i', '<i4'), ('ply', 'i', '<i4'), ('captured_piece', 'b', '|i1'),
+                 ('capturing_piece', 'b', '|i1'), ('square', 'b', '|i1')),
+}
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 2 # Version 1 held the turn counts and capture plies as int16, which a long game overflows
+READABLE_FORMATS = (1, 2) # Each .npy file gives its own type, so the older chunks are read as they are
+DEFAULT_CHUNK_SIZE = 65536 # Games held in each chunk
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00' # Version 1.0 of the .npy format
+NPY_ALIGNMENT = 64 # The header is padded so that the data starts on a multiple of this
+
+
+def column_path(chunk_directory, table, column):
+    """Takes as parameters the directory of a chunk, a table name and a column name, and returns the path
+    of the column's .npy file."""
+    return os.path.join(chunk_directory, table + '.' + column + '.npy')
+
+
+def write_npy(path, descr, values):
+    """Takes as parameters a file path, the .npy type of the values (such as '<i8') and an array.array of
+    them, and writes the values to the path as a one dimensional .npy file."""
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, len(values))
+    padding = NPY_ALIGNMENT - (len(NPY_MAGIC) + 2 + len(header) + 1) % NPY_ALIGNMENT
+    header = header + ' ' * (padding % NPY_ALIGNMENT) + '\n'
+    if sys.byteorder == 'big' and values.itemsize > 1: # The files are always little-endian
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    with open(path, 'wb') as file:
+        file.write(NPY_MAGIC + len(header).to_bytes(2, 'little') + header.encode('latin1'))
+        values.tofile(file)
+
+
+def read_manifest(directory):
+    """Takes as a parameter the directory of a store and returns its manifest, a dictionary whose chunks
+    entry lists each finished chunk with its name and its number of games, moves and captures. A directory
+    without a manifest has no chunks. A manifest that can't be parsed, is of a format that can't be read or
+    lists a chunk that isn't described by a name and counts raises ValueError."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as file:
+            manifest = json.load(file) # A damaged file raises JSONDecodeError, a ValueError
+    except FileNotFoundError:
+        return {'format': FORMAT_VERSION, 'chunks': []}
+    if not isinstance(manifest, dict):
+        raise ValueError('the manifest is not a JSON object')
+    if manifest.get('format') not in READABLE_FORMATS:
+        raise ValueError('unsupported columnar format ' + repr(manifest.get('format')))
+    chunks = manifest.get('chunks')
+    if not isinstance(chunks, list):
+        raise ValueError('the manifest has no list of chunks')
+    for chunk in chunks:
+        if not isinstance(chunk, dict) or not isinstance(chunk.get('name'), str) or \
+                os.path.basename(chunk['name']) != chunk['name'] or chunk['name'] in ('', '.', '..') or \
+                not all(type(chunk.get(key)) is int and chunk[key] >= 0 for key in ('games', 'moves', 'captures')):
+            raise ValueError('bad chunk in the manifest: ' + repr(chunk))
+    return manifest
+
+
+class ColumnarWriter:
+    """A class representing a writer that adds finished games to a columnar store. Games are replayed
+    as they are written and their columns are kept in memory until the chunk is full, so memory is bounded
+    by the chunk size however many games are written. Writing to an existing store adds chunks after the
+    ones it already has."""
+    def __init__(self, directory, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Takes as parameters the directory of the store, which is made if it doesn't exist, and the most
+        games to hold in each chunk, and initializes an empty chunk."""
+        if chunk_size < 1:
+            raise ValueError('the chunk size must be at least 1')
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__chunk_size = chunk_size
+        self.__manifest = read_manifest(directory)
+        self.__games_written = sum(chunk['games'] for chunk in self.__manifest['chunks'])
+        self.__columns = None
+        self.__start_chunk()
+
+    def __enter__(self):
+        """Takes no parameters and returns the writer, for use in a with statement."""
+        return self
+
+    def __exit__(self, *exception):
+        """Takes the exception details of the with statement and closes the writer, writing the last chunk."""
+        self.close()
+
+    def get_games_written(self):
+        """Takes no parameters and returns the number of games in the store, including the games in the
+        chunk that hasn't been written yet."""
+        return self.__games_written
+
+    def write_moves(self, moves, game_number=None):
+        """Takes as parameters the moves of a game, each a tuple of the starting square and ending square in
+        algebraic notation, and optionally the number of the game, which defaults to its position in the
+        store. The moves are replayed from the starting position until one is rejected, and the game is
+        added to the current chunk with the moves that were played. The method returns the game's state."""
+        return self.__write(moves, game_number, None)
+
+    def write_game(self, game, moves, game_number=None):
+        """Takes as parameters a ChessVar game, the moves that were made in it from the starting position and
+        optionally the number of the game. The game itself doesn't keep its moves, so they are replayed as by
+        write_moves to fill in the moves and captures. If they don't lead to the game's position, nothing is
+        written and ValueError is raised. The method returns the game's state."""
+        return self.__write(moves, game_number, game)
+
+    def __write(self, moves, game_number, finished_game):
+        """Takes as parameters the moves of a game, the number of the game or None, and the ChessVar game the
+        moves must lead to, or None. The method replays the moves and adds the game to the current chunk as
+        described in write_moves and write_game, and returns the game's state."""
+        game = ChessVar()
+        board = [piece for row in STARTING_BOARD for piece in row] # The piece on each square, to find what moved and what was captured
+        columns = self.__columns
+        game_index = len(columns['games']['game_number'])
+        move_column, moved_column = columns['moves']['move'], columns['moves']['moved_piece']
+        captures = columns['captures']
+        first_illegal_move = -1
+        move_offset = len(move_column)
+        capture_offset = len(captures['game'])
+
+        for ply, (start_square, end_square) in enumerate(moves):
+            start = SQUARE_INDEX.get(start_square)
+            end = SQUARE_INDEX.get(end_square)
+            if start is None or end is None or not game.make_encoded_move(start << 6 | end):
+                first_illegal_move = ply
+                break
+            game_piece, captured_piece = board[start], board[end]
+            board[start], board[end] = '-', game_piece
+            move_column.append(start << 6 | end)
+            moved_column.append(PIECE_INDICES[game_piece])
+            if captured_piece != '-':
+                captures['game'].append(game_index)
+                captures['ply'].append(ply)
+                captures['captured_piece'].append(PIECE_INDICES[captured_piece])
+                captures['capturing_piece'].append(PIECE_INDICES[game_piece])
+                captures['square'].append(end)
+
+        if finished_game is not None and (first_illegal_move != -1 or game.to_bytes() != finished_game.to_bytes()):
+            for column in columns['moves'].values(): # The rows added for this game are taken back
+                del column[move_offset:]
+            for column in captures.values():
+                del column[capture_offset:]
+            raise ValueError('the moves do not lead to the game\'s position')
+
+        game_state = game.get_game_state()
+        deciding_piece = captures['captured_piece'][-1] if game_state != 'UNFINISHED' else -1 # The last capture ended the game
+        self.__add_game(game_number, GAME_STATES.index(game_state), deciding_piece, game.get_white_turn_count(),
+                        game.get_black_turn_count(), first_illegal_move, move_offset, capture_offset)
+        return game_state
+
+    def write_line(self, line, game_number=None):
+        """Takes as parameters one line of a game log, in a format read by replay.py, and optionally the number
+        of the game. The game is written as by write_moves and its state is returned. A line that can't be
+        parsed is written as a game with no moves whose first illegal move is 0."""
+        try:
+            moves = parse_game(line)
+        except ValueError:
+            self.__add_game(game_number, 0, -1, 0, 0, 0, len(self.__columns['moves']['move']),
+                            len(self.__columns['captures']['game']))
+            return 'UNFINISHED'
+        return self.write_moves(moves, game_number)
+
+    def write_log(self, lines):
+        """Takes as a parameter an iterable of game log lines, such as an open file, and writes each game in
+        turn, skipping blank lines and comments. The method returns the number of games written."""
+        written = 0
+        for line in lines:
+            if is_game_line(line):
+                self.write_line(line)
+                written += 1
+        return written
+
+    def flush(self):
+        """Takes no parameters and writes the current chunk, if it holds any games, then lists it in the
+        manifest. The chunk's files are written to a temporary directory that is renamed once they are all
+        written, and the manifest is replaced in one step, so readers never see a partly written chunk. A
+        chunk directory left by a writer that stopped before listing it in the manifest is not listed, so it
+        is left alone and the chunk takes the next unused name."""
+        games = len(self.__columns['games']['game_number'])
+        if not games:
+            return
+        number = len(self.__manifest['chunks'])
+        listed = {chunk['name'] for chunk in self.__manifest['chunks']}
+        while 'chunk_%06d' % number in listed or os.path.exists(os.path.join(self.__directory, 'chunk_%06d' % number)):
+            number += 1
+        name = 'chunk_%06d' % number
+        final_directory = os.path.join(self.__directory, name)
+        temporary_directory = final_directory + '.tmp'
+        os.makedirs(temporary_directory, exist_ok=True)
+        for table, columns in TABLES.items():
+            for column, typecode, descr in columns:
+                write_npy(column_path(temporary_directory, table, column), descr, self.__columns[table][column])
+        os.replace(temporary_directory, final_directory)
+
+        self.__manifest['format'] = FORMAT_VERSION
+        self.__manifest['chunks'].append({'name': name, 'games': games,
+                                          'moves': len(self.__columns['moves']['move']),
+                                          'captures': len(self.__columns['captures']['game'])})
+        manifest_path = os.path.join(self.__directory, MANIFEST)
+        with open(manifest_path + '.tmp', 'w') as file:
+            json.dump(self.__manifest, file, indent=1)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        self.__start_chunk()
+
+    def close(self):
+        """Takes no parameters and writes the last chunk."""
+        self.flush()
+
+    def __start_chunk(self):
+        """Takes no parameters and starts an empty chunk, with an empty array.array for each column."""
+        self.__columns = {table: {column: array.array(typecode) for column, typecode, descr in columns}
+                          for table, columns in TABLES.items()}
+
+    def __add_game(self, game_number, outcome, deciding_piece, white_turns, black_turns, first_illegal_move,
+                   move_offset, capture_offset):
+        """Takes as parameters the values of a row of the games table and adds the row to the current chunk,
+        writing the chunk once it is full."""
+        if game_number is None:
+            game_number = self.__games_written
+        row = (game_number, outcome, deciding_piece, white_turns, black_turns, first_illegal_move, move_offset,
+               capture_offset)
+        for (column, typecode, descr), value in zip(TABLES['games'], row):
+            self.__columns['games'][column].append(value)
+        self.__games_written += 1
+        if len(self.__columns['games']['game_number']) >= self.__chunk_size:
+            self.flush()
+
+
+class ColumnarReader:
+    """A class representing a reader of a columnar store. Each column of each chunk is opened as a
+    read-only memory map, so scanning a column reads the file's pages directly into the NumPy array."""
+    def __init__(self, directory):
+        """Takes as a parameter the directory of the store and reads its manifest. The chunks written after
+        the reader is made are not seen by it."""
+        import numpy # Only reading needs NumPy
+        self.__numpy = numpy
+        self.__directory = directory
+        self.__chunks = read_manifest(directory)['chunks']
+
+    def __len__(self):
+        """Takes no parameters and returns the number of games in the store."""
+        return sum(chunk['games'] for chunk in self.__chunks)
+
+    def get_chunk_count(self):
+        """Takes no parameters and returns the number of chunks in the store."""
+        return len(self.__chunks)
+
+    def load_column(self, chunk_index, table, column):
+        """Takes as parameters the index of a chunk, a table name and a column name, and returns the column
+        of that chunk as a read-only NumPy array backed by a memory map of its file. A column whose length
+        isn't the chunk's count of rows in the manifest raises ValueError."""
+        chunk = self.__chunks[chunk_index]
+        path = column_path(os.path.join(self.__directory, chunk['name']), table, column)
+        rows = chunk['games'] if table == 'games' else chunk[table]
+        if not rows: # An empty file can't be memory mapped
+            values = self.__numpy.load(path)
+        else:
+            values = self.__numpy.load(path, mmap_mode='r')
+        if values.shape != (rows,):
+            raise ValueError(path + ' holds ' + str(values.shape) + ' values, but the manifest lists ' + str(rows))
+        return values
+
+    def load_chunk(self, chunk_index):
+        """Takes as a parameter the index of a chunk and returns a dictionary mapping each table name to a
+        dictionary of its columns, as returned by load_column."""
+        return {table: {column: self.load_column(chunk_index, table, column) for column, typecode, descr in columns}
+                for table, columns in TABLES.items()}
+
+    def scan(self, table, column):
+        """Takes as parameters a table name and a column name, and yields the column of each chunk in turn."""
+        for chunk_index in range(len(self.__chunks)):
+            yield self.load_column(chunk_index, table, column)
+
+    def game_moves(self, chunk_index, game_index):
+        """Takes as parameters the index of a chunk and the index of a game in it, and returns the game's
+        encoded moves as a slice of the chunk's move column, without copying."""
+        offsets = self.load_column(chunk_index, 'games', 'move_offset')
+        moves = self.load_column(chunk_index, 'moves', 'move')
+        end = offsets[game_index + 1] if game_index + 1 < len(offsets) else len(moves)
+        return moves[offsets[game_index]:end]
+
+    def game_captures(self, chunk_index, game_index):
+        """Takes as parameters the index of a chunk and the index of a game in it, and returns a dictionary
+        mapping each column of the captures table to the slice of it holding the game's captures, in order."""
+        offsets = self.load_column(chunk_index, 'games', 'capture_offset')
+        end = offsets[game_index + 1] if game_index + 1 < len(offsets) else self.__chunks[chunk_index]['captures']
+        return {column: self.load_column(chunk_index, 'captures', column)[offsets[game_index]:end]
+                for column, typecode, descr in TABLES['captures']}
+
+    def count_values(self, table, column, size):
+        """Takes as parameters a table name, a column name and the number of codes the column can hold, and
+        returns an array counting how often each code from 0 to size - 1 appears in the column, over all
+        chunks. Codes below 0, meaning none, are not counted."""
+        numpy = self.__numpy
+        counts = numpy.zeros(size, dtype=numpy.int64)
+        for values in self.scan(table, column):
+            values = values[values >= 0]
+            counts += numpy.bincount(values, minlength=size)[:size]
+        return counts
+
+    def game_lengths(self):
+        """Takes no parameters and returns an array of the number of moves played in each game, the sum of
+        both players' turn counts."""
+        numpy = self.__numpy
+        lengths = [white.astype(numpy.int32) + black for white, black in
+                   zip(self.scan('games', 'white_turns'), self.scan('games', 'black_turns'))]
+        return numpy.concatenate(lengths) if lengths else numpy.zeros(0, dtype=numpy.int32)
+
+    def summary(self):
+        """Takes no parameters and returns a dictionary summarizing the store: the number of games, the games
+        in each game state, the games decided by the capture of each type of piece, the mean and longest game
+        length in moves, and the number of captures of each type of piece."""
+        outcomes = self.count_values('games', 'outcome', len(GAME_STATES))
+        deciding = self.count_values('games', 'deciding_piece', len(PIECES))
+        captured = self.count_values('captures', 'captured_piece', len(PIECES))
+        lengths = self.game_lengths()
+        return {'games': len(self), 'chunks': len(self.__chunks),
+                'outcomes': {state: int(count) for state, count in zip(GAME_STATES, outcomes)},
+                'deciding_piece': {piece: int(count) for piece, count in zip(PIECES, deciding) if count},
+                'mean_length': float(lengths.mean()) if len(lengths) else 0.0,
+                'longest': int(lengths.max()) if len(lengths) else 0,
+                'captures': {piece: int(count) for piece, count in zip(PIECES, captured) if count}}
+
+
+def main():
+    """Takes no parameters and either exports game logs to a columnar store or prints a JSON summary of a
+    store, as given on the command line."""
+    parser = argparse.ArgumentParser(description='Export ChessVar game logs to a columnar store and summarize it.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help='replay game logs and add them to a store')
+    export.add_argument('logs', nargs='+', help='game log files, one game per line (- for standard input)')
+    export.add_argument('directory', help='directory of the store')
+    export.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='games held in each chunk')
+    summary = commands.add_parser('summary', help='print a summary of a store')
+    summary.add_argument('directory', help='directory of the store')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'export':
+        with ColumnarWriter(arguments.directory, arguments.chunk_size) as writer:
+            for path in arguments.logs:
+                if path == '-':
+                    writer.write_log(sys.stdin)
+                else:
+                    with open(path) as log:
+                        writer.write_log(log)
+        print(json.dumps({'games': writer.get_games_written()}))
+    else:
+        print(json.dumps(ColumnarReader(arguments.directory).summary(), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
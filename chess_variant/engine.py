@@ -0,0 +1,317 @@
+# Description: This program creates an Engine class, which chooses moves for the current player of a
+# ChessVar game. The engine searches the game tree with iterative deepening alpha-beta search, using a
+# transposition table keyed on ChessVar's position hash. Captures are searched first, most valuable
+# victim first, followed by killer moves. The search stops when it reaches its depth, time or node budget.
+
+import time
+from collections import namedtuple
+
+from .chess_var import PIECES, SQUARE_INDEX, STARTING_COUNTS, TranspositionTable
+
+
+# The value of each type of piece, in hundredths of a pawn.
+PIECE_VALUES = {'p': 100, 'n': 300, 'b': 320, 'r': 500, 'q': 900, 'k': 300}
+
+# The penalty for being only a few captures away from losing all pieces of one type, indexed by the
+# number of captures left. A player with one capture left is one capture away from losing the game.
+VULNERABILITY = (0, 400, 90, 25, 0, 0, 0, 0, 0)
+
+# The score of a won game. Wins found closer to the root score higher.
+WIN_SCORE = 100000
+
+# Scores beyond this, either way, are wins or losses, whose distance to the capture that decides the game
+# is counted from the node when they are stored in the transposition table.
+DECIDED_SCORE = WIN_SCORE - 10000
+
+# How often, in nodes, the search checks its time budget.
+CHECK_INTERVAL = 1024
+
+SearchResult = namedtuple('SearchResult', ['best_move', 'score', 'depth', 'nodes', 'elapsed'])
+
+
+class SearchTimeout(Exception):
+    """An exception raised inside the search when the time or node budget runs out."""
+
+
+def count_bits(bitboard):
+    """Takes as a parameter a bitboard and returns the number of squares set in it."""
+    return bin(bitboard).count('1')
+
+
+def piece_map(game):
+    """Takes as a parameter a ChessVar game and returns a dictionary mapping the bit position of each
+    occupied square to the game piece on it."""
+    pieces = {}
+    for game_piece in PIECES:
+        remaining = game.get_piece_board(game_piece)
+        while remaining:
+            lowest_bit = remaining & -remaining
+            remaining ^= lowest_bit
+            pieces[lowest_bit.bit_length() - 1] = game_piece
+    return pieces
+
+
+def evaluate(game):
+    """Takes as a parameter a ChessVar game and returns the score of the position for the current player.
+    The score counts the value of each player's pieces, less a penalty for each type of piece the player
+    is close to losing all of, since that is how this variant is won."""
+    score = 0
+    capture_counts = game.get_capture_counts()
+    for game_piece in PIECES:
+        remaining = count_bits(game.get_piece_board(game_piece))
+        captures_left = STARTING_COUNTS[game_piece] - capture_counts[game_piece]
+        value = PIECE_VALUES[game_piece.lower()] * remaining - VULNERABILITY[captures_left]
+        if game_piece.islower():
+            score += value
+        else:
+            score -= value
+    if game.get_current_player() == 'White':
+        return score
+    return -score
+
+
+def score_to_table(score, ply):
+    """Takes as parameters a score found at a distance ply from the root and returns it as stored in the
+    transposition table. A win or loss is stored as its distance from the node rather than from the root,
+    so that it is right when the position is met again at another distance from the root."""
+    if score > DECIDED_SCORE:
+        return score + ply
+    if score < -DECIDED_SCORE:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """Takes as parameters a score stored in the transposition table and the distance from the root of the
+    node probing it, and returns the score as seen from the root, undoing score_to_table."""
+    if score > DECIDED_SCORE:
+        return score - ply
+    if score < -DECIDED_SCORE:
+        return score + ply
+    return score
+
+
+def tablebase_score(plies, ply):
+    """Takes as parameters a tablebase result in plies for the current player (positive for a win, negative
+    for a loss and 0 for a draw) and the distance from the root, and returns it as a search score, with
+    wins found closer to the root scoring higher, as in the search."""
+    if plies > 0:
+        return WIN_SCORE - (ply + plies)
+    if plies < 0:
+        return -(WIN_SCORE - (ply - plies))
+    return 0
+
+
+class Engine:
+    """A class representing a search engine for ChessVar games. The engine keeps its transposition
+    table and killer moves between searches, so searching successive positions of a game reuses work."""
+    def __init__(self, table_size=1 << 18, replacement='depth-preferred', result_cache=None, tablebase=None):
+        """Takes as parameters the number of slots in the transposition table, its replacement policy and,
+        optionally, a ResultCache of positions searched before and a Tablebase of solved endgames, and
+        initializes the table, the killer moves and the node counter."""
+        self.__table = TranspositionTable(table_size, replacement)
+        self.__result_cache = result_cache
+        self.__tablebase = tablebase
+        self.__killers = {} # The two most recent quiet moves that caused a cutoff, for each ply
+        self.__nodes = 0
+        self.__deadline = None
+        self.__node_limit = None
+
+    def get_transposition_table(self):
+        """Takes no parameters and returns the transposition_table data member."""
+        return self.__table
+
+    def choose_move(self, game, max_depth=64, time_limit=None, node_limit=None):
+        """Takes the same parameters as search and returns the best move found, or None if the current
+        player has no move."""
+        return self.search(game, max_depth, time_limit, node_limit).best_move
+
+    def search(self, game, max_depth=64, time_limit=None, node_limit=None, root_moves=None):
+        """Takes as parameters a ChessVar game, the deepest depth to search to, the number of seconds the
+        search may take, the number of nodes it may visit and, optionally, the moves the search is limited to
+        at the root, which lets several searches share out the root moves. The method searches one ply deeper at a time
+        until the depth is reached or the time or node budget runs out, and returns a SearchResult holding
+        the best move of the deepest completed search, its score, that depth, the nodes visited and the
+        seconds taken. The game is searched with push and pop, so it is left as it was. If the engine has a
+        result cache holding an exact result for the position searched at least as deep, that result is
+        returned without searching. A position covered by the engine's tablebase is not searched either:
+        its best move and exact score are looked up."""
+        started = time.perf_counter()
+        self.__nodes = 0
+        self.__deadline = None if time_limit is None else started + time_limit
+        self.__node_limit = node_limit
+        self.__killers = {}
+
+        if root_moves is None:
+            moves = list(game.legal_moves())
+        else:
+            moves = [tuple(move) for move in root_moves]
+        best_move, best_score, completed_depth = (moves[0] if moves else None), 0, 0
+
+        if self.__tablebase is not None and root_moves is None and moves:
+            solved = self.__tablebase.best_move(game)
+            if solved is not None:
+                return SearchResult(solved[0], tablebase_score(solved[1], 0), max_depth, 0,
+                                    time.perf_counter() - started)
+
+        if self.__result_cache is not None and root_moves is None:
+            entry = self.__result_cache.probe_game(game)
+            if entry is not None and entry[1] >= max_depth and entry[3] == 'EXACT' and entry[4] in moves:
+                return SearchResult(entry[4], entry[2], entry[1], 0, time.perf_counter() - started)
+
+        if len(moves) > 1 or root_moves is not None and moves: # A single move needs no search unless its score is wanted
+            for depth in range(1, max_depth + 1):
+                try:
+                    score, move = self.__search_root(game, depth, moves, root_moves is None)
+                except SearchTimeout:
+                    break
+                best_move, best_score, completed_depth = move, score, depth
+                if abs(score) >= WIN_SCORE - max_depth: # The game is decided, so deeper searches won't change the move
+                    break
+
+        return SearchResult(best_move, best_score, completed_depth, self.__nodes, time.perf_counter() - started)
+
+    def __search_root(self, game, depth, moves, all_moves):
+        """Takes as parameters a ChessVar game, the depth to search to, the moves to search and whether they
+        are all of the current player's moves. The method returns the score of the best of the moves and the move."""
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_move = None
+        entry = self.__table.probe(game.get_position_hash()) # Its best move, from the last iteration, is searched first
+        for move in self.__ordered_moves(game, 0, entry):
+            if move not in moves:
+                continue
+            game.push(move)
+            try:
+                score = -self.__alpha_beta(game, depth - 1, -beta, -alpha, 1)
+            finally:
+                game.pop()
+            if best_move is None or score > alpha:
+                alpha, best_move = score, move
+        if all_moves: # Only a search of every move gives the position's value
+            self.__table.store(game.get_position_hash(), depth, alpha, 'EXACT', best_move)
+        return alpha, best_move
+
+    def __alpha_beta(self, game, depth, alpha, beta, ply):
+        """Takes as parameters a ChessVar game, the remaining depth, the alpha and beta bounds and the
+        distance from the root. The method returns the score of the position for the current player."""
+        self.__count_node()
+
+        if game.get_game_state() != 'UNFINISHED': # The player who just moved captured the last piece of a type
+            return -(WIN_SCORE - ply)
+        if self.__tablebase is not None:
+            plies = self.__tablebase.probe_game(game)
+            if plies is not None: # The position is solved, so it needs no search
+                return tablebase_score(plies, ply)
+        if depth <= 0:
+            return self.__quiescence(game, alpha, beta, ply)
+
+        key = game.get_position_hash()
+        entry = self.__table.probe(key)
+        if entry is not None and entry[1] >= depth:
+            value, bound = score_from_table(entry[2], ply), entry[3]
+            if bound == 'EXACT' or bound == 'LOWER' and value >= beta or bound == 'UPPER' and value <= alpha:
+                return value
+
+        original_alpha = alpha
+        best_score, best_move = None, None
+        for move, is_capture in self.__ordered_moves(game, ply, entry, with_captures=True):
+            game.push(move)
+            try:
+                score = -self.__alpha_beta(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.pop()
+            if best_score is None or score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not is_capture:
+                    self.__store_killer(move, ply)
+                break
+
+        if best_score is None: # The current player has no move
+            return 0
+
+        if best_score <= original_alpha:
+            bound = 'UPPER'
+        elif best_score >= beta:
+            bound = 'LOWER'
+        else:
+            bound = 'EXACT'
+        self.__table.store(key, depth, score_to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    def __quiescence(self, game, alpha, beta, ply):
+        """Takes as parameters a ChessVar game, the alpha and beta bounds and the distance from the root.
+        The method searches only captures, so that the position is not scored in the middle of an exchange,
+        and returns the score of the position for the current player."""
+        stand_pat = evaluate(game)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        for move in self.__ordered_moves(game, ply, captures_only=True):
+            self.__count_node()
+            game.push(move)
+            try:
+                if game.get_game_state() != 'UNFINISHED':
+                    score = WIN_SCORE - ply - 1
+                else:
+                    score = -self.__quiescence(game, -beta, -alpha, ply + 1)
+            finally:
+                game.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def __ordered_moves(self, game, ply, entry=None, with_captures=False, captures_only=False):
+        """Takes as parameters a ChessVar game, the distance from the root and the transposition table entry
+        of the position. The method returns the current player's moves in the order they should be searched:
+        the table's best move, then captures with the most valuable victim and least valuable attacker first,
+        then the killer moves, then the remaining moves. A capture that captures the last piece of a type
+        counts as the most valuable victim. With with_captures, each move is paired with whether it captures."""
+        pieces = piece_map(game)
+        capture_counts = game.get_capture_counts()
+        hash_move = entry[4] if entry is not None else None
+        killers = self.__killers.get(ply, ())
+        scored = []
+        for move in game.legal_moves():
+            victim = pieces.get(SQUARE_INDEX[move[1]])
+            if victim is not None:
+                if capture_counts[victim] == STARTING_COUNTS[victim] - 1:
+                    victim_value = WIN_SCORE
+                else:
+                    victim_value = PIECE_VALUES[victim.lower()]
+                order = 1000000 + victim_value * 10 - PIECE_VALUES[pieces[SQUARE_INDEX[move[0]]].lower()] // 10
+            elif captures_only:
+                continue
+            elif move in killers:
+                order = 500000 - killers.index(move)
+            else:
+                order = 0
+            if move == hash_move:
+                order = 10000000
+            scored.append((order, move, victim is not None))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        if with_captures:
+            return [(move, is_capture) for order, move, is_capture in scored]
+        return [move for order, move, is_capture in scored]
+
+    def __store_killer(self, move, ply):
+        """Takes as parameters a quiet move that caused a cutoff and the distance from the root, and keeps
+        it as one of the two killer moves for that ply."""
+        killers = self.__killers.get(ply, ())
+        if move not in killers:
+            self.__killers[ply] = (move,) + killers[:1]
+
+    def __count_node(self):
+        """Takes no parameters and counts a visited node. Every CHECK_INTERVAL nodes, and when the node
+        budget is used up, the method raises SearchTimeout if the search is out of time or nodes."""
+        self.__nodes += 1
+        if self.__node_limit is not None and self.__nodes >= self.__node_limit:
+            raise SearchTimeout()
+        if self.__deadline is not None and self.__nodes % CHECK_INTERVAL == 0 and time.perf_counter() >= self.__deadline:
+            raise SearchTimeout()
@@ -0,0 +1,428 @@
+# Description: This program fuzzes ChessVar by playing seeded random games and comparing every result with
+# ReferenceGame, a separate implementation of the variant's rules written for clarity rather than speed: it
+# keeps the board as a list of 64 squares and checks each move by its geometry, walking along a line square
+# by square, with no bitboards or attack tables. The rules it follows include the ones ChessVar keeps on
+# purpose: there is no castling, en passant or pawn promotion, a pawn moving two squares doesn't check the
+# square it passes over, a pawn on the last row has no moves, and a game is won by capturing all of the
+# opponent's pieces of one type. Each game is a list of actions: mostly legal moves, along with moves
+# between random squares, moves naming squares that aren't on the board, moves made through
+# make_encoded_move, and moves made with push and taken back with pop. After each action the return values,
+# boards, game states, players, capture counts and turn counts are compared, and so, optionally, are the
+# sets of legal moves. A game that differs is shrunk by delta debugging to the fewest actions that still
+# differ, which is reported with the seed. The same seed always gives the same game.
+#
+#     python fuzz.py --games 100000 --workers 8
+#     python fuzz.py --self-test     # checks that a deliberately broken reference is caught and shrunk
+#     python fuzz.py --replay '[["move", "e2", "e4"], ["random", "e7", "e4"]]'
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .chess_var import SQUARE_NAMES, ChessVar, decode_move, encode_move
+
+
+# The starting position for ReferenceGame, rank 1 first, with the white pieces in lower case as in ChessVar.
+REFERENCE_START = ('rnbqkbnr', 'pppppppp', '--------', '--------', '--------', '--------', 'PPPPPPPP', 'RNBQKBNR')
+FILES = 'abcdefgh'
+RANKS = '12345678'
+
+# The (row, column) steps of the knight and the king, and the line directions of the rook and bishop.
+KNIGHT_STEPS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_STEPS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+ROOK_STEPS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+BISHOP_STEPS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+# Squares that aren't on the board, given to make_move to check that they are rejected.
+BAD_SQUARES = ('', 'a', 'a0', 'a9', 'i1', 'z9', 'e22', 'E2', '2e', ' e2', 'e2 ', '--')
+
+# The kinds of action, and how often each is chosen: a legal move made through make_move, a legal move made
+# through make_encoded_move, a legal move made with push and taken back with pop, a move between two random
+# squares, and a move naming a square that isn't on the board.
+ACTION_WEIGHTS = (('move', 60), ('encoded', 15), ('push', 10), ('random', 12), ('bad', 3))
+ACTION_KINDS = tuple(kind for kind, weight in ACTION_WEIGHTS for number in range(weight))
+
+DEFAULT_MAX_ACTIONS = 300
+
+
+def square_name(row, col):
+    """Takes as parameters a row and column of the board and returns the square in algebraic notation."""
+    return FILES[col] + RANKS[row]
+
+
+def other_player(player):
+    """Takes as a parameter a player and returns the other player."""
+    return 'Black' if player == 'White' else 'White'
+
+
+def parse_square(square):
+    """Takes as a parameter a square in algebraic notation and returns its (row, column), or None if it is
+    not a square on the board."""
+    if not isinstance(square, str) or len(square) != 2 or square[0] not in FILES or square[1] not in RANKS:
+        return None
+    return RANKS.index(square[1]), FILES.index(square[0])
+
+
+class ReferenceGame:
+    """A class representing a game of the variant played by the rules as plainly as they can be written. It
+    has the methods of ChessVar that the fuzzer compares."""
+    def __init__(self, check_passed_square=False):
+        """Takes as a parameter whether a pawn's two square move checks the square it passes over, which
+        ChessVar doesn't do. Setting it breaks the reference on purpose, so that the fuzzer's self-test has a
+        difference to find. The method initializes the starting position."""
+        self.__board = [list(row) for row in REFERENCE_START]
+        self.__totals = {}
+        for row in REFERENCE_START:
+            for game_piece in row:
+                if game_piece != '-':
+                    self.__totals[game_piece] = self.__totals.get(game_piece, 0) + 1
+        self.__captured = {game_piece: 0 for game_piece in self.__totals}
+        self.__current_player = 'White'
+        self.__game_state = 'UNFINISHED'
+        self.__turn_counts = {'White': 0, 'Black': 0}
+        self.__check_passed_square = check_passed_square
+        self.__legal_moves = {} # The legal moves of each player found since the last move
+
+    def get_game_board(self):
+        """Takes no parameters and returns a copy of the board as a list of eight rows, rank 1 first."""
+        return [row[:] for row in self.__board]
+
+    def get_game_state(self):
+        """Takes no parameters and returns the game state."""
+        return self.__game_state
+
+    def get_current_player(self):
+        """Takes no parameters and returns the current player."""
+        return self.__current_player
+
+    def get_capture_counts(self):
+        """Takes no parameters and returns a dictionary of the number of each game piece captured."""
+        return dict(self.__captured)
+
+    def get_white_turn_count(self):
+        """Takes no parameters and returns the number of moves the white player has made."""
+        return self.__turn_counts['White']
+
+    def get_black_turn_count(self):
+        """Takes no parameters and returns the number of moves the black player has made."""
+        return self.__turn_counts['Black']
+
+    def owner(self, game_piece):
+        """Takes as a parameter a game piece or '-' and returns the player it belongs to, or None."""
+        if game_piece == '-':
+            return None
+        return 'White' if game_piece.islower() else 'Black'
+
+    def is_legal(self, start, end, player=None):
+        """Takes as parameters the (row, column) of the starting square and ending square and the player
+        moving, which defaults to the current player, and returns True if the player may move the piece on
+        the starting square to the ending square."""
+        if self.__game_state != 'UNFINISHED':
+            return False
+        if player is None:
+            player = self.__current_player
+        (start_row, start_col), (end_row, end_col) = start, end
+        game_piece = self.__board[start_row][start_col]
+        target = self.__board[end_row][end_col]
+        if self.owner(game_piece) != player or self.owner(target) == player:
+            return False
+        row_step, col_step = end_row - start_row, end_col - start_col
+        kind = game_piece.lower()
+
+        if kind == 'p':
+            forward = 1 if player == 'White' else -1
+            home_row = 1 if player == 'White' else 6
+            if col_step == 0 and target == '-':
+                if row_step == forward:
+                    return True
+                if row_step == 2 * forward and start_row == home_row:
+                    return not self.__check_passed_square or self.__board[start_row + forward][start_col] == '-'
+                return False
+            return abs(col_step) == 1 and row_step == forward and target != '-'
+        if kind == 'n':
+            return (row_step, col_step) in KNIGHT_STEPS
+        if kind == 'k':
+            return (row_step, col_step) in KING_STEPS
+
+        straight = row_step == 0 or col_step == 0
+        diagonal = abs(row_step) == abs(col_step)
+        if kind == 'r' and not straight or kind == 'b' and not diagonal or kind == 'q' and not (straight or diagonal):
+            return False
+        row_direction = (row_step > 0) - (row_step < 0)
+        col_direction = (col_step > 0) - (col_step < 0)
+        row, col = start_row + row_direction, start_col + col_direction
+        while (row, col) != (end_row, end_col): # Every square strictly between must be vacant
+            if self.__board[row][col] != '-':
+                return False
+            row, col = row + row_direction, col + col_direction
+        return True
+
+    def make_move(self, start_square, end_square):
+        """Takes as parameters the starting square and ending square in algebraic notation, makes the move
+        if it is legal and returns True, or returns False and changes nothing."""
+        start, end = parse_square(start_square), parse_square(end_square)
+        if start is None or end is None or start == end or not self.is_legal(start, end):
+            return False
+        game_piece = self.__board[start[0]][start[1]]
+        target = self.__board[end[0]][end[1]]
+        self.__board[start[0]][start[1]] = '-'
+        self.__board[end[0]][end[1]] = game_piece
+        if target != '-':
+            self.__captured[target] += 1
+            if self.__captured[target] == self.__totals[target]: # The last piece of its type was captured
+                self.__game_state = 'WHITE_WON' if self.__current_player == 'White' else 'BLACK_WON'
+        self.__turn_counts[self.__current_player] += 1
+        self.__current_player = other_player(self.__current_player)
+        self.__legal_moves = {}
+        return True
+
+    def legal_moves(self, player=None):
+        """Takes as a parameter the player whose moves are wanted, which defaults to the current player, and
+        returns the set of the player's legal moves, each a tuple of the starting square and ending square in
+        algebraic notation. The candidate squares of each piece are found from its steps and lines, and each
+        is checked with is_legal. The set is kept until the next move, so it must not be changed."""
+        if player is None:
+            player = self.__current_player
+        if player in self.__legal_moves:
+            return self.__legal_moves[player]
+        moves = set()
+        white = player == 'White'
+        forward = 1 if white else -1
+        for row in range(8):
+            for col in range(8):
+                game_piece = self.__board[row][col]
+                if game_piece == '-' or game_piece.islower() != white:
+                    continue
+                kind = game_piece.lower()
+                if kind == 'p':
+                    candidates = [(row + row_step, col + col_step) for row_step in (forward, 2 * forward) for col_step in (-1, 0, 1)]
+                elif kind in 'nk':
+                    candidates = [(row + row_step, col + col_step) for row_step, col_step in (KNIGHT_STEPS if kind == 'n' else KING_STEPS)]
+                else:
+                    candidates = []
+                    for row_step, col_step in (ROOK_STEPS if kind == 'r' else BISHOP_STEPS if kind == 'b' else ROOK_STEPS + BISHOP_STEPS):
+                        end_row, end_col = row + row_step, col + col_step
+                        while 0 <= end_row < 8 and 0 <= end_col < 8: # Walks along the line up to the first piece
+                            candidates.append((end_row, end_col))
+                            if self.__board[end_row][end_col] != '-':
+                                break
+                            end_row, end_col = end_row + row_step, end_col + col_step
+                for end_row, end_col in candidates:
+                    if 0 <= end_row < 8 and 0 <= end_col < 8 and self.is_legal((row, col), (end_row, end_col), player):
+                        moves.add((square_name(row, col), square_name(end_row, end_col)))
+        self.__legal_moves[player] = moves
+        return moves
+
+
+def compare(game, reference, check_moves):
+    """Takes as parameters a ChessVar game, a ReferenceGame that has been given the same actions and whether
+    to compare their legal moves. The legal moves of both players are compared as legal_moves and
+    legal_encoded_moves give them, and as get_destinations gives them square by square, which checks that
+    ChessVar's destinations are kept up to date as moves are made and taken back. The function returns a
+    description of the first difference between them, or None if they agree."""
+    for name in ('get_game_state', 'get_current_player', 'get_white_turn_count', 'get_black_turn_count',
+                 'get_capture_counts', 'get_game_board'):
+        value, expected = getattr(game, name)(), getattr(reference, name)()
+        if value != expected:
+            return name + ' gave ' + repr(value) + ', expected ' + repr(expected)
+    if not check_moves:
+        return None
+    expected = {player: reference.legal_moves(player) for player in ('White', 'Black')}
+    found = {
+        'legal_moves': set(game.legal_moves()),
+        'legal_moves of the other player': set(game.legal_moves(other_player(game.get_current_player()))),
+        'legal_encoded_moves': {decode_move(move) for move in game.legal_encoded_moves()},
+        'get_destinations': {(start_square, end_square) for start_square in SQUARE_NAMES
+                             for end_square in game.get_destinations(start_square)},
+    }
+    for name, moves in found.items():
+        if name == 'legal_moves of the other player':
+            wanted = expected[other_player(reference.get_current_player())]
+        elif name == 'get_destinations':
+            wanted = expected['White'] | expected['Black']
+        else:
+            wanted = expected[reference.get_current_player()]
+        if moves != wanted:
+            return name + ' differ: extra ' + repr(sorted(moves - wanted)) + ', missing ' + repr(sorted(wanted - moves))
+    return None
+
+
+def apply_action(game, reference, action):
+    """Takes as parameters a ChessVar game, a ReferenceGame and an action, a tuple of its kind and its starting
+    and ending squares, and gives the action to both. The function returns a description of how their return
+    values differ, or None if they agree."""
+    kind, start_square, end_square = action
+    expected = reference.make_move(start_square, end_square)
+    if kind == 'encoded':
+        made = game.make_encoded_move(encode_move(start_square, end_square))
+    elif kind == 'push':
+        before = game.to_fen(), game.get_position_hash()
+        pushed = game.push((start_square, end_square))
+        popped = game.pop()
+        if (game.to_fen(), game.get_position_hash()) != before:
+            return 'pop did not restore the position after pushing ' + start_square + end_square
+        if pushed != expected or pushed and popped != (start_square, end_square):
+            return 'push returned ' + repr(pushed) + ' and pop ' + repr(popped) + ', expected push to return ' + repr(expected)
+        made = game.make_move(start_square, end_square) if pushed else False # Makes the move for good, to follow the reference
+    else:
+        made = game.make_move(start_square, end_square)
+    if made != expected:
+        return kind + ' ' + repr((start_square, end_square)) + ' returned ' + repr(made) + ', expected ' + repr(expected)
+    return None
+
+
+def play_game(seed, max_actions=DEFAULT_MAX_ACTIONS, check_moves=True, check_passed_square=False):
+    """Takes as parameters a seed, the most actions to play, whether to compare legal moves after each action
+    and whether the reference checks the square a pawn passes over. The function plays the seed's game in a
+    new ChessVar game and a new ReferenceGame, choosing legal moves from the reference's, so the actions
+    depend only on the seed. The game stops once it is won, the current player has no move, or the two
+    differ. The function returns a tuple of the list of actions played and the index of the action after
+    which they first differ and a description of the difference, or None if they never differ."""
+    generator = random.Random(seed)
+    game, reference = ChessVar(), ReferenceGame(check_passed_square)
+    actions = []
+    while len(actions) < max_actions and reference.get_game_state() == 'UNFINISHED':
+        kind = generator.choice(ACTION_KINDS)
+        if kind == 'random':
+            action = (kind, square_name(generator.randrange(8), generator.randrange(8)),
+                      square_name(generator.randrange(8), generator.randrange(8)))
+        elif kind == 'bad':
+            good = square_name(generator.randrange(8), generator.randrange(8))
+            bad = generator.choice(BAD_SQUARES)
+            action = (kind, good, bad) if generator.random() < 0.5 else (kind, bad, good)
+        else:
+            moves = sorted(reference.legal_moves()) # Sorted, since the order of a set can change between runs
+            if not moves:
+                break
+            action = (kind,) + generator.choice(moves)
+        actions.append(action)
+        difference = apply_action(game, reference, action) or compare(game, reference, check_moves)
+        if difference is not None:
+            return actions, (len(actions) - 1, difference)
+    return actions, None
+
+
+def find_difference(actions, check_moves=True, check_passed_square=False):
+    """Takes as parameters a list of actions, whether to compare legal moves after each action and whether
+    the reference checks the square a pawn passes over. The actions are given to a new ChessVar game and a
+    new ReferenceGame, and the function returns a tuple of the index of the first action after which they
+    differ and a description of the difference, or None if they never differ."""
+    game, reference = ChessVar(), ReferenceGame(check_passed_square)
+    for index, action in enumerate(actions):
+        difference = apply_action(game, reference, action) or compare(game, reference, check_moves)
+        if difference is not None:
+            return index, difference
+    return None
+
+
+def shrink(actions, differs):
+    """Takes as parameters a list of actions that shows a difference and a function that takes a list of
+    actions and returns True if it still shows one. The function returns a shorter list that still shows a
+    difference, from which no single action can be removed: delta debugging first removes ever smaller
+    chunks of the list, then single actions."""
+    chunks = 2
+    while len(actions) >= 2:
+        size = -(-len(actions) // chunks) # Rounded up
+        for start in range(0, len(actions), size):
+            candidate = actions[:start] + actions[start + size:]
+            if differs(candidate):
+                actions = candidate
+                chunks = max(chunks - 1, 2)
+                break
+        else:
+            if size == 1:
+                break
+            chunks = min(chunks * 2, len(actions))
+    return actions
+
+
+def fuzz_seeds(seeds, max_actions, check_moves, check_passed_square=False):
+    """Takes as parameters a list of seeds, the most actions in each game, whether to compare legal moves and
+    whether the reference is broken on purpose for the self-test. The function plays the game of each seed,
+    shrinks each one that differs, and returns a tuple of the number of games, the number of actions and
+    the list of differences, each a dictionary of the seed, the shrunk actions and the difference they show.
+    It runs in the worker processes."""
+    actions_played = 0
+    differences = []
+    for seed in seeds:
+        actions, found = play_game(seed, max_actions, check_moves, check_passed_square)
+        actions_played += len(actions)
+        if found is None:
+            continue
+        actions = shrink(actions, lambda candidate: find_difference(candidate, check_moves, check_passed_square) is not None)
+        differences.append({'seed': seed, 'actions': [list(action) for action in actions],
+                            'difference': find_difference(actions, check_moves, check_passed_square)[1]})
+    return len(seeds), actions_played, differences
+
+
+def fuzz(games, seed=0, workers=1, max_actions=DEFAULT_MAX_ACTIONS, check_moves=True, check_passed_square=False,
+         chunk_size=50):
+    """Takes as parameters the number of games, the first seed, the number of worker processes, the most
+    actions in each game, whether to compare legal moves after each action, whether to break the reference
+    on purpose and the number of games given to a worker at a time. The function fuzzes the games and returns
+    a dictionary of the games and actions played, the games per second and the differences found."""
+    started = time.perf_counter()
+    seeds = list(range(seed, seed + games))
+    chunks = [seeds[i:i + chunk_size] for i in range(0, games, chunk_size)]
+    totals = {'games': 0, 'actions': 0, 'differences': []}
+
+    def add(result):
+        played, actions, differences = result
+        totals['games'] += played
+        totals['actions'] += actions
+        totals['differences'].extend(differences)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fuzz_seeds, chunk, max_actions, check_moves, check_passed_square) for chunk in chunks]
+            for future in futures:
+                add(future.result())
+    else:
+        for chunk in chunks:
+            add(fuzz_seeds(chunk, max_actions, check_moves, check_passed_square))
+
+    elapsed = time.perf_counter() - started
+    totals['seconds'] = elapsed
+    totals['games_per_second'] = totals['games'] / (elapsed or 1e-9)
+    totals['actions_per_second'] = totals['actions'] / (elapsed or 1e-9)
+    return totals
+
+
+def main():
+    """Takes no parameters and fuzzes the number of games given on the command line, printing the results as
+    JSON. The exit status is 1 if a difference was found, or, with --self-test, if the broken reference was
+    not caught. With --replay, the given actions are played instead and any difference is printed."""
+    parser = argparse.ArgumentParser(description='Fuzz ChessVar against a reference implementation of the rules.')
+    parser.add_argument('--games', type=int, default=1000, help='number of seeded games to play')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (0 for one per CPU)')
+    parser.add_argument('--max-actions', type=int, default=DEFAULT_MAX_ACTIONS, help='most actions in each game')
+    parser.add_argument('--no-move-check', action='store_true', help="don't compare legal moves after each action")
+    parser.add_argument('--self-test', action='store_true',
+                        help='break the reference on purpose and check that the difference is found and shrunk')
+    parser.add_argument('--replay', help='a JSON list of actions, such as a shrunk difference, to play instead')
+    arguments = parser.parse_args()
+
+    if arguments.replay is not None: # Plays one list of actions and prints the difference it shows, if any
+        found = find_difference([tuple(action) for action in json.loads(arguments.replay)],
+                                not arguments.no_move_check, arguments.self_test)
+        print(json.dumps({'difference': found and found[1], 'action': found and found[0]}, indent=2))
+        return 0 if found is None else 1
+
+    workers = arguments.workers or os.cpu_count() or 1
+    results = fuzz(arguments.games, arguments.seed, workers, arguments.max_actions, not arguments.no_move_check,
+                   check_passed_square=arguments.self_test)
+    if arguments.self_test:
+        results['ok'] = bool(results['differences'])
+    else:
+        results['ok'] = not results['differences']
+    print(json.dumps(results, indent=2))
+    return 0 if results['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
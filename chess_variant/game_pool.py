@@ -0,0 +1,150 @@
+# Description: This program creates a GamePool class, which holds many ChessVar games in one shared
+# bytearray, and a PooledGame class, which is a small handle to one game in the pool. Each game is stored
+# as the 35 byte packed position made by ChessVar's to_bytes method, so a pooled game costs its record
+# and a two-slot handle instead of a whole ChessVar object. A move unpacks the game into a ChessVar, makes
+# the move and packs it back; get_game_state and get_current_player read the record directly.
+
+from array import array
+
+from .chess_var import POSITION_SIZE, STARTING_TOTALS, ChessVar
+
+
+STARTING_RECORD = ChessVar().to_bytes()
+COUNTS_OFFSET = 24 # The offset of the capture counts in a record, after the occupancy and piece codes
+FLAGS_OFFSET = 30 # The offset of the flag byte, which is 1 when the black player is the current player
+
+
+class GamePool:
+    """A class representing a pool of ChessVar games stored back to back in one bytearray. Released
+    records are reused by later games, so the pool only grows to the most games held at once."""
+    def __init__(self):
+        """Takes no parameters and initializes an empty pool."""
+        self.__records = bytearray()
+        self.__free = array('L') # The indexes of records released for reuse
+        self.__in_use = bytearray() # 1 for each record holding a game, and 0 for each released record
+
+    def __len__(self):
+        """Takes no parameters and returns the number of games held in the pool."""
+        return len(self.__records) // POSITION_SIZE - len(self.__free)
+
+    def get_size_in_bytes(self):
+        """Takes no parameters and returns the number of bytes used by the records of the pool."""
+        return len(self.__records)
+
+    def new_game(self, game=None):
+        """Takes as a parameter an optional ChessVar game to copy into the pool, and returns a PooledGame
+        for a new game in the pool, which starts from the starting position if no game is given."""
+        return self.__add_record(STARTING_RECORD if game is None else game.to_bytes())
+
+    def copy_game(self, index):
+        """Takes as a parameter the index of a record, and returns a PooledGame for a new game in the same
+        position. The record is copied byte for byte, without unpacking it."""
+        self.__check(index)
+        offset = index * POSITION_SIZE
+        return self.__add_record(self.__records[offset:offset + POSITION_SIZE])
+
+    def release(self, index):
+        """Takes as a parameter the index of a record whose game is no longer needed, and frees the record
+        for a later game to reuse. Releasing a record that is already free raises ValueError, since the
+        record would otherwise be handed to two later games."""
+        self.__check(index)
+        self.__in_use[index] = 0
+        self.__free.append(index)
+
+    def load(self, index):
+        """Takes as a parameter the index of a record and returns a ChessVar game unpacked from it. As for
+        the methods below, an index that is not a game in the pool raises ValueError."""
+        self.__check(index)
+        return ChessVar.from_bytes(self.__records, index * POSITION_SIZE)
+
+    def store(self, index, game):
+        """Takes as parameters the index of a record and a ChessVar game, and packs the game into the record."""
+        self.__check(index)
+        offset = index * POSITION_SIZE
+        self.__records[offset:offset + POSITION_SIZE] = game.to_bytes()
+
+    def get_game_state(self, index):
+        """Takes as a parameter the index of a record and returns its game state (UNFINISHED, WHITE_WON or
+        BLACK_WON), found from the capture counts in the record without unpacking the rest of it."""
+        self.__check(index)
+        offset = index * POSITION_SIZE + COUNTS_OFFSET
+        game_state = 'UNFINISHED'
+        for piece_index in range(len(STARTING_TOTALS)):
+            count = self.__records[offset + (piece_index >> 1)] >> (4 * (piece_index & 1)) & 15
+            if count == STARTING_TOTALS[piece_index]:
+                game_state = 'BLACK_WON' if piece_index < 6 else 'WHITE_WON'
+        return game_state
+
+    def get_current_player(self, index):
+        """Takes as a parameter the index of a record and returns its current player, White or Black."""
+        self.__check(index)
+        if self.__records[index * POSITION_SIZE + FLAGS_OFFSET]:
+            return 'Black'
+        return 'White'
+
+    def __add_record(self, record):
+        """Takes as a parameter a packed position, stores it in a free record or at the end of the pool,
+        and returns a PooledGame for it."""
+        if self.__free:
+            index = self.__free.pop()
+            self.__records[index * POSITION_SIZE:(index + 1) * POSITION_SIZE] = record
+            self.__in_use[index] = 1
+        else:
+            index = len(self.__records) // POSITION_SIZE
+            self.__records += record
+            self.__in_use.append(1)
+        return PooledGame(self, index)
+
+    def __check(self, index):
+        """Takes as a parameter the index of a record and raises ValueError unless it holds a game."""
+        if not isinstance(index, int) or not 0 <= index < len(self.__in_use) or not self.__in_use[index]:
+            raise ValueError('record ' + repr(index) + ' does not hold a game in the pool')
+
+
+class PooledGame:
+    """A class representing one game held in a GamePool. It has the same make_move, get_game_state and
+    get_current_player methods as ChessVar, and keeps only its pool and the index of its record."""
+    __slots__ = ('__pool', '__index')
+
+    def __init__(self, pool, index):
+        """Takes as parameters the pool holding the game and the index of the game's record."""
+        self.__pool = pool
+        self.__index = index
+
+    def make_move(self, start_square, end_square):
+        """Takes as parameters the start_square and end_square in algebraic notation, and makes the move
+        in the same way as ChessVar's make_move, returning True if the move was made and False otherwise."""
+        game = self.__pool.load(self.__index)
+        if not game.make_move(start_square, end_square):
+            return False
+        self.__pool.store(self.__index, game)
+        return True
+
+    def get_game_state(self):
+        """Takes no parameters and returns the state of the game (UNFINISHED, WHITE_WON or BLACK_WON)."""
+        return self.__pool.get_game_state(self.__index)
+
+    def get_current_player(self):
+        """Takes no parameters and returns the current player, White or Black."""
+        return self.__pool.get_current_player(self.__index)
+
+    def get_game_board(self):
+        """Takes no parameters and returns the game board as a list of eight rows of game pieces."""
+        return self.__pool.load(self.__index).get_game_board()
+
+    def to_chess_var(self):
+        """Takes no parameters and returns the game as a separate ChessVar object."""
+        return self.__pool.load(self.__index)
+
+    def copy(self):
+        """Takes no parameters and returns a new PooledGame in the same pool and the same position."""
+        return self.__pool.copy_game(self.__index)
+
+    def release(self):
+        """Takes no parameters and gives the game's record back to the pool. The handle forgets the record, so
+        releasing it again, or using it after it is released, raises ValueError rather than reaching a record
+        that may by then hold another game."""
+        if self.__index is None:
+            raise ValueError('the game has already been released')
+        self.__pool.release(self.__index)
+        self.__index = None
@@ -0,0 +1,309 @@
+# Description: This program adds opt-in instrumentation to ChessVar. When an Instrumentation object is
+# enabled, it replaces the chosen ChessVar methods on the class with wrappers that count the calls and time
+# them, and counts the moves is_valid_move checks for each type of piece along with the reason each
+# rejected move was rejected, and the reason make_move rejected a move. When it is disabled the original
+# methods are put back, so a program that never enables it, or has disabled it, runs the same code as
+# before. A SamplingProfiler samples the call stack of a thread from a background thread and writes the
+# samples as folded stacks, the text format read by flamegraph.pl and speedscope.
+#
+#     python instrumentation.py games.log --profile chess.folded
+
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+from .attack_tables import BISHOP_LINES, ROOK_LINES
+from .chess_var import PIECES, SQUARE_INDEX, ChessVar
+
+
+# The methods instrumented by default. Private methods are named as they are written in the class.
+DEFAULT_METHODS = ('make_move', 'is_in_game_board', 'is_valid_move', 'update_captured_piece',
+                   'update_game_state', '__piece_at', '__place_piece', '__remove_piece', 'push', 'pop')
+
+# The reasons is_valid_move and make_move reject a move, in the order they are checked.
+VALIDATION_REJECTIONS = ('off_board', 'empty_square', 'own_piece', 'blocked', 'not_reachable')
+MOVE_REJECTIONS = ('game_over', 'invalid_square', 'not_players_piece', 'invalid_move')
+
+# The lines each sliding piece moves along, by square.
+SLIDING_LINES = {'r': ROOK_LINES.__getitem__, 'b': BISHOP_LINES.__getitem__,
+                 'q': lambda square: ROOK_LINES[square] | BISHOP_LINES[square]}
+
+
+def attribute_name(method):
+    """Takes as a parameter the name of a ChessVar method as written in the class, and returns the name
+    of the class attribute holding it, which is mangled for a private method."""
+    return '_ChessVar' + method if method.startswith('__') and not method.endswith('__') else method
+
+
+def piece_on(game, square):
+    """Takes as parameters a ChessVar game and the bit position of a square, and returns the game piece on
+    the square, or None if the square is vacant."""
+    for piece in PIECES:
+        if game.get_piece_board(piece) >> square & 1:
+            return piece
+    return None
+
+
+class Instrumentation:
+    """A class representing the instrumentation of ChessVar: the methods it wraps and the counts and times
+    it has collected. Only one Instrumentation can be enabled at a time, since it changes the class."""
+    __active = None  # The enabled Instrumentation, if any
+
+    def __init__(self, methods=DEFAULT_METHODS):
+        """Takes as a parameter the names of the ChessVar methods to count and time, and initializes the
+        empty statistics. Nothing is changed until enable is called."""
+        for method in methods:
+            if not callable(getattr(ChessVar, attribute_name(method), None)):
+                raise ValueError('ChessVar has no method ' + repr(method))
+        self.__methods = tuple(methods)
+        self.__originals = {}  # attribute name -> original function, while enabled
+        self.reset()
+
+    def reset(self):
+        """Takes no parameters and sets every count and time back to zero."""
+        self.__method_stats = {method: [0, 0.0] for method in self.__methods}  # method -> [calls, seconds]
+        self.__validations = {piece: [0, 0, 0] for piece in PIECES}  # piece -> [checked, accepted, captures]
+        self.__validation_rejections = dict.fromkeys(VALIDATION_REJECTIONS, 0)
+        self.__move_rejections = dict.fromkeys(MOVE_REJECTIONS, 0)
+
+    def is_enabled(self):
+        """Takes no parameters and returns True if the instrumentation is enabled."""
+        return bool(self.__originals)
+
+    def enable(self):
+        """Takes no parameters and replaces the instrumented methods of ChessVar with wrappers that collect
+        the statistics. Raises RuntimeError if another Instrumentation is enabled."""
+        if Instrumentation.__active is self:
+            return
+        if Instrumentation.__active is not None:
+            raise RuntimeError('another Instrumentation is already enabled')
+        Instrumentation.__active = self
+        for method in self.__methods:
+            name = attribute_name(method)
+            original = ChessVar.__dict__[name]
+            self.__originals[name] = original
+            if method == 'is_valid_move':
+                wrapper = self.__wrap_is_valid_move(original)
+            elif method == 'make_move':
+                wrapper = self.__wrap_make_move(original)
+            else:
+                wrapper = self.__wrap(original, self.__method_stats[method])
+            setattr(ChessVar, name, wrapper)
+
+    def disable(self):
+        """Takes no parameters and puts the original methods of ChessVar back. The statistics are kept."""
+        for name, original in self.__originals.items():
+            setattr(ChessVar, name, original)
+        self.__originals = {}
+        if Instrumentation.__active is self:
+            Instrumentation.__active = None
+
+    def __enter__(self):
+        """Takes no parameters, enables the instrumentation and returns it, for use in a with statement."""
+        self.enable()
+        return self
+
+    def __exit__(self, *exception):
+        """Takes the exception details of the with statement and disables the instrumentation."""
+        self.disable()
+
+    def get_method_stats(self):
+        """Takes no parameters and returns a dictionary from each instrumented method to a dictionary of its
+        calls, its total seconds and its mean microseconds per call. The times include the methods it calls."""
+        return {method: {'calls': calls, 'seconds': seconds, 'microseconds_per_call': seconds * 1e6 / calls if calls else 0.0}
+                for method, (calls, seconds) in self.__method_stats.items()}
+
+    def get_validation_counts(self):
+        """Takes no parameters and returns a dictionary from each game piece to a dictionary of the moves
+        is_valid_move checked for it, how many it accepted and how many of those were captures. Moves from a
+        vacant square or off the board are not counted here, only in the rejections."""
+        return {piece: {'checked': checked, 'accepted': accepted, 'captures': captures}
+                for piece, (checked, accepted, captures) in self.__validations.items() if checked}
+
+    def get_validation_rejections(self):
+        """Takes no parameters and returns a dictionary from each reason is_valid_move rejects a move to the
+        number of moves rejected for it."""
+        return dict(self.__validation_rejections)
+
+    def get_move_rejections(self):
+        """Takes no parameters and returns a dictionary from each reason make_move rejects a move to the
+        number of moves rejected for it."""
+        return dict(self.__move_rejections)
+
+    def report(self):
+        """Takes no parameters and returns every statistic in one dictionary, ready to print as JSON."""
+        return {'methods': self.get_method_stats(), 'validations': self.get_validation_counts(),
+                'validation_rejections': self.get_validation_rejections(),
+                'move_rejections': self.get_move_rejections()}
+
+    def __wrap(self, original, stats):
+        """Takes as parameters a method and its [calls, seconds] list, and returns a wrapper that counts and
+        times each call of the method."""
+        perf_counter = time.perf_counter
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                stats[0] += 1
+                stats[1] += perf_counter() - started
+        return timed
+
+    def __wrap_is_valid_move(self, original):
+        """Takes as a parameter the is_valid_move method and returns a wrapper that also counts the move
+        for the type of piece moved and, if the move is rejected, the reason."""
+        timed = self.__wrap(original, self.__method_stats['is_valid_move'])
+        validations, rejections = self.__validations, self.__validation_rejections
+
+        @functools.wraps(original)
+        def is_valid_move(game, start_row, start_col, end_row, end_col):
+            if not (0 <= start_row < 8 and 0 <= start_col < 8 and 0 <= end_row < 8 and 0 <= end_col < 8):
+                rejections['off_board'] += 1
+                return timed(game, start_row, start_col, end_row, end_col)
+            start, end = start_row * 8 + start_col, end_row * 8 + end_col
+            game_piece, target = piece_on(game, start), piece_on(game, end)
+            valid = timed(game, start_row, start_col, end_row, end_col)
+            if game_piece is None:
+                rejections['empty_square'] += 1
+                return valid
+            counts = validations[game_piece]
+            counts[0] += 1
+            if valid:
+                counts[1] += 1
+                if target is not None:
+                    counts[2] += 1
+            elif target is not None and target.islower() == game_piece.islower():
+                rejections['own_piece'] += 1
+            elif SLIDING_LINES.get(game_piece.lower(), lambda square: 0)(start) >> end & 1:
+                rejections['blocked'] += 1 # On one of the piece's lines, so only a piece in between can stop it
+            else:
+                rejections['not_reachable'] += 1
+            return valid
+        return is_valid_move
+
+    def __wrap_make_move(self, original):
+        """Takes as a parameter the make_move method and returns a wrapper that also counts the reason for
+        each rejected move. The wrapper returns what make_move returns for any squares, including ones that
+        are not squares on the board."""
+        timed = self.__wrap(original, self.__method_stats['make_move'])
+        rejections = self.__move_rejections
+
+        @functools.wraps(original)
+        def make_move(game, start_square, end_square):
+            if timed(game, start_square, end_square):
+                return True
+            if game.get_game_state() != 'UNFINISHED':
+                rejections['game_over'] += 1
+            else:
+                start = SQUARE_INDEX.get(start_square) # Looked up as make_move does, so any value is answered
+                if start is None or SQUARE_INDEX.get(end_square) is None:
+                    rejections['invalid_square'] += 1
+                else:
+                    game_piece = piece_on(game, start)
+                    if game_piece is None or game_piece.islower() != (game.get_current_player() == 'White'):
+                        rejections['not_players_piece'] += 1
+                    else:
+                        rejections['invalid_move'] += 1
+            return False
+        return make_move
+
+
+class SamplingProfiler:
+    """A class representing a sampling profiler, which records the call stack of one thread at a fixed
+    interval from a background thread. Sampling costs the profiled thread nothing between samples, but the
+    samples are only as frequent as the interpreter lets the background thread run (every five
+    milliseconds by default, see sys.setswitchinterval)."""
+    def __init__(self, interval=0.001):
+        """Takes as a parameter the seconds between samples and initializes the empty samples."""
+        self.__interval = interval
+        self.__samples = {}  # folded stack -> number of samples
+        self.__thread = None
+        self.__stopping = threading.Event()
+
+    def get_samples(self):
+        """Takes no parameters and returns the samples data member, a dictionary from each folded stack,
+        the functions from the outermost call inward separated by semicolons, to its number of samples."""
+        return self.__samples
+
+    def start(self, thread_id=None):
+        """Takes as a parameter the identifier of the thread to profile, which defaults to the calling
+        thread, and starts sampling it."""
+        if self.__thread is not None:
+            raise RuntimeError('the profiler is already running')
+        target = threading.get_ident() if thread_id is None else thread_id
+        self.__stopping.clear()
+        self.__thread = threading.Thread(target=self.__sample, args=(target,), name='sampling-profiler', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Takes no parameters and stops sampling."""
+        if self.__thread is not None:
+            self.__stopping.set()
+            self.__thread.join()
+            self.__thread = None
+
+    def __enter__(self):
+        """Takes no parameters, starts sampling the calling thread and returns the profiler."""
+        self.start()
+        return self
+
+    def __exit__(self, *exception):
+        """Takes the exception details of the with statement and stops sampling."""
+        self.stop()
+
+    def write_folded(self, path):
+        """Takes as a parameter the path of a file and writes the samples to it as folded stacks, one stack
+        and its number of samples per line."""
+        with open(path, 'w') as profile_file:
+            for stack, count in sorted(self.__samples.items()):
+                profile_file.write(stack + ' ' + str(count) + '\n')
+
+    def __sample(self, target):
+        """Takes as a parameter the identifier of the profiled thread and records its stack every interval
+        until the profiler is stopped."""
+        samples = self.__samples
+        while not self.__stopping.wait(self.__interval):
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                break # The profiled thread has finished
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(code.co_name + ' (' + os.path.basename(code.co_filename) + ':' + str(code.co_firstlineno) + ')')
+                frame = frame.f_back
+            folded = ';'.join(reversed(stack))
+            samples[folded] = samples.get(folded, 0) + 1
+
+
+def main():
+    """Takes no parameters and replays a game log with the instrumentation enabled, printing its report as
+    JSON, and optionally writes a sampled profile of the replay as folded stacks."""
+    from .replay import replay_lines
+    parser = argparse.ArgumentParser(description='Replay a game log with ChessVar instrumentation enabled.')
+    parser.add_argument('log', help='game log to replay, in the format read by replay.py')
+    parser.add_argument('--profile', default=None, help='file to write the sampled profile to, as folded stacks')
+    parser.add_argument('--interval', type=float, default=0.001, help='seconds between profile samples')
+    arguments = parser.parse_args()
+
+    profiler = SamplingProfiler(arguments.interval) if arguments.profile else None
+    with open(arguments.log) as log, Instrumentation() as instrumentation:
+        if profiler is not None:
+            profiler.start()
+        games = sum(1 for result in replay_lines(log))
+        if profiler is not None:
+            profiler.stop()
+            profiler.write_folded(arguments.profile)
+    output = instrumentation.report()
+    output['games'] = games
+    print(json.dumps(output, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+# Description: This program creates a MonteCarloPlayer class, which chooses moves for the current player of
+# a ChessVar game with Monte Carlo tree search. Each iteration walks down the tree, choosing the child with
+# the best UCT score, adds one new child and scores it with a random playout: random moves are played until
+# a player captures all of the opponent's pieces of one type, which in this variant usually happens quickly,
+# or until the playout reaches its length limit and is scored as a draw. Playouts run in batches: a batch of
+# leaves is chosen first, with each walk counting as a visit as it goes so that the walks spread out over the
+# tree, and the batch of playouts is then run either in this process or shared out between worker processes,
+# which are sent the positions in the packed form made by ChessVar's to_bytes method. The tree is kept
+# between moves, so after the opponent replies, the part of the tree below the new position is reused.
+#
+#     python mcts.py --playouts 2000 --batch-size 64 --workers 4
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .chess_var import ChessVar, decode_move
+
+
+# The default exploration constant of the UCT score, the square root of 2.
+EXPLORATION = math.sqrt(2)
+
+# The most moves a playout may last before it is scored as a draw.
+PLAYOUT_LIMIT = 200
+
+# The score of each game state for the white player. A playout that hits its limit scores as a draw.
+WHITE_SCORES = {'WHITE_WON': 1.0, 'BLACK_WON': 0.0, 'UNFINISHED': 0.5}
+
+MCTSResult = namedtuple('MCTSResult', ['best_move', 'visits', 'win_rate', 'playouts', 'elapsed',
+                                       'playouts_per_second', 'reused_visits'])
+
+
+def playout(game, generator, limit=PLAYOUT_LIMIT):
+    """Takes as parameters a ChessVar game, a random.Random generator and the most moves to play. The
+    method plays random moves on the game until it is won, the current player has no move or the limit is
+    reached, and returns the score of the result for the white player: 1 for a white win, 0 for a black win
+    and 0.5 otherwise. The game is changed by the playout."""
+    for ply in range(limit):
+        moves = list(game.legal_encoded_moves())
+        if not moves: # The game is won, or the current player has no move
+            break
+        game.make_encoded_move(moves[generator.randrange(len(moves))])
+    return WHITE_SCORES[game.get_game_state()]
+
+
+def run_playouts(positions, seed, limit=PLAYOUT_LIMIT):
+    """Takes as parameters a list of positions packed by ChessVar's to_bytes method, the seed of the random
+    moves and the most moves a playout may last. The function plays one playout from each position and
+    returns the list of their scores for the white player. It is run in the worker processes."""
+    generator = random.Random(seed)
+    return [playout(ChessVar.from_bytes(position), generator, limit) for position in positions]
+
+
+class Node:
+    """A class representing a node of the search tree: the position reached by a move. The visits and
+    wins are counted for the player who made the move, so a parent chooses between its children by their
+    own win rates."""
+    __slots__ = ('move', 'parent', 'children', 'untried_moves', 'visits', 'wins', 'mover', 'position_hash')
+
+    def __init__(self, move, parent, mover, position_hash):
+        """Takes as parameters the encoded move that reaches the node (None for the root), the parent node,
+        the player who made the move (0 for white and 1 for black) and the position hash of the position
+        reached. The node starts with no children and no visits, and its moves are listed when it is first expanded."""
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried_moves = None # The moves not yet added as children, listed on the node's first expansion
+        self.visits = 0
+        self.wins = 0.0
+        self.mover = mover
+        self.position_hash = position_hash
+
+    def select_child(self, exploration):
+        """Takes as a parameter the exploration constant and returns the child with the highest UCT score:
+        its win rate plus the exploration constant times the square root of the log of this node's visits
+        divided by the child's visits."""
+        log_visits = math.log(self.visits)
+        best_child, best_score = None, None
+        for child in self.children:
+            score = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            if best_score is None or score > best_score:
+                best_child, best_score = child, score
+        return best_child
+
+
+class MonteCarloPlayer:
+    """A class representing a Monte Carlo tree search player for ChessVar games. The player keeps its tree
+    between searches, and owns a pool of worker processes when it runs playouts in parallel, which close
+    frees."""
+    def __init__(self, exploration=EXPLORATION, batch_size=32, workers=1, playout_limit=PLAYOUT_LIMIT, seed=None):
+        """Takes as parameters the exploration constant of the UCT score, the number of playouts in each
+        batch, the number of worker processes to run them in (1 runs them in this process), the most moves a
+        playout may last and the seed of the random moves, and initializes an empty tree."""
+        if batch_size < 1:
+            raise ValueError('the batch size must be at least 1')
+        self.__exploration = exploration
+        self.__batch_size = batch_size
+        self.__workers = workers
+        self.__playout_limit = playout_limit
+        self.__random = random.Random(seed)
+        self.__root = None
+        self.__executor = None
+
+    def __enter__(self):
+        """Takes no parameters and returns the player, for use in a with statement."""
+        return self
+
+    def __exit__(self, *exception):
+        """Takes the exception details of the with statement and closes the player."""
+        self.close()
+
+    def close(self):
+        """Takes no parameters and shuts down the worker processes, if any were started."""
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    def get_root(self):
+        """Takes no parameters and returns the root node of the tree, or None before the first search."""
+        return self.__root
+
+    def choose_move(self, game, playouts=1000, time_limit=None):
+        """Takes the same parameters as search and returns the best move found, or None if the current
+        player has no move."""
+        return self.search(game, playouts, time_limit).best_move
+
+    def search(self, game, playouts=1000, time_limit=None):
+        """Takes as parameters a ChessVar game, the number of playouts to run and, optionally, the number of
+        seconds the search may take. The tree is reused if the game's position is the root of the last
+        search or one or two moves below it, and is started again otherwise. Batches of playouts are run
+        until the playouts or the time run out. The method returns an MCTSResult holding the most visited
+        move, its visits and win rate, the playouts run, the seconds taken, the playouts per second and the
+        visits the tree already held for the position. The game is left as it was."""
+        started = time.perf_counter()
+        deadline = None if time_limit is None else started + time_limit
+        root = self.__reuse_tree(game)
+        reused_visits = root.visits
+
+        played = 0
+        while played < playouts and (deadline is None or time.perf_counter() < deadline):
+            played += self.__run_batch(game, min(self.__batch_size, playouts - played))
+            if root.untried_moves == [] and not root.children: # The current player has no move
+                break
+
+        elapsed = time.perf_counter() - started
+        if not root.children:
+            return MCTSResult(None, 0, 0.0, played, elapsed, played / (elapsed or 1e-9), reused_visits)
+        best = max(root.children, key=lambda child: child.visits)
+        return MCTSResult(decode_move(best.move), best.visits, best.wins / best.visits, played, elapsed,
+                          played / (elapsed or 1e-9), reused_visits)
+
+    def __reuse_tree(self, game):
+        """Takes as a parameter a ChessVar game and makes the root of the tree the node for its position.
+        The node is looked for at the old root and the two levels below it, so that the tree is reused after
+        the player's own move and the opponent's reply. Otherwise a new tree is started. The method returns
+        the root."""
+        position_hash = game.get_position_hash()
+        root = self.__root
+        if root is not None:
+            candidates = [root] + root.children + [grandchild for child in root.children for grandchild in child.children]
+            for node in candidates:
+                if node.position_hash == position_hash:
+                    node.parent = None # The rest of the old tree can be freed
+                    self.__root = node
+                    return node
+        self.__root = Node(None, None, 1 if game.get_current_player() == 'White' else 0, position_hash)
+        return self.__root
+
+    def __run_batch(self, game, size):
+        """Takes as parameters the ChessVar game at the root and the number of leaves to choose, and runs one
+        batch: the leaves are chosen and expanded, their playouts are run, and the scores are added to each
+        node on their paths. The method returns the number of playouts run."""
+        leaves, positions, terminal_scores = [], [], []
+        for number in range(size):
+            node, leaf_game = self.__select_and_expand(game)
+            if leaf_game.get_game_state() != 'UNFINISHED' or node.untried_moves == [] and not node.children:
+                terminal_scores.append((node, WHITE_SCORES[leaf_game.get_game_state()])) # The result is known without a playout
+            else:
+                leaves.append(node)
+                positions.append(leaf_game.to_bytes())
+
+        for node, score in terminal_scores:
+            self.__backpropagate(node, score)
+        for node, score in zip(leaves, self.__playout_scores(positions)):
+            self.__backpropagate(node, score)
+        return size
+
+    def __select_and_expand(self, game):
+        """Takes as a parameter the ChessVar game at the root and walks down the tree from the root, choosing
+        children by their UCT scores, until it reaches a node with an untried move, which is added as a new
+        child, or a node with no moves. Each node on the path has its visits counted as the walk passes, so
+        later walks in the same batch favour other paths. The method returns the node reached and a copy of
+        the game in its position."""
+        node = self.__root
+        node.visits += 1
+        leaf_game = game.copy()
+        while True:
+            if node.untried_moves is None:
+                node.untried_moves = list(leaf_game.legal_encoded_moves())
+                self.__random.shuffle(node.untried_moves)
+            if node.untried_moves:
+                move = node.untried_moves.pop()
+                leaf_game.make_encoded_move(move)
+                child = Node(move, node, 1 - node.mover, leaf_game.get_position_hash())
+                node.children.append(child)
+                child.visits += 1
+                return child, leaf_game
+            if not node.children: # The game is over here, or the current player has no move
+                return node, leaf_game
+            node = node.select_child(self.__exploration)
+            node.visits += 1
+            leaf_game.make_encoded_move(node.move)
+
+    def __backpropagate(self, node, score):
+        """Takes as parameters the node a playout was run from and the playout's score for the white player,
+        and adds the score to the wins of each node from there up to the root, for the player who made its move."""
+        while node is not None:
+            node.wins += score if node.mover == 0 else 1.0 - score
+            node = node.parent
+
+    def __playout_scores(self, positions):
+        """Takes as a parameter a list of positions packed by to_bytes and returns the scores of a playout
+        from each, for the white player. With more than one worker, the positions are shared out between the
+        worker processes, and each share is given its own seed."""
+        if not positions:
+            return []
+        if self.__workers <= 1:
+            return run_playouts(positions, self.__random.getrandbits(64), self.__playout_limit)
+
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(max_workers=self.__workers)
+        shares = [positions[i::self.__workers] for i in range(min(self.__workers, len(positions)))]
+        futures = [self.__executor.submit(run_playouts, share, self.__random.getrandbits(64), self.__playout_limit)
+                   for share in shares]
+        results = [future.result() for future in futures]
+        scores = [None] * len(positions)
+        for i, share_scores in enumerate(results): # Puts the scores back in the order of the positions
+            scores[i::self.__workers] = share_scores
+        return scores
+
+
+def main():
+    """Takes no parameters and runs Monte Carlo tree searches from the position given on the command line,
+    printing the best move and the playouts per second of each search as JSON. Searching the position again
+    after each move shows the tree being reused."""
+    from .parallel import replay
+    parser = argparse.ArgumentParser(description='Run Monte Carlo tree searches on a ChessVar position.')
+    parser.add_argument('moves', nargs='?', default='', help='moves leading to the position, such as e2e4e7e5')
+    parser.add_argument('--playouts', type=int, default=2000, help='playouts run by each search')
+    parser.add_argument('--batch-size', type=int, default=32, help='playouts in each batch')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes that run the playouts')
+    parser.add_argument('--plies', type=int, default=4, help='moves to play, searching before each one')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random moves')
+    arguments = parser.parse_args()
+
+    game = replay(arguments.moves)
+    searches = []
+    with MonteCarloPlayer(batch_size=arguments.batch_size, workers=arguments.workers, seed=arguments.seed) as player:
+        for ply in range(arguments.plies):
+            result = player.search(game, arguments.playouts)
+            searches.append(result._asdict())
+            if result.best_move is None:
+                break
+            game.make_move(*result.best_move)
+    playouts = sum(search['playouts'] for search in searches)
+    seconds = sum(search['elapsed'] for search in searches)
+    print(json.dumps({'workers': arguments.workers, 'batch_size': arguments.batch_size,
+                      'searches': searches, 'playouts_per_second': playouts / (seconds or 1e-9)}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+# Description: This program runs engine searches and self-play games across a pool of worker processes.
+# A search can split the root moves of a position between the workers, and a batch of self-play games
+# can be shared out between them. Positions are sent to the workers in the 35 byte packed form made by
+# ChessVar's to_bytes method, and games are recorded as compact strings of moves, rather than as
+# pickled ChessVar objects.
+# Each worker reports the games and nodes it got through and the time it took, so the throughput of
+# each worker can be shown.
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .chess_var import ChessVar
+from .engine import Engine
+
+
+def encode_moves(moves):
+    """Takes as a parameter a sequence of moves, each a tuple of the starting square and ending square in
+    algebraic notation, and returns them as one string of four characters per move, such as 'e2e4e7e5'."""
+    return ''.join(start_square + end_square for start_square, end_square in moves)
+
+
+def decode_moves(encoded):
+    """Takes as a parameter a string of moves made by encode_moves and returns the list of moves."""
+    return [(encoded[i:i + 2], encoded[i + 2:i + 4]) for i in range(0, len(encoded), 4)]
+
+
+def replay(encoded):
+    """Takes as a parameter a string of moves made by encode_moves and returns a ChessVar game with the
+    moves played from the starting position. A move that make_move rejects raises ValueError."""
+    game = ChessVar()
+    for start_square, end_square in decode_moves(encoded):
+        if not game.make_move(start_square, end_square):
+            raise ValueError('illegal move in position: ' + start_square + end_square)
+    return game
+
+
+def search_root_moves(position, root_moves, max_depth, time_limit, node_limit):
+    """Takes as parameters a position packed by ChessVar's to_bytes method, the encoded root moves to
+    search, and the depth, time and node budgets of the search. The method runs in a worker process and returns a tuple of the best move,
+    its score, the depth completed, the nodes visited, the seconds taken and the worker's process id."""
+    game = ChessVar.from_bytes(position)
+    result = Engine().search(game, max_depth, time_limit, node_limit, root_moves=decode_moves(root_moves))
+    return result.best_move, result.score, result.depth, result.nodes, result.elapsed, os.getpid()
+
+
+def parallel_search(game, workers=None, max_depth=64, time_limit=None, node_limit=None):
+    """Takes as parameters a ChessVar game, the number of worker processes, and the depth, time and
+    node budgets given to each worker. The root moves of the position are dealt out between the workers
+    and each worker searches its share. Scores are only compared between searches of the same depth, the
+    shallowest depth a worker completed, or depth 1 if none completed a depth. The share of a worker that
+    searched deeper, or completed no depth, is searched again to that depth, so every root move is scored
+    and can be chosen. The method returns a tuple of the best move, its score, the depth the scores were
+    compared at and a dictionary of the throughput of each worker."""
+    position = game.to_bytes()
+    moves = list(game.legal_moves())
+    if not moves:
+        return None, 0, 0, {}
+
+    workers = workers or os.cpu_count() or 1
+    shares = [encode_moves(moves[i::workers]) for i in range(min(workers, len(moves)))]
+
+    statistics = {}
+    with ProcessPoolExecutor(max_workers=len(shares)) as executor:
+        futures = [executor.submit(search_root_moves, position, share, max_depth, time_limit, node_limit)
+                   for share in shares]
+        results = []
+        for share, future in zip(shares, futures):
+            move, score, depth, nodes, elapsed, worker = future.result()
+            record_throughput(statistics, worker, 0, nodes, elapsed)
+            results.append((share, move, score, depth))
+
+        # A worker that completed no depth has only its first move, unscored, so its share is searched again
+        # with the shares of the workers that searched deeper than the others.
+        common_depth = min([depth for share, move, score, depth in results if depth > 0] or [1])
+        futures = {share: executor.submit(search_root_moves, position, share, common_depth, None, None)
+                   for share, move, score, depth in results if depth != common_depth}
+        best_move, best_score = None, None
+        for share, move, score, depth in results:
+            if share in futures:
+                move, score, depth, nodes, elapsed, worker = futures[share].result()
+                record_throughput(statistics, worker, 0, nodes, elapsed)
+            if best_score is None or score > best_score:
+                best_move, best_score = move, score
+
+    return best_move, best_score, common_depth, statistics
+
+
+def play_games(seeds, max_depth, node_limit, random_plies, max_plies):
+    """Takes as parameters the random seeds of the games to play, the depth and node budget of each
+    engine search, the number of random moves to open each game with and the most moves a game may last.
+    The method runs in a worker process and plays one self-play game per seed. It returns a tuple of the
+    list of games, each a tuple of the encoded moves and the final game state, the nodes searched, the
+    seconds taken and the worker's process id."""
+    started = time.perf_counter()
+    games = []
+    nodes = 0
+    for seed in seeds:
+        chooser = random.Random(seed)
+        engine = Engine(table_size=1 << 16)
+        game = ChessVar()
+        moves = []
+        while game.get_game_state() == 'UNFINISHED' and len(moves) < max_plies:
+            if len(moves) < random_plies: # The games open with random moves so that they differ from each other
+                legal = list(game.legal_moves())
+                move = chooser.choice(legal) if legal else None
+            else:
+                result = engine.search(game, max_depth, node_limit=node_limit)
+                move = result.best_move
+                nodes += result.nodes
+            if move is None:
+                break
+            game.make_move(*move)
+            moves.append(move)
+        games.append((encode_moves(moves), game.get_game_state()))
+    return games, nodes, time.perf_counter() - started, os.getpid()
+
+
+def batch_self_play(games, workers=None, max_depth=2, node_limit=None, random_plies=4, max_plies=200,
+                    seed=0, chunk_size=None):
+    """Takes as parameters the number of self-play games, the number of worker processes, the depth and
+    node budget of each engine search, the number of random opening moves, the most moves a game may last,
+    the seed of the first game and the number of games given to a worker at a time. The method plays the
+    games in the worker processes and returns a tuple of the list of games, each a tuple of the encoded
+    moves and the final game state, and a dictionary of the throughput of each worker."""
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, games // (workers * 4)) # Small chunks keep the workers evenly loaded
+    seeds = list(range(seed, seed + games))
+    chunks = [seeds[i:i + chunk_size] for i in range(0, games, chunk_size)]
+
+    results = []
+    statistics = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_games, chunk, max_depth, node_limit, random_plies, max_plies)
+                   for chunk in chunks]
+        for future in futures:
+            played, nodes, elapsed, worker = future.result()
+            results.extend(played)
+            record_throughput(statistics, worker, len(played), nodes, elapsed)
+
+    return results, statistics
+
+
+def record_throughput(statistics, worker, games, nodes, elapsed):
+    """Takes as parameters the dictionary of worker throughput, a worker's process id, and the games
+    played, nodes searched and seconds taken by one of its tasks. The method adds the task to the
+    worker's totals and updates its games and nodes per second."""
+    totals = statistics.setdefault(worker, {'games': 0, 'nodes': 0, 'seconds': 0.0})
+    totals['games'] += games
+    totals['nodes'] += nodes
+    totals['seconds'] += elapsed
+    seconds = totals['seconds'] or 1e-9
+    totals['games_per_second'] = totals['games'] / seconds
+    totals['nodes_per_second'] = totals['nodes'] / seconds
+
+
+def main():
+    """Takes no parameters and runs a parallel search or a batch of self-play games from the command
+    line, printing the results and the throughput of each worker as JSON."""
+    parser = argparse.ArgumentParser(description='Parallel search and self-play for ChessVar.')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--depth', type=int, default=2, help='depth of each engine search')
+    parser.add_argument('--nodes', type=int, default=None, help='node budget of each engine search')
+    commands = parser.add_subparsers(dest='command', required=True)
+    search = commands.add_parser('search', help='search one position with the root moves split between workers')
+    search.add_argument('moves', nargs='?', default='', help="moves played from the start, such as 'e2e4e7e5'")
+    search.add_argument('--fen', default=None, help='position to search, in the notation of ChessVar.to_fen')
+    search.add_argument('--time', type=float, default=None, help='seconds each worker may search for')
+    self_play = commands.add_parser('self-play', help='play a batch of self-play games')
+    self_play.add_argument('--games', type=int, default=100, help='number of games to play')
+    self_play.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    arguments = parser.parse_args()
+
+    started = time.perf_counter()
+    if arguments.command == 'search':
+        game = ChessVar.from_fen(arguments.fen) if arguments.fen else replay(arguments.moves)
+        move, score, depth, statistics = parallel_search(game, arguments.workers, arguments.depth,
+                                                         arguments.time, arguments.nodes)
+        output = {'best_move': encode_moves([move]) if move else None, 'score': score, 'depth': depth}
+    else:
+        games, statistics = batch_self_play(arguments.games, arguments.workers, arguments.depth,
+                                            arguments.nodes, seed=arguments.seed)
+        states = [state for moves, state in games]
+        output = {'games': len(games), 'results': {state: states.count(state) for state in set(states)}}
+    elapsed = time.perf_counter() - started
+    output['seconds'] = elapsed
+    output['workers'] = {str(worker): totals for worker, totals in statistics.items()}
+    print(json.dumps(output, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+# Description: This program replays archived ChessVar games and checks that every move in them is legal.
+# A game log holds one game per line, either as moves separated by spaces ('e2e4 e7e5' or 'e2-e4 e7-e5')
+# or as a JSON list of [start_square, end_square] pairs. The log is read one line at a time and each game
+# is replayed through make_move, so memory does not grow with the size of the log. For each game the final
+# game state, the index of the first illegal move and the capture counts are reported. From the command
+# line, the games can be shared out between worker processes, with only a bounded number in flight.
+
+import argparse
+import json
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .chess_var import PIECES, ChessVar
+
+
+# The result of replaying one game: its number in the log, the final game state, the index of the first
+# illegal move (or None if every move was legal), the number of moves played, and the capture counts.
+GameResult = namedtuple('GameResult', ['game_number', 'game_state', 'first_illegal_move', 'moves_played',
+                                       'capture_counts'])
+
+
+def parse_game(line):
+    """Takes as a parameter one line of a game log and returns the list of moves in it, each a tuple of
+    the starting square and ending square. A line that is not valid raises ValueError, including a JSON
+    line holding anything but a list of pairs of strings."""
+    line = line.strip()
+    if line.startswith('['):
+        moves = json.loads(line)
+        for move in moves:
+            if not isinstance(move, list) or len(move) != 2 or not all(isinstance(square, str) for square in move):
+                raise ValueError('expected a move such as ["e2", "e4"], not ' + json.dumps(move))
+        return [(start_square, end_square) for start_square, end_square in moves]
+    moves = []
+    for token in line.split():
+        token = token.replace('-', '')
+        if len(token) != 4:
+            raise ValueError('expected a move such as e2e4, not ' + repr(token))
+        moves.append((token[:2], token[2:]))
+    return moves
+
+
+def is_game_line(line):
+    """Takes as a parameter one line of a game log and returns False if it is blank or a comment
+    starting with #, and True otherwise."""
+    line = line.strip()
+    return bool(line) and not line.startswith('#')
+
+
+def read_games(lines):
+    """Takes as a parameter an iterable of game log lines, such as an open file, and yields the moves of
+    each game in turn, one line at a time."""
+    for line in lines:
+        if is_game_line(line):
+            yield parse_game(line)
+
+
+def replay_game(moves, game_number=0):
+    """Takes as parameters the moves of a game and its number in the log, replays the moves through
+    make_move from the starting position, and returns a GameResult. The replay stops at the first move
+    that make_move rejects, or that is not a square on the board."""
+    game = ChessVar()
+    first_illegal_move = None
+    for index, (start_square, end_square) in enumerate(moves):
+        try:
+            legal = game.make_move(start_square, end_square)
+        except (IndexError, ValueError): # The move is not in algebraic notation
+            legal = False
+        if not legal:
+            first_illegal_move = index
+            break
+    moves_played = len(moves) if first_illegal_move is None else first_illegal_move
+    return GameResult(game_number, game.get_game_state(), first_illegal_move, moves_played,
+                      game.get_capture_counts())
+
+
+def replay_lines(lines):
+    """Takes as a parameter an iterable of game log lines and yields a GameResult for each game in turn.
+    A line that can't be parsed gives a result whose first illegal move is 0."""
+    for game_number, line in enumerate(line for line in lines if is_game_line(line)):
+        yield replay_line(line, game_number)
+
+
+def replay_line(line, game_number):
+    """Takes as parameters one game log line and its game number, and returns the GameResult of replaying it."""
+    try:
+        moves = parse_game(line)
+    except ValueError:
+        return GameResult(game_number, 'UNFINISHED', 0, 0, {piece: 0 for piece in PIECES})
+    return replay_game(moves, game_number)
+
+
+def replay_chunk(chunk):
+    """Takes as a parameter a list of (game number, line) pairs and returns the list of their GameResults.
+    The function is run in the worker processes."""
+    return [replay_line(line, game_number) for game_number, line in chunk]
+
+
+def replay_lines_parallel(lines, workers=None, chunk_size=256, max_pending=None):
+    """Takes as parameters an iterable of game log lines, the number of worker processes, the number of
+    games given to a worker at a time, and the most chunks that may be waiting to be replayed. The method
+    yields the GameResult of each game, in the order of the log. Lines are only read when a chunk is
+    finished, so memory stays bounded however long the log is."""
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    numbered = enumerate(line for line in lines if is_game_line(line))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        finished = False
+        while pending or not finished:
+            while not finished and len(pending) < max_pending:
+                chunk = []
+                for item in numbered:
+                    chunk.append(item)
+                    if len(chunk) == chunk_size:
+                        break
+                if not chunk:
+                    finished = True
+                    break
+                pending.append(executor.submit(replay_chunk, chunk))
+            if pending:
+                wait(pending[:1], return_when=FIRST_COMPLETED)
+                for result in pending.pop(0).result(): # Results are given back in the order of the log
+                    yield result
+
+
+def main():
+    """Takes no parameters and replays the game logs named on the command line, or standard input, printing
+    one JSON line per game (or only the games with an illegal move) followed by a JSON summary."""
+    parser = argparse.ArgumentParser(description='Replay and validate ChessVar game logs.')
+    parser.add_argument('logs', nargs='*', help='game log files, one game per line (default: standard input)')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=256, help='games given to a worker at a time')
+    parser.add_argument('--errors-only', action='store_true', help='only print games with an illegal move')
+    arguments = parser.parse_args()
+
+    summary = {'games': 0, 'illegal': 0, 'UNFINISHED': 0, 'WHITE_WON': 0, 'BLACK_WON': 0}
+    for path in arguments.logs or ['-']:
+        log = sys.stdin if path == '-' else open(path)
+        try:
+            if arguments.workers > 1:
+                results = replay_lines_parallel(log, arguments.workers, arguments.chunk_size)
+            else:
+                results = replay_lines(log)
+            for result in results:
+                summary['games'] += 1
+                summary[result.game_state] += 1
+                if result.first_illegal_move is not None:
+                    summary['illegal'] += 1
+                if result.first_illegal_move is not None or not arguments.errors_only:
+                    print(json.dumps({'log': path, **result._asdict()}))
+        finally:
+            if log is not sys.stdin:
+                log.close()
+    print(json.dumps({'summary': summary}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+# Description: This program creates a ResultCache class, a file of search results for ChessVar positions
+# that is read through a memory map, so that many processes can share it without loading it into memory
+# and opening it takes the same time however large the file is. The file is a hash table of fixed-size
+# records keyed on ChessVar's Zobrist position hash, after a short header. Each record holds the key, the
+# score, the best move, the depth searched and the bound type of the score, like an entry of the
+# transposition table. From the command line, the program builds a cache by searching the early positions
+# of the game and the positions in which a player is one capture away from winning, and looks positions
+# up in a cache.
+#
+#     python result_cache.py build results.cache --depth 3 --opening-plies 2 --games 200
+#     python result_cache.py probe results.cache e2e4e7e5
+
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .chess_var import PIECES, STARTING_TOTALS, ChessVar, decode_move, encode_move
+from .engine import Engine
+
+
+# The header of the file: a magic string, the format version, the size of a record and the number of slots.
+HEADER_FORMAT = '<4sHHQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAGIC = b'CVRC'
+VERSION = 1
+
+# A record: the position hash, the score, the best move (encoded by ChessVar's encode_move, or NO_MOVE),
+# the depth searched and the bound type (0 for an empty slot).
+RECORD_FORMAT = '<QiHBB'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+NO_MOVE = 0xFFFF
+
+BOUNDS = (None, 'EXACT', 'LOWER', 'UPPER')
+
+# The number of slots after a position's own slot where it may be stored instead, when its slot is taken.
+PROBE_LENGTH = 4
+
+# The number of records whose bound types are read at once when counting the filled slots.
+COUNT_BLOCK = 4096
+
+
+def bounds_format(records):
+    """Takes as a parameter a number of records and returns a struct that reads only the bound type, the
+    last byte, of each of that many records in a row."""
+    return struct.Struct('<' + ('%dxB' % (RECORD_SIZE - 1)) * records)
+
+
+BOUNDS_FORMAT = bounds_format(COUNT_BLOCK)
+
+
+def pack_move(move):
+    """Takes as a parameter a move, a tuple of the starting square and ending square in algebraic notation,
+    or None, and returns it as the number stored in a record."""
+    return NO_MOVE if move is None else encode_move(*move)
+
+
+def unpack_move(number):
+    """Takes as a parameter the move number stored in a record and returns the move as a tuple of the
+    starting square and ending square, or None if the record holds no move."""
+    return None if number == NO_MOVE else decode_move(number)
+
+
+class ResultCache:
+    """A class representing a result cache file opened through a memory map. A cache opened for reading
+    can be shared by any number of processes; the operating system keeps one copy of the pages that are
+    read, and only those pages are loaded. A cache is filled by one builder opened with writable=True."""
+    def __init__(self, path, writable=False):
+        """Takes as parameters the path of a cache file made by create and whether to open it for writing.
+        Only the header is read, so opening the file is quick whatever its size. A file that is not a
+        result cache raises ValueError."""
+        self.__path = path
+        self.__writable = writable
+        with open(path, 'r+b' if writable else 'rb') as cache_file:
+            header = cache_file.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE:
+                raise ValueError(path + ' is not a result cache')
+            magic, version, record_size, slots = struct.unpack(HEADER_FORMAT, header)
+            if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+                raise ValueError(path + ' is not a result cache of version ' + str(VERSION))
+            if os.fstat(cache_file.fileno()).st_size < HEADER_SIZE + slots * RECORD_SIZE:
+                raise ValueError(path + ' is shorter than its header says')
+            self.__map = mmap.mmap(cache_file.fileno(), HEADER_SIZE + slots * RECORD_SIZE,
+                                   access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        self.__slots = slots
+
+    @classmethod
+    def create(cls, path, slots):
+        """Takes as parameters the path of a new cache file and its number of slots, writes an empty cache
+        there (replacing any file at the path), and returns it opened for writing. The empty cache is written
+        to a temporary file that then replaces the path, so a reader of the old file never sees it cut short.
+        The file is extended rather than written, so on most file systems its empty slots take no space on
+        disk."""
+        if slots < 1:
+            raise ValueError('a result cache needs at least one slot')
+        with open(path + '.tmp', 'wb') as cache_file:
+            cache_file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, RECORD_SIZE, slots))
+            cache_file.truncate(HEADER_SIZE + slots * RECORD_SIZE)
+        os.replace(path + '.tmp', path)
+        return cls(path, writable=True)
+
+    def get_path(self):
+        """Takes no parameters and returns the path data member."""
+        return self.__path
+
+    def get_size(self):
+        """Takes no parameters and returns the number of slots in the cache."""
+        return self.__slots
+
+    def __len__(self):
+        """Takes no parameters and returns the number of slots that hold a result. The bound type of every
+        record is read straight from the memory map, a block of records at a time, so this takes time in
+        proportion to the size of the file but never copies it into memory."""
+        filled = 0
+        for first in range(0, self.__slots, COUNT_BLOCK):
+            records = min(COUNT_BLOCK, self.__slots - first)
+            bounds = (BOUNDS_FORMAT if records == COUNT_BLOCK else bounds_format(records)).unpack_from(
+                self.__map, HEADER_SIZE + first * RECORD_SIZE)
+            filled += records - bounds.count(0)
+        return filled
+
+    def probe(self, key):
+        """Takes as a parameter the hash of a position and returns the stored entry for the position, as a
+        tuple of (key, depth, value, bound, best_move) like the entries of the transposition table, or None
+        if the position is not stored."""
+        for slot in self.__probe_slots(key):
+            stored_key, value, move, depth, bound = struct.unpack_from(RECORD_FORMAT, self.__map,
+                                                                       HEADER_SIZE + slot * RECORD_SIZE)
+            if not bound:
+                return None # Positions are stored in the first free slot, so the position is not stored
+            if stored_key == key:
+                return key, depth, value, BOUNDS[bound], unpack_move(move)
+        return None
+
+    def probe_game(self, game):
+        """Takes as a parameter a ChessVar game and returns the stored entry for its position, or None."""
+        return self.probe(game.get_position_hash())
+
+    def store(self, key, depth, value, bound, best_move=None):
+        """Takes as parameters the hash of a position, the depth it was searched to, its value, the bound
+        type of the value ('EXACT', 'LOWER' or 'UPPER') and the best move found. The entry goes in the
+        position's own slot, or the first of the next few slots that is empty or holds the same position.
+        If they are all taken, the shallowest result among them is replaced, unless it was searched deeper.
+        Returns True if the entry was stored."""
+        if not self.__writable:
+            raise ValueError('the result cache was opened for reading only')
+        chosen = None
+        for slot in self.__probe_slots(key):
+            stored_key, stored_depth, stored_bound = self.__read_key(slot)
+            if not stored_bound or stored_key == key:
+                chosen = slot
+                break
+            if chosen is None or stored_depth < self.__read_key(chosen)[1]:
+                chosen = slot
+        else:
+            if self.__read_key(chosen)[1] > depth:
+                return False # Every slot holds a deeper result for a different position
+        struct.pack_into(RECORD_FORMAT, self.__map, HEADER_SIZE + chosen * RECORD_SIZE, key, value,
+                         pack_move(best_move), depth, BOUNDS.index(bound))
+        return True
+
+    def flush(self):
+        """Takes no parameters and writes the changes to a cache opened for writing back to the file."""
+        if self.__writable:
+            self.__map.flush()
+
+    def close(self):
+        """Takes no parameters, flushes the changes to a cache opened for writing, and closes the map."""
+        if not self.__map.closed:
+            self.flush()
+            self.__map.close()
+
+    def __enter__(self):
+        """Takes no parameters and returns the cache, so it can be used in a with statement."""
+        return self
+
+    def __exit__(self, *exception):
+        """Takes the exception details of the with statement and closes the cache."""
+        self.close()
+
+    def __probe_slots(self, key):
+        """Takes as a parameter the hash of a position and returns the slots the position may be stored in."""
+        first = key % self.__slots
+        return [(first + step) % self.__slots for step in range(min(PROBE_LENGTH, self.__slots))]
+
+    def __read_key(self, slot):
+        """Takes as a parameter a slot and returns a tuple of the key, depth and bound number stored in it."""
+        stored_key, value, move, depth, bound = struct.unpack_from(RECORD_FORMAT, self.__map,
+                                                                   HEADER_SIZE + slot * RECORD_SIZE)
+        return stored_key, depth, bound
+
+
+def is_one_capture_from_winning(game):
+    """Takes as a parameter a ChessVar game and returns True if the game is unfinished and either player has
+    a legal move that captures the last of the opponent's pieces of some type, which would end the game. A
+    player with one piece of a type left is not enough, since each player starts with one king and one queen."""
+    if game.get_game_state() != 'UNFINISHED':
+        return False
+    counts = game.get_capture_counts()
+    for player, first in (('White', 6), ('Black', 0)): # The opponent's pieces are the second or first six
+        last_pieces = 0
+        for index in range(first, first + 6):
+            if counts[PIECES[index]] == STARTING_TOTALS[index] - 1:
+                last_pieces |= game.get_piece_board(PIECES[index])
+        if any(last_pieces >> (move & 63) & 1 for move in game.legal_encoded_moves(player)):
+            return True
+    return False
+
+
+def opening_positions(max_plies):
+    """Takes as a parameter a number of plies and returns the positions reached from the start in at most
+    that many plies, without repeats, each packed by ChessVar's to_bytes method."""
+    positions = {}
+    frontier = [ChessVar()]
+    for ply in range(max_plies + 1):
+        next_frontier = []
+        for game in frontier:
+            key = game.get_position_hash()
+            if key in positions:
+                continue
+            positions[key] = game.to_bytes()
+            if ply < max_plies and game.get_game_state() == 'UNFINISHED':
+                for start_square, end_square in game.legal_moves():
+                    child = game.copy()
+                    child.make_move(start_square, end_square)
+                    next_frontier.append(child)
+        frontier = next_frontier
+    return list(positions.values())
+
+
+def near_win_positions(games, seed=0, max_plies=200):
+    """Takes as parameters a number of games, a seed and the most plies per game, plays that many games of
+    random legal moves, and returns the positions met in them in which a player is one capture from
+    winning, as checked by is_one_capture_from_winning, without repeats, each packed by ChessVar's to_bytes
+    method."""
+    generator = random.Random(seed)
+    positions = {}
+    for number in range(games):
+        game = ChessVar()
+        for ply in range(max_plies):
+            if game.get_game_state() != 'UNFINISHED':
+                break
+            if is_one_capture_from_winning(game):
+                positions.setdefault(game.get_position_hash(), game.to_bytes())
+            game.make_move(*generator.choice(list(game.legal_moves())))
+    return list(positions.values())
+
+
+def search_positions(positions, max_depth):
+    """Takes as parameters a list of positions packed by ChessVar's to_bytes method and the depth to search
+    each to. The method may run in a worker process, and returns a list of tuples of each position's hash,
+    the depth completed, the score and the best move."""
+    engine = Engine()
+    results = []
+    for position in positions:
+        game = ChessVar.from_bytes(position)
+        result = engine.search(game, max_depth)
+        results.append((game.get_position_hash(), result.depth, result.score, result.best_move))
+    return results
+
+
+def build(path, slots, positions, max_depth, workers=1, chunk_size=64):
+    """Takes as parameters the path of the cache file to create, its number of slots, a list of positions
+    packed by ChessVar's to_bytes method, the depth to search each to, the number of worker processes and
+    the number of positions sent to a worker at a time. Every position is searched and its result stored
+    in a new cache. Returns a dictionary of the positions searched, the results stored and the seconds taken."""
+    started = time.perf_counter()
+    chunks = [positions[i:i + chunk_size] for i in range(0, len(positions), chunk_size)]
+    stored = 0
+    with ResultCache.create(path + '.tmp', slots) as cache: # Filled under another name, so readers see it whole
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunk_results = executor.map(search_positions, chunks, [max_depth] * len(chunks))
+                for results in chunk_results:
+                    stored += store_results(cache, results)
+        else:
+            for chunk in chunks:
+                stored += store_results(cache, search_positions(chunk, max_depth))
+    os.replace(path + '.tmp', path)
+    return {'positions': len(positions), 'stored': stored, 'slots': slots, 'depth': max_depth,
+            'seconds': time.perf_counter() - started}
+
+
+def store_results(cache, results):
+    """Takes as parameters a ResultCache opened for writing and a list of results made by search_positions,
+    stores the results as exact scores, and returns the number stored."""
+    return sum(cache.store(key, depth, score, 'EXACT', best_move) for key, depth, score, best_move in results)
+
+
+def main():
+    """Takes no parameters and builds a cache or probes one, as given on the command line, printing the
+    results as JSON."""
+    parser = argparse.ArgumentParser(description='Build or probe a ChessVar result cache.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_command = commands.add_parser('build', help='search positions and store the results in a new cache')
+    build_command.add_argument('path', help='cache file to create')
+    build_command.add_argument('--slots', type=int, default=1 << 20, help='number of slots in the cache')
+    build_command.add_argument('--depth', type=int, default=3, help='depth each position is searched to')
+    build_command.add_argument('--opening-plies', type=int, default=2, help='plies from the start to cover')
+    build_command.add_argument('--games', type=int, default=200,
+                               help='random games searched for positions one capture from winning')
+    build_command.add_argument('--seed', type=int, default=0, help='seed of the random games')
+    build_command.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    probe_command = commands.add_parser('probe', help='look up a position in a cache')
+    probe_command.add_argument('path', help='cache file to read')
+    probe_command.add_argument('moves', nargs='?', default='', help="moves played from the start, such as 'e2e4e7e5'")
+    probe_command.add_argument('--fen', default=None, help='position to look up, in the notation of ChessVar.to_fen')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'build':
+        positions = opening_positions(arguments.opening_plies) + near_win_positions(arguments.games, arguments.seed)
+        results = build(arguments.path, arguments.slots, positions, arguments.depth, arguments.workers)
+    else:
+        from .parallel import replay
+        game = ChessVar.from_fen(arguments.fen) if arguments.fen else replay(arguments.moves)
+        with ResultCache(arguments.path) as cache:
+            entry = cache.probe_game(game)
+        results = {'fen': game.to_fen(), 'found': entry is not None}
+        if entry is not None:
+            results.update(depth=entry[1], score=entry[2], bound=entry[3], best_move=entry[4])
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
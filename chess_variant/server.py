@@ -0,0 +1,439 @@
+# Description: This program hosts ChessVar games over TCP with asyncio. Clients send one JSON object per
+# line and get one JSON object per line back. Each game is held by a GameSession, which makes a move and
+# sends it to the game's players and spectators as one step under the game's lock, so every connection sees
+# the moves of a game in the order they were made. Messages to a connection go through a bounded queue; a
+# spectator that falls too far behind is disconnected rather than slowing the game down. From the command
+# line, the program runs the server, or runs a load generator that plays many games at once against a
+# server on localhost and reports the move latency.
+#
+# Requests, each of which may carry an "id" that is copied into the reply:
+#     {"op": "new", "color": "both"}               creates a game; color is "white", "black" or "both"
+#     {"op": "join", "game": 1, "color": "black"}   takes a color that no one holds in a game
+#     {"op": "watch", "game": 1}                    follows a game as a spectator
+#     {"op": "move", "game": 1, "from": "e2", "to": "e4"}
+#     {"op": "leave", "game": 1}
+# Every move made is sent to the game's connections as {"event": "move", "game": 1, "player": "white",
+# "from": "e2", "to": "e4", "state": "UNFINISHED"}.
+#
+#     python server.py serve --port 8765
+#     python server.py load --games 2000 --connections 50
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+
+from .chess_var import ChessVar
+
+
+# The number of messages that may wait to be sent to one connection before it counts as too slow.
+QUEUE_SIZE = 256
+
+# The longest request line accepted, in bytes.
+LINE_LIMIT = 4096
+
+COLORS = ('white', 'black')
+
+
+class Connection:
+    """A class representing one client connection to the server, with the queue of messages waiting to be
+    sent to it and the games it plays in or watches."""
+    def __init__(self, writer, queue_size=QUEUE_SIZE):
+        """Takes as parameters the stream writer of the connection and the number of messages that may wait
+        to be sent to it. The task that sends the messages is started here."""
+        self.__writer = writer
+        self.__queue = asyncio.Queue(queue_size)
+        self.__sessions = {}  # game number -> GameSession
+        self.__closed = False
+        self.__sender = asyncio.get_running_loop().create_task(self.__send_messages())
+
+    def get_sessions(self):
+        """Takes no parameters and returns the sessions data member, a dictionary from game number to the
+        GameSession of each game the connection plays in or watches."""
+        return self.__sessions
+
+    def is_closed(self):
+        """Takes no parameters and returns True if the connection has been closed, and False if not."""
+        return self.__closed
+
+    def send(self, message):
+        """Takes as a parameter a message, a dictionary, and queues it to be sent to the client without
+        waiting. Returns True if it was queued, and False if the connection is closed or its queue is full,
+        in which case the client is too slow and the connection is closed."""
+        if self.__closed:
+            return False
+        try:
+            self.__queue.put_nowait((json.dumps(message, separators=(',', ':')) + '\n').encode())
+        except asyncio.QueueFull:
+            self.close()
+            return False
+        return True
+
+    def close(self):
+        """Takes no parameters and closes the connection. Messages still waiting in the queue are dropped."""
+        if not self.__closed:
+            self.__closed = True
+            self.__sender.cancel()
+            self.__writer.close()
+
+    async def __send_messages(self):
+        """Takes no parameters and sends the queued messages to the client in order, waiting for the
+        stream to drain after each batch so that a slow client fills its queue rather than the server's
+        memory."""
+        try:
+            while True:
+                self.__writer.write(await self.__queue.get())
+                while not self.__queue.empty():
+                    self.__writer.write(self.__queue.get_nowait())
+                await self.__writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+class GameSession:
+    """A class representing one game hosted by the server: the ChessVar game, the connections holding each
+    color, and the spectators."""
+    def __init__(self, game_number):
+        """Takes as a parameter the number of the game, and starts a new game with no players."""
+        self.__game_number = game_number
+        self.__game = ChessVar()
+        self.__players = {'white': None, 'black': None}
+        self.__spectators = set()
+        self.__lock = asyncio.Lock()
+
+    def get_game_number(self):
+        """Takes no parameters and returns the game_number data member."""
+        return self.__game_number
+
+    def get_game(self):
+        """Takes no parameters and returns the game data member, the ChessVar of the session."""
+        return self.__game
+
+    def is_empty(self):
+        """Takes no parameters and returns True if no connection plays in or watches the game."""
+        return not self.__spectators and all(player is None for player in self.__players.values())
+
+    def add_player(self, connection, color):
+        """Takes as parameters a connection and a color ('white', 'black' or 'both'), and gives the color to
+        the connection. Returns False if a color asked for is already held by another connection."""
+        colors = COLORS if color == 'both' else (color,)
+        if any(self.__players[name] not in (None, connection) for name in colors):
+            return False
+        for name in colors:
+            self.__players[name] = connection
+        return True
+
+    def add_spectator(self, connection):
+        """Takes as a parameter a connection and adds it to the spectators of the game."""
+        self.__spectators.add(connection)
+
+    def remove(self, connection):
+        """Takes as a parameter a connection and removes it from the players and spectators of the game."""
+        self.__spectators.discard(connection)
+        for name in COLORS:
+            if self.__players[name] is connection:
+                self.__players[name] = None
+
+    async def move(self, connection, start_square, end_square):
+        """Takes as parameters the connection asking for a move and the starting and ending squares of the
+        move. The connection must hold the color of the current player. Under the game's lock, the move is
+        made and, if it is legal, sent to every player and spectator, so that moves reach every connection
+        in the order they were made. Returns None if the move was made, or the reason it was not."""
+        async with self.__lock:
+            player = self.__game.get_current_player().lower()
+            if self.__players[player] is not connection:
+                return 'not your turn'
+            if not self.__game.make_move(start_square, end_square):
+                return 'illegal move'
+            self.broadcast({'event': 'move', 'game': self.__game_number, 'player': player,
+                            'from': start_square, 'to': end_square, 'state': self.__game.get_game_state()})
+        return None
+
+    def broadcast(self, message):
+        """Takes as a parameter a message and queues it for every player and spectator of the game without
+        waiting. Spectators too slow to keep up are disconnected by their connection and removed here."""
+        for connection in set(self.__players.values()) - {None}:
+            connection.send(message)
+        for connection in list(self.__spectators):
+            if not connection.send(message):
+                self.__spectators.discard(connection)
+
+
+class GameServer:
+    """A class representing the game server, which holds the game sessions and answers the requests of
+    every connection on one event loop."""
+    def __init__(self, queue_size=QUEUE_SIZE):
+        """Takes as a parameter the number of messages that may wait to be sent to each connection."""
+        self.__queue_size = queue_size
+        self.__sessions = {}  # game number -> GameSession
+        self.__game_numbers = itertools.count(1)
+        self.__moves_made = 0
+
+    def get_session_count(self):
+        """Takes no parameters and returns the number of games being hosted."""
+        return len(self.__sessions)
+
+    def get_moves_made(self):
+        """Takes no parameters and returns the number of moves made on the server."""
+        return self.__moves_made
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """Takes as parameters the host and port to listen on, and returns the started asyncio server."""
+        return await asyncio.start_server(self.handle_client, host, port, limit=LINE_LIMIT)
+
+    async def handle_client(self, reader, writer):
+        """Takes as parameters the stream reader and writer of a new connection, and answers its requests
+        until the client disconnects. The connection is then removed from every game it was in, and games
+        left with no connections are closed."""
+        connection = Connection(writer, self.__queue_size)
+        try:
+            while not connection.is_closed():
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    await self.handle_request(connection, line)
+        finally:
+            for session in connection.get_sessions().values():
+                session.remove(connection)
+                if session.is_empty():
+                    self.__sessions.pop(session.get_game_number(), None)
+            connection.close()
+
+    async def handle_request(self, connection, line):
+        """Takes as parameters a connection and one request line from it, carries out the request, and
+        queues the reply to the connection."""
+        try:
+            request = json.loads(line)
+        except ValueError:
+            connection.send({'ok': False, 'error': 'a request must be one line of JSON'})
+            return
+        if not isinstance(request, dict):
+            connection.send({'ok': False, 'error': 'a request must be a JSON object'})
+            return
+        try:
+            reply = await self.__carry_out(connection, request)
+        except KeyError as error:
+            reply = {'ok': False, 'error': 'missing field ' + str(error)}
+        except TypeError as error:
+            reply = {'ok': False, 'error': str(error)}
+        if 'id' in request:
+            reply['id'] = request['id']
+        connection.send(reply)
+
+    async def __carry_out(self, connection, request):
+        """Takes as parameters a connection and a request, a dictionary, carries out the request, and returns
+        the reply. A request that is missing a field raises KeyError."""
+        op = request['op']
+        if op == 'new':
+            color = request.get('color', 'both')
+            if color not in COLORS + ('both',):
+                return {'ok': False, 'error': 'unknown color ' + repr(color)}
+            session = GameSession(next(self.__game_numbers))
+            self.__sessions[session.get_game_number()] = session
+            session.add_player(connection, color)
+            connection.get_sessions()[session.get_game_number()] = session
+            return {'ok': True, 'game': session.get_game_number()}
+
+        session = self.__sessions.get(request['game'])
+        if session is None:
+            return {'ok': False, 'error': 'no game ' + repr(request['game'])}
+        if op == 'move':
+            reason = await session.move(connection, str(request['from']), str(request['to']))
+            if reason is not None:
+                return {'ok': False, 'error': reason}
+            self.__moves_made += 1
+            return {'ok': True, 'state': session.get_game().get_game_state()}
+        if op == 'join':
+            if request['color'] not in COLORS or not session.add_player(connection, request['color']):
+                return {'ok': False, 'error': 'color not available'}
+            connection.get_sessions()[session.get_game_number()] = session
+            return {'ok': True, 'game': session.get_game_number(), 'fen': session.get_game().to_fen()}
+        if op == 'watch':
+            session.add_spectator(connection)
+            connection.get_sessions()[session.get_game_number()] = session
+            return {'ok': True, 'game': session.get_game_number(), 'fen': session.get_game().to_fen()}
+        if op == 'leave':
+            session.remove(connection)
+            connection.get_sessions().pop(session.get_game_number(), None)
+            if session.is_empty():
+                self.__sessions.pop(session.get_game_number(), None)
+            return {'ok': True}
+        return {'ok': False, 'error': 'unknown op ' + repr(op)}
+
+
+class LoadClient:
+    """A class representing one connection of the load generator. Several requests may be waiting on the
+    connection at once; each reply is matched to its request by its id, and events are counted."""
+    def __init__(self, reader, writer):
+        """Takes as parameters the stream reader and writer of a connection to the server, and starts the
+        task that reads the replies."""
+        self.__reader = reader
+        self.__writer = writer
+        self.__waiting = {}  # request id -> future of the reply
+        self.__request_ids = itertools.count()
+        self.__events = 0
+        self.__receiver = asyncio.get_running_loop().create_task(self.__receive())
+
+    def get_events(self):
+        """Takes no parameters and returns the number of move events received."""
+        return self.__events
+
+    async def request(self, message):
+        """Takes as a parameter a request, a dictionary, sends it and returns the reply."""
+        request_id = next(self.__request_ids)
+        reply = asyncio.get_running_loop().create_future()
+        self.__waiting[request_id] = reply
+        self.__writer.write((json.dumps(dict(message, id=request_id)) + '\n').encode())
+        await self.__writer.drain()
+        return await reply
+
+    async def close(self):
+        """Takes no parameters and closes the connection."""
+        self.__receiver.cancel()
+        self.__writer.close()
+        try:
+            await self.__writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def __receive(self):
+        """Takes no parameters and reads lines from the server until it disconnects, handing each reply to
+        the request waiting for it. The requests still waiting when the connection ends get ConnectionError,
+        except those whose caller has already stopped waiting, such as after a timeout."""
+        try:
+            while True:
+                line = await self.__reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if 'event' in message:
+                    self.__events += 1
+                elif message.get('id') in self.__waiting:
+                    reply = self.__waiting.pop(message['id'])
+                    if not reply.done():
+                        reply.set_result(message)
+        finally:
+            for reply in self.__waiting.values():
+                if not reply.done(): # A cancelled future can't take an exception
+                    reply.set_exception(ConnectionError('the server closed the connection'))
+            self.__waiting.clear()
+
+
+async def play_load_game(client, game_number, generator, max_plies, latencies):
+    """Takes as parameters a LoadClient holding both colors of a game, the number of the game, a random number
+    generator, the most plies to play and a list to add the latency of each move to. Plays random legal
+    moves until the game is won or max_plies is reached."""
+    game = ChessVar()
+    for ply in range(max_plies):
+        if game.get_game_state() != 'UNFINISHED':
+            break
+        start_square, end_square = generator.choice(list(game.legal_moves()))
+        started = time.perf_counter()
+        reply = await client.request({'op': 'move', 'game': game_number, 'from': start_square, 'to': end_square})
+        latencies.append(time.perf_counter() - started)
+        if not reply['ok']:
+            raise RuntimeError('the server rejected a legal move: ' + reply['error'])
+        game.make_move(start_square, end_square)
+
+
+def percentile(values, fraction):
+    """Takes as parameters a sorted list of values and a fraction between 0 and 1, and returns the value
+    at that fraction of the list (the nearest rank)."""
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else None
+
+
+async def run_load(host, port, games, connections, spectators, max_plies, seed, queue_size=QUEUE_SIZE):
+    """Takes as parameters the host and port of a server, the number of games to play at once, the number
+    of connections to share them between, the number of spectator connections watching every game, the
+    most plies per game, a seed, and the queue size of the server started on localhost for the run if port
+    is None. Plays the games at once and returns a dictionary of the results, including the p50 and p99
+    move latency. A spectator whose queue fills up is disconnected, so it receives fewer events than
+    there are moves."""
+    server = None
+    if port is None:
+        game_server = GameServer(queue_size)
+        server = await game_server.serve(host, 0)
+        port = server.sockets[0].getsockname()[1]
+
+    clients = [LoadClient(*await asyncio.open_connection(host, port)) for number in range(connections)]
+    watchers = [LoadClient(*await asyncio.open_connection(host, port)) for number in range(spectators)]
+    generator = random.Random(seed)
+    latencies = []
+
+    # Every game is created and watched first, so that the spectators see all of them from their first move.
+    try:
+        game_numbers = []
+        for number in range(games):
+            reply = await clients[number % connections].request({'op': 'new', 'color': 'both'})
+            game_numbers.append(reply['game'])
+            for watcher in watchers:
+                await watcher.request({'op': 'watch', 'game': reply['game']})
+
+        started = time.perf_counter()
+        await asyncio.gather(*(play_load_game(clients[number % connections], game_number,
+                                              random.Random(generator.random()), max_plies, latencies)
+                               for number, game_number in enumerate(game_numbers)))
+        elapsed = time.perf_counter() - started
+    finally:
+        for client in clients + watchers:
+            await client.close()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+    latencies.sort()
+    return {'games': games, 'connections': connections, 'spectators': spectators, 'moves': len(latencies),
+            'seconds': elapsed, 'moves_per_second': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 0.5) * 1000, 'p99_ms': percentile(latencies, 0.99) * 1000,
+            'events_per_spectator': [watcher.get_events() for watcher in watchers]}
+
+
+async def run_server(host, port, queue_size=QUEUE_SIZE):
+    """Takes as parameters the host and port to listen on and the queue size of each connection, and runs
+    the game server until it is stopped."""
+    server = await GameServer(queue_size).serve(host, port)
+    print('serving on ' + ', '.join(str(sock.getsockname()) for sock in server.sockets), flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    """Takes no parameters and runs the server or the load generator, as given on the command line. The
+    load generator prints its results as JSON."""
+    parser = argparse.ArgumentParser(description='Host ChessVar games over TCP.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on or connect to')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE,
+                        help='messages that may wait for a connection before it is dropped as too slow')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='run the game server')
+    serve.add_argument('--port', type=int, default=8765, help='port to listen on')
+    load = commands.add_parser('load', help='play many games at once and report the move latency')
+    load.add_argument('--port', type=int, default=None, help='port of a running server (default: start one)')
+    load.add_argument('--games', type=int, default=1000, help='number of games played at once')
+    load.add_argument('--connections', type=int, default=50, help='connections the games are shared between')
+    load.add_argument('--spectators', type=int, default=0, help='connections watching every game')
+    load.add_argument('--plies', type=int, default=60, help='most plies played in each game')
+    load.add_argument('--seed', type=int, default=0, help='seed of the random moves')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'serve':
+        try:
+            asyncio.run(run_server(arguments.host, arguments.port, arguments.queue_size))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    results = asyncio.run(run_load(arguments.host, arguments.port, arguments.games, arguments.connections,
+                                   arguments.spectators, arguments.plies, arguments.seed, arguments.queue_size))
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
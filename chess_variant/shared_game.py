@@ -0,0 +1,157 @@
+# Description: This program creates a SharedGame class, which lets many threads read a ChessVar game while
+# another thread makes moves in it. The game itself is only ever touched by the thread making a move, which
+# holds a lock so that two moves are never made at once. After each move, the writer publishes a snapshot:
+# a GameSnapshot holding a copy of the game that is never changed again, numbered with a version that goes
+# up by one with each move. Publishing is a single assignment, so a reader gets either the old snapshot or
+# the new one and never a game in the middle of a move. Readers take no lock, so they never wait for a
+# writer and a writer never waits for them. Copying a game copies only its list of bitboards and its
+# capture counts, so each move costs the writer about a microsecond more.
+
+import threading
+
+from .chess_var import PIECES, STARTING_COUNTS, ChessVar
+
+
+class GameSnapshot:
+    """A class representing the state of a shared game after one of its moves. The snapshot holds its own
+    copy of the game, which nothing changes, so its methods give the same answers in any thread for as long
+    as the snapshot is kept. Only the methods that read the game are offered."""
+    __slots__ = ('__game', '__version')
+
+    def __init__(self, game, version):
+        """Takes as parameters a ChessVar game, which the snapshot takes over and no one else may change,
+        and the snapshot's version, the number of moves made in the shared game before it was taken."""
+        self.__game = game
+        self.__version = version
+
+    def get_version(self):
+        """Takes no parameters and returns the version data member."""
+        return self.__version
+
+    def get_game_state(self):
+        """Takes no parameters and returns the game state when the snapshot was taken."""
+        return self.__game.get_game_state()
+
+    def get_current_player(self):
+        """Takes no parameters and returns the current player when the snapshot was taken."""
+        return self.__game.get_current_player()
+
+    def get_game_board(self):
+        """Takes no parameters and returns the game board as a new list of eight rows, as ChessVar's
+        get_game_board does, so changing it changes neither the snapshot nor the shared game."""
+        return self.__game.get_game_board()
+
+    def get_capture_counts(self):
+        """Takes no parameters and returns a new dictionary of the capture counts of each game piece."""
+        return self.__game.get_capture_counts()
+
+    def get_white_turn_count(self):
+        """Takes no parameters and returns the number of turns the white player had moved."""
+        return self.__game.get_white_turn_count()
+
+    def get_black_turn_count(self):
+        """Takes no parameters and returns the number of turns the black player had moved."""
+        return self.__game.get_black_turn_count()
+
+    def get_position_hash(self):
+        """Takes no parameters and returns the position hash of the game when the snapshot was taken."""
+        return self.__game.get_position_hash()
+
+    def get_piece_board(self, game_piece):
+        """Takes as a parameter a game piece and returns its bitboard when the snapshot was taken."""
+        return self.__game.get_piece_board(game_piece)
+
+    def to_fen(self):
+        """Takes no parameters and returns the position in the notation of ChessVar's to_fen method."""
+        return self.__game.to_fen()
+
+    def legal_moves(self, player=None):
+        """Takes as a parameter the player whose moves are wanted, which defaults to the current player,
+        and returns the list of their moves in the snapshot's position, as ChessVar's legal_moves yields them."""
+        return list(self.__game.legal_moves(player))
+
+    def to_chess_var(self):
+        """Takes no parameters and returns a new ChessVar game in the snapshot's position, which the caller
+        may change freely."""
+        return self.__game.copy()
+
+    def is_consistent(self):
+        """Takes no parameters and returns True if the snapshot's pieces and capture counts agree, as checked
+        by is_consistent. A snapshot of a half-made move would fail this."""
+        return is_consistent(self.__game)
+
+
+def is_consistent(game):
+    """Takes as a parameter a ChessVar game, or a snapshot of one, and returns True if the number of each type
+    of piece on the board plus the number captured is the number of that type each player started with. A
+    game read while a move is being made in it can fail this, since a move counts a capture before it takes
+    the piece off the board."""
+    on_board = {piece: 0 for piece in PIECES}
+    for row in game.get_game_board():
+        for game_piece in row:
+            if game_piece != '-':
+                on_board[game_piece] += 1
+    counts = game.get_capture_counts()
+    return all(on_board[piece] + counts[piece] == STARTING_COUNTS[piece] for piece in PIECES)
+
+
+class SharedGame:
+    """A class representing a ChessVar game shared between threads. Any number of threads may read it at
+    once through snapshot and the read methods below, which never wait, while moves are made one at a time
+    through make_move."""
+    def __init__(self, game=None):
+        """Takes as a parameter the ChessVar game to share, which defaults to a new game. The shared game
+        takes its own copy, so the game passed in may go on being used. The first snapshot is version 0."""
+        self.__game = ChessVar() if game is None else game.copy()
+        self.__write_lock = threading.Lock() # Held while a move is made, so moves are made one at a time
+        self.__snapshot = GameSnapshot(self.__game.copy(), 0)
+
+    def snapshot(self):
+        """Takes no parameters and returns the latest GameSnapshot. Reading one attribute is atomic, so this
+        never waits for a move being made and never returns a half-made move. Several reads from the same
+        snapshot always agree with each other, which separate calls to the methods below may not."""
+        return self.__snapshot
+
+    def get_version(self):
+        """Takes no parameters and returns the number of moves made since the game was shared."""
+        return self.__snapshot.get_version()
+
+    def get_game_state(self):
+        """Takes no parameters and returns the game state of the latest snapshot."""
+        return self.__snapshot.get_game_state()
+
+    def get_current_player(self):
+        """Takes no parameters and returns the current player of the latest snapshot."""
+        return self.__snapshot.get_current_player()
+
+    def get_game_board(self):
+        """Takes no parameters and returns a new list holding the game board of the latest snapshot."""
+        return self.__snapshot.get_game_board()
+
+    def get_capture_counts(self):
+        """Takes no parameters and returns the capture counts of the latest snapshot."""
+        return self.__snapshot.get_capture_counts()
+
+    def make_move(self, start_square, end_square):
+        """Takes as parameters the starting square and ending square of a move in algebraic notation, makes
+        the move as ChessVar's make_move does and returns what it returns. If the move is made, a new snapshot
+        is published once the move is complete."""
+        with self.__write_lock:
+            if not self.__game.make_move(start_square, end_square):
+                return False
+            self.__publish()
+            return True
+
+    def make_encoded_move(self, move):
+        """Takes as a parameter a move encoded by encode_move, makes it as ChessVar's make_encoded_move does
+        and returns what it returns, publishing a new snapshot if the move is made."""
+        with self.__write_lock:
+            if not self.__game.make_encoded_move(move):
+                return False
+            self.__publish()
+            return True
+
+    def __publish(self):
+        """Takes no parameters and replaces the latest snapshot with one of the game as it is now. It is only
+        called while the write lock is held."""
+        self.__snapshot = GameSnapshot(self.__game.copy(), self.__snapshot.get_version() + 1)
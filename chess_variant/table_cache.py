@@ -0,0 +1,52 @@
+# Description: This program loads precomputed tables from a cache file, so that a module whose tables take a
+# while to build only builds them the first time it is imported. The tables are stored with marshal, which
+# reads nested lists, tuples and integers back faster than they can be computed. A cache file sits in the
+# __pycache__ directory next to the module that builds the tables, and is keyed, like a .pyc file, on the
+# size and modification time of the module's source and on the Python version, so editing the module or
+# changing interpreters builds the tables again. If the cache can't be read or written, as in a read-only
+# install, the tables are built every time instead.
+
+import marshal
+import os
+import sys
+
+
+CACHE_VERSION = 1
+
+
+def cache_path(source_path, name):
+    """Takes as parameters the path of the module that builds a set of tables and the name of the set, and
+    returns the path of the set's cache file."""
+    return os.path.join(os.path.dirname(os.path.abspath(source_path)), '__pycache__', name + '.tables')
+
+
+def load_tables(source_path, name, build):
+    """Takes as parameters the path of the module that builds a set of tables (its __file__), the name of
+    the set and a function that takes no parameters and builds the tables, returning them as a value marshal
+    can store, such as a tuple of lists of integers. The method returns the tables from the cache file if it
+    is up to date, and otherwise builds them, writes them to the cache file and returns them."""
+    path = cache_path(source_path, name)
+    try:
+        source = os.stat(source_path)
+        key = (CACHE_VERSION, sys.version_info[:2], marshal.version, source.st_size, source.st_mtime_ns)
+    except OSError: # The source isn't a file on disk, so there is nothing to check the cache against
+        return build()
+
+    try:
+        with open(path, 'rb') as file:
+            cached_key, tables = marshal.loads(file.read())
+        if cached_key == key:
+            return tables
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    tables = build()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = path + '.' + str(os.getpid())
+        with open(temporary_path, 'wb') as file:
+            file.write(marshal.dumps((key, tables)))
+        os.replace(temporary_path, path) # Another process reading the cache sees the old file or the new one
+    except OSError:
+        pass
+    return tables
@@ -0,0 +1,571 @@
+# Description: This program generates and reads endgame tablebases for ChessVar. A tablebase covers one
+# material configuration: the pieces on the board, such as king and queen against king and rook, together
+# with the capture counts, which decide which captures end the game. Every placement of the pieces with
+# either player to move is solved exactly by retrograde analysis: positions won or lost with one move
+# are found first, and the results are carried backwards one ply at a time through the moves that lead to
+# them, using un-moves generated from the attack tables. Captures leave the configuration, either ending
+# the game or reaching a smaller configuration, which is generated first. The first pass over every
+# position is shared out between worker processes.
+#
+# A table is stored as a short header followed by one signed byte per position, indexed by the squares
+# of the pieces and the player to move: 0 for a draw, n for a win with the winning capture on the
+# player's nth move, and -n for a loss to a capture on the opponent's nth move.
+#
+#     python tablebase.py generate KQkr --counts 000000/000000 --directory tables --workers 4
+#     python tablebase.py check KQkr --counts 000000/000000 --directory tables
+#     python tablebase.py probe tables --fen "8/8/8/3k4/8/8/3QK3/7r w 000000/000000 0 0"
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from .attack_tables import (KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, PAWN_DOUBLE_PUSHES, PAWN_PUSHES,
+                            bishop_attacks, queen_attacks, rook_attacks)
+from .chess_var import PIECE_INDICES, PIECES, STARTING_TOTALS
+
+
+# The pieces of a configuration are kept in this order, in the letters of ChessVar's from_fen notation
+# (upper case for white). Pieces of the same type are indexed in order of their squares when probing.
+PIECE_ORDER = 'KQRBNPkqrbnp'
+
+# The most pieces a configuration may have. A table holds 2 * 64 ** pieces positions.
+MAX_PIECES = 4
+
+# The header of a table file: a magic string, the format version, the number of pieces, the pieces
+# (padded with spaces) and the twelve capture counts in the order of PIECES.
+HEADER_FORMAT = '<4sHB8s12s'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAGIC = b'CVTB'
+VERSION = 1
+FILE_SUFFIX = '.cvtb'
+
+# The longest win or loss, in plies, that fits in a table's signed byte per position.
+MAX_PLIES = 254
+
+# The loss floor of a position that can't be lost, because one of its captures leads to a draw.
+NO_LOSS = 0xFFFF
+
+
+def canonical_pieces(pieces):
+    """Takes as a parameter a string of pieces in the letters of the from_fen notation, such as 'KQkr',
+    and returns them in the order of PIECE_ORDER. Letters that are not pieces, or too many pieces, raise
+    ValueError."""
+    if not pieces or len(pieces) > MAX_PIECES or any(piece not in PIECE_ORDER for piece in pieces):
+        raise ValueError('expected one to ' + str(MAX_PIECES) + ' pieces such as KQkr, not ' + repr(pieces))
+    return ''.join(sorted(pieces, key=PIECE_ORDER.index))
+
+
+def parse_counts(counts):
+    """Takes as a parameter capture counts written as in ChessVar's to_fen notation, six digits for the
+    white pieces, a slash and six digits for the black pieces, and returns them as twelve bytes. Counts
+    that would already have ended the game raise ValueError."""
+    digits = counts.replace('/', '')
+    if len(counts) != 13 or counts[6] != '/' or len(digits) != 12 or not digits.isdigit():
+        raise ValueError('expected the capture counts as six digits, a slash and six digits, not ' + repr(counts))
+    counts = bytes(int(digit) for digit in digits)
+    for index, count in enumerate(counts):
+        if count >= STARTING_TOTALS[index]:
+            raise ValueError('a capture count of ' + str(count) + ' ' + PIECES[index] + ' pieces ends the game')
+    return counts
+
+
+def format_counts(counts):
+    """Takes as a parameter twelve capture counts and returns them in the to_fen notation."""
+    digits = ''.join(str(count) for count in counts)
+    return digits[:6] + '/' + digits[6:]
+
+
+def table_file_name(pieces, counts):
+    """Takes as parameters the pieces of a configuration and its capture counts, and returns the name of
+    its table file, such as 'KQkr_000000-000000.cvtb'."""
+    return pieces + '_' + format_counts(counts).replace('/', '-') + FILE_SUFFIX
+
+
+def destinations(piece, start, own_pieces, opponent_pieces):
+    """Takes as parameters a piece in the from_fen notation, its square, and the occupancy bitboards of its
+    player and of the opponent, and returns the bitboard of the squares it can move to, by the same rules
+    as ChessVar's is_valid_move (a pawn's two square move does not check the square it passes over)."""
+    side = 0 if piece.isupper() else 1
+    kind = piece.lower()
+    occupied = own_pieces | opponent_pieces
+    if kind == 'p':
+        return (PAWN_PUSHES[side][start] | PAWN_DOUBLE_PUSHES[side][start]) & ~occupied | \
+            PAWN_ATTACKS[side][start] & opponent_pieces
+    if kind == 'n':
+        return KNIGHT_ATTACKS[start] & ~own_pieces
+    if kind == 'k':
+        return KING_ATTACKS[start] & ~own_pieces
+    if kind == 'r':
+        return rook_attacks(start, occupied) & ~own_pieces
+    if kind == 'b':
+        return bishop_attacks(start, occupied) & ~own_pieces
+    return queen_attacks(start, occupied) & ~own_pieces
+
+
+def origins(piece, end, occupied):
+    """Takes as parameters a piece in the from_fen notation, the square it stands on and the occupancy
+    bitboard of the position, and returns the bitboard of the vacant squares it could have moved from
+    without capturing: the un-moves of the piece."""
+    kind = piece.lower()
+    if kind == 'p':
+        side = 0 if piece.isupper() else 1
+        step = -8 if side == 0 else 8
+        sources = 0
+        for start in (end + step, end + 2 * step):
+            if 0 <= start < 64 and (PAWN_PUSHES[side][start] | PAWN_DOUBLE_PUSHES[side][start]) >> end & 1:
+                sources |= 1 << start
+        return sources & ~occupied
+    if kind == 'n':
+        return KNIGHT_ATTACKS[end] & ~occupied
+    if kind == 'k':
+        return KING_ATTACKS[end] & ~occupied
+    if kind == 'r':
+        return rook_attacks(end, occupied) & ~occupied
+    if kind == 'b':
+        return bishop_attacks(end, occupied) & ~occupied
+    return queen_attacks(end, occupied) & ~occupied
+
+
+def squares_of(bitboard):
+    """Takes as a parameter a bitboard and returns the list of the squares it holds, lowest first."""
+    squares = []
+    while bitboard:
+        lowest_bit = bitboard & -bitboard
+        bitboard ^= lowest_bit
+        squares.append(lowest_bit.bit_length() - 1)
+    return squares
+
+
+def position_index(squares, side):
+    """Takes as parameters the squares of a configuration's pieces, in its order, and the player to move
+    (0 for white, 1 for black), and returns the index of the position in the table."""
+    index = side
+    for square in squares:
+        index = index * 64 + square
+    return index
+
+
+def position_squares(index, piece_count):
+    """Takes as parameters the index of a position and the number of pieces, and returns a tuple of the
+    list of the pieces' squares and the player to move."""
+    squares = [0] * piece_count
+    for number in range(piece_count - 1, -1, -1):
+        index, squares[number] = divmod(index, 64)
+    return squares, index
+
+
+class EndgameTable:
+    """A class representing one table file, read through a memory map so that only the pages probed are
+    loaded and processes share them."""
+    def __init__(self, path):
+        """Takes as a parameter the path of a table file and opens it. Only the header is read. A file that
+        is not a table raises ValueError."""
+        with open(path, 'rb') as table_file:
+            header = table_file.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE:
+                raise ValueError(path + ' is not a tablebase file')
+            magic, version, piece_count, pieces, counts = struct.unpack(HEADER_FORMAT, header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(path + ' is not a tablebase file of version ' + str(VERSION))
+            self.__pieces = pieces.decode('ascii')[:piece_count]
+            self.__counts = counts
+            size = HEADER_SIZE + 2 * 64 ** piece_count
+            if os.fstat(table_file.fileno()).st_size < size:
+                raise ValueError(path + ' is shorter than its header says')
+            self.__map = mmap.mmap(table_file.fileno(), size, access=mmap.ACCESS_READ)
+
+    def get_pieces(self):
+        """Takes no parameters and returns the pieces data member, in the order of PIECE_ORDER."""
+        return self.__pieces
+
+    def get_counts(self):
+        """Takes no parameters and returns the counts data member, the twelve capture counts as bytes."""
+        return self.__counts
+
+    def probe(self, squares, side):
+        """Takes as parameters the squares of the pieces, in the table's order, and the player to move, and
+        returns the result for the player to move in plies: n if they win with the capture on the nth ply,
+        -n if they lose to the capture on the nth ply, and 0 for a draw."""
+        moves = self.__map[HEADER_SIZE + position_index(squares, side)]
+        if moves > 127:
+            return -2 * (256 - moves)
+        return 2 * moves - 1 if moves else 0
+
+    def close(self):
+        """Takes no parameters and closes the memory map."""
+        self.__map.close()
+
+
+class Tablebase:
+    """A class representing a directory of table files, which answers probes for ChessVar games whose
+    position is in one of the configurations. The tables are opened the first time they are probed."""
+    def __init__(self, directory):
+        """Takes as a parameter the directory holding the table files and reads the configuration of each
+        from its file name."""
+        self.__directory = directory
+        self.__paths = {}   # (pieces, counts) -> path of the table file
+        self.__tables = {}  # (pieces, counts) -> EndgameTable, for the tables opened so far
+        self.__max_pieces = 0
+        for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else ():
+            if name.endswith(FILE_SUFFIX) and '_' in name:
+                pieces, counts = name[:-len(FILE_SUFFIX)].split('_', 1)
+                try:
+                    key = (canonical_pieces(pieces), parse_counts(counts.replace('-', '/')))
+                except ValueError:
+                    continue
+                self.__paths[key] = os.path.join(directory, name)
+                self.__max_pieces = max(self.__max_pieces, len(pieces))
+
+    def __len__(self):
+        """Takes no parameters and returns the number of configurations in the tablebase."""
+        return len(self.__paths)
+
+    def get_configurations(self):
+        """Takes no parameters and returns a sorted list of the configurations in the tablebase, each a
+        tuple of the pieces and the capture counts in the to_fen notation."""
+        return sorted((pieces, format_counts(counts)) for pieces, counts in self.__paths)
+
+    def get_table(self, pieces, counts):
+        """Takes as parameters the pieces of a configuration, in the order of PIECE_ORDER, and its capture
+        counts as bytes, and returns its EndgameTable, or None if the tablebase doesn't have it."""
+        key = (pieces, counts)
+        table = self.__tables.get(key)
+        if table is None and key in self.__paths:
+            table = self.__tables[key] = EndgameTable(self.__paths[key])
+        return table
+
+    def probe_game(self, game):
+        """Takes as a parameter an unfinished ChessVar game and returns the result of its position for the
+        current player in plies, as returned by EndgameTable's probe, or None if the tablebase doesn't
+        cover the position."""
+        if not self.__paths:
+            return None
+        pieces, squares = [], []
+        for piece in PIECE_ORDER:
+            for square in squares_of(game.get_piece_board(piece.swapcase())):
+                if len(squares) == self.__max_pieces:
+                    return None
+                pieces.append(piece)
+                squares.append(square)
+        counts = game.get_capture_counts()
+        table = self.get_table(''.join(pieces), bytes(counts[piece] for piece in PIECES))
+        if table is None:
+            return None
+        return table.probe(squares, 0 if game.get_current_player() == 'White' else 1)
+
+    def best_move(self, game):
+        """Takes as a parameter an unfinished ChessVar game whose position the tablebase covers, and returns
+        a tuple of the best move for the current player and its result in plies: the fastest win, or else
+        a draw, or else the slowest loss. Returns None if the position or one of the positions its moves
+        lead to is not covered, or the current player has no move."""
+        best = None
+        for move in list(game.legal_moves()):
+            game.push(move)
+            try:
+                if game.get_game_state() != 'UNFINISHED':
+                    result = 1
+                else:
+                    result = self.probe_game(game)
+                    if result is None:
+                        return None
+                    result = -result + (1 if result < 0 else -1 if result > 0 else 0)
+            finally:
+                game.pop()
+            if best is None or result_order(result) > result_order(best[1]):
+                best = (move, result)
+        return best
+
+    def close(self):
+        """Takes no parameters and closes the tables opened so far."""
+        for table in self.__tables.values():
+            table.close()
+        self.__tables = {}
+
+
+def result_order(result):
+    """Takes as a parameter a result in plies and returns a number that is larger for a better result:
+    faster wins before slower wins, then draws, then slower losses before faster losses."""
+    if result > 0:
+        return 2 * MAX_PLIES - result
+    if result < 0:
+        return -2 * MAX_PLIES - result
+    return 0
+
+
+def sub_configurations(pieces, counts):
+    """Takes as parameters the pieces of a configuration and its capture counts, and returns the set of
+    configurations that a capture can lead to without ending the game, each a tuple of pieces and counts."""
+    found = set()
+    for number, piece in enumerate(pieces):
+        index = PIECE_INDICES[piece.swapcase()]
+        if counts[index] + 1 < STARTING_TOTALS[index]:
+            new_counts = bytearray(counts)
+            new_counts[index] += 1
+            found.add((pieces[:number] + pieces[number + 1:], bytes(new_counts)))
+    return found
+
+
+def classify_positions(pieces, counts, directory, first, last):
+    """Takes as parameters the pieces of a configuration, its capture counts, the directory of the tables
+    of its smaller configurations, and a range of position indices. The method may run in a worker process.
+    For each position it counts the moves that stay in the configuration and works out the captures, which
+    end the game or lead to a position of a smaller table. It returns a tuple of the move counts as bytes,
+    the loss floors (the ply of the slowest loss by a capture, or NO_LOSS if a capture reaches a draw) as
+    an array, and a list of (index, plies) of the positions already decided by their captures. A position
+    with a winning capture gets the loss floor NO_LOSS too, so the retrograde passes never find it lost."""
+    tablebase = Tablebase(directory)
+    piece_count = len(pieces)
+    white = [number for number, piece in enumerate(pieces) if piece.isupper()]
+    black = [number for number, piece in enumerate(pieces) if piece.islower()]
+    move_counts = bytearray(last - first)
+    loss_floors = array('H', [0]) * (last - first)
+    decided = []
+
+    for index in range(first, last):
+        squares, side = position_squares(index, piece_count)
+        if len(set(squares)) < piece_count:
+            continue # Two pieces on one square is not a position
+        own, opponent = (white, black) if side == 0 else (black, white)
+        own_pieces = sum(1 << squares[number] for number in own)
+        opponent_pieces = sum(1 << squares[number] for number in opponent)
+
+        moves, win, loss_floor = 0, None, 0
+        for number in own:
+            for end in squares_of(destinations(pieces[number], squares[number], own_pieces, opponent_pieces)):
+                if not opponent_pieces >> end & 1:
+                    moves += 1
+                    continue
+                captured = squares.index(end)
+                count_index = PIECE_INDICES[pieces[captured].swapcase()]
+                if counts[count_index] + 1 == STARTING_TOTALS[count_index]: # The capture wins the game
+                    result = 1
+                else:
+                    new_counts = bytearray(counts)
+                    new_counts[count_index] += 1
+                    new_squares = list(squares)
+                    new_squares[number] = end
+                    del new_squares[captured]
+                    table = tablebase.get_table(pieces[:captured] + pieces[captured + 1:], bytes(new_counts))
+                    if table is None:
+                        raise ValueError('the table of a smaller configuration is missing from ' + directory)
+                    result = table.probe(new_squares, 1 - side)
+                    result = -result + (1 if result < 0 else -1 if result > 0 else 0)
+                if result > 0:
+                    win = result if win is None else min(win, result)
+                elif result == 0:
+                    loss_floor = NO_LOSS
+                elif loss_floor != NO_LOSS:
+                    loss_floor = max(loss_floor, -result)
+
+        move_counts[index - first] = moves
+        if win is not None:
+            loss_floor = NO_LOSS # A position with a winning capture is never lost, however its moves turn out
+        loss_floors[index - first] = loss_floor
+        if win is not None:
+            decided.append((index, win))
+        elif moves == 0 and 0 < loss_floor < NO_LOSS: # Every move is a capture that loses
+            decided.append((index, -loss_floor))
+    tablebase.close()
+    return bytes(move_counts), loss_floors, decided
+
+
+def check_table(pieces, counts, directory, first=0, last=None):
+    """Takes as parameters the pieces of a configuration in the order of PIECE_ORDER, its capture counts as
+    bytes, the directory holding its table and those of its smaller configurations, and a range of position
+    indices, which defaults to the whole table. Each position in the range with a capture is worked out again
+    from the results of all of its moves: the best of them for the player to move, as best_move chooses.
+    The method returns a list of (index, stored, expected) of the positions whose stored result, in plies,
+    differs, so an empty list means the table agrees with its successors."""
+    tablebase = Tablebase(directory)
+    table = tablebase.get_table(pieces, counts)
+    if table is None:
+        raise ValueError('the table of ' + pieces + ' ' + format_counts(counts) + ' is missing from ' + directory)
+    piece_count = len(pieces)
+    white = [number for number, piece in enumerate(pieces) if piece.isupper()]
+    black = [number for number, piece in enumerate(pieces) if piece.islower()]
+    mismatches = []
+
+    for index in range(first, 2 * 64 ** piece_count if last is None else last):
+        squares, side = position_squares(index, piece_count)
+        if len(set(squares)) < piece_count:
+            continue
+        own, opponent = (white, black) if side == 0 else (black, white)
+        own_pieces = sum(1 << squares[number] for number in own)
+        opponent_pieces = sum(1 << squares[number] for number in opponent)
+
+        results = []
+        has_capture = False
+        for number in own:
+            for end in squares_of(destinations(pieces[number], squares[number], own_pieces, opponent_pieces)):
+                new_squares = list(squares)
+                new_squares[number] = end
+                if not opponent_pieces >> end & 1:
+                    result = table.probe(new_squares, 1 - side)
+                else:
+                    has_capture = True
+                    captured = squares.index(end)
+                    count_index = PIECE_INDICES[pieces[captured].swapcase()]
+                    if counts[count_index] + 1 == STARTING_TOTALS[count_index]:
+                        results.append(1)
+                        continue
+                    new_counts = bytearray(counts)
+                    new_counts[count_index] += 1
+                    del new_squares[captured]
+                    result = tablebase.get_table(pieces[:captured] + pieces[captured + 1:], bytes(new_counts)).probe(new_squares, 1 - side)
+                results.append(-result + (1 if result < 0 else -1 if result > 0 else 0))
+        if not has_capture:
+            continue
+        expected = max(results, key=result_order)
+        stored = table.probe(squares, side)
+        if stored != expected:
+            mismatches.append((index, stored, expected))
+    tablebase.close()
+    return mismatches
+
+
+def generate(pieces, counts, directory, workers=1):
+    """Takes as parameters the pieces of a configuration in the from_fen notation, its capture counts in the
+    to_fen notation, the directory to write the tables to and the number of worker processes for the first
+    pass. The tables of the smaller configurations that captures lead to are generated first, unless they
+    are already in the directory. Returns a list of a dictionary for each table generated, holding the
+    configuration, the number of won, lost and drawn positions, the longest win and the seconds taken."""
+    pieces, counts = canonical_pieces(pieces), parse_counts(counts) if isinstance(counts, str) else bytes(counts)
+    os.makedirs(directory, exist_ok=True)
+    generated = []
+    for sub_pieces, sub_counts in sorted(sub_configurations(pieces, counts)):
+        if not os.path.exists(os.path.join(directory, table_file_name(sub_pieces, sub_counts))):
+            generated.extend(generate(sub_pieces, sub_counts, directory, workers))
+    generated.append(solve(pieces, counts, directory, workers))
+    return generated
+
+
+def solve(pieces, counts, directory, workers=1):
+    """Takes as parameters the pieces of a configuration in the order of PIECE_ORDER, its capture counts as
+    bytes, the directory holding the tables of its smaller configurations and the number of worker
+    processes. The method solves every position of the configuration, writes its table to the directory and
+    returns a dictionary describing it, as in generate."""
+    started = time.perf_counter()
+    piece_count = len(pieces)
+    size = 2 * 64 ** piece_count
+    chunk_size = 64 ** (piece_count - 1)
+
+    # The first pass: every position's moves are counted and its captures worked out.
+    move_counts = bytearray()
+    loss_floors = array('H')
+    pending = {}  # ply -> list of (index, plies) of the positions decided at that ply
+    ranges = [(first, min(first + chunk_size, size)) for first in range(0, size, chunk_size)]
+    arguments = ([pieces] * len(ranges), [counts] * len(ranges), [directory] * len(ranges),
+                 [first for first, last in ranges], [last for first, last in ranges])
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_results = list(executor.map(classify_positions, *arguments))
+    else:
+        chunk_results = map(classify_positions, *arguments)
+    for chunk_counts, chunk_floors, decided in chunk_results:
+        move_counts += chunk_counts
+        loss_floors.extend(chunk_floors)
+        for index, plies in decided:
+            pending.setdefault(abs(plies), []).append((index, plies))
+
+    # The retrograde passes: the positions decided at each ply, in order, decide the positions one un-move
+    # before them. A position is lost once every move it has stays in the configuration and reaches a win
+    # for the opponent, and every capture it has loses too.
+    results = array('h', [0]) * size
+    ply = 0
+    while pending:
+        ply = min(pending)
+        if ply > MAX_PLIES:
+            raise ValueError('a result of more than ' + str(MAX_PLIES) + ' plies does not fit in a table')
+        for index, plies in pending.pop(ply):
+            if results[index]:
+                continue # Decided at an earlier ply
+            results[index] = plies
+            squares, side = position_squares(index, piece_count)
+            occupied = sum(1 << square for square in squares)
+            for number, piece in enumerate(pieces):
+                if (piece.islower()) != (side == 0): # Only the player who just moved has un-moves
+                    continue
+                for start in squares_of(origins(piece, squares[number], occupied)):
+                    previous = list(squares)
+                    previous[number] = start
+                    previous_index = position_index(previous, 1 - side)
+                    if results[previous_index]:
+                        continue
+                    if plies < 0: # The move reaches a loss for the opponent
+                        pending.setdefault(ply + 1, []).append((previous_index, ply + 1))
+                        continue
+                    move_counts[previous_index] -= 1
+                    floor = loss_floors[previous_index]
+                    if move_counts[previous_index] == 0 and floor != NO_LOSS:
+                        loss = max(ply + 1, floor)
+                        pending.setdefault(loss, []).append((previous_index, -loss))
+
+    table = array('b', [0]) * size
+    wins = losses = longest = 0
+    for index, plies in enumerate(results):
+        if plies > 0:
+            table[index] = (plies + 1) // 2
+            wins += 1
+            longest = max(longest, plies)
+        elif plies < 0:
+            table[index] = plies // 2
+            losses += 1
+
+    path = os.path.join(directory, table_file_name(pieces, counts))
+    with open(path + '.tmp', 'wb') as table_file:
+        table_file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, piece_count, pieces.ljust(8).encode('ascii'), counts))
+        table_file.write(table.tobytes())
+    os.replace(path + '.tmp', path) # Readers never see a table that is only partly written
+
+    return {'pieces': pieces, 'counts': format_counts(counts), 'positions': size, 'won': wins, 'lost': losses,
+            'longest_win_plies': longest, 'seconds': time.perf_counter() - started}
+
+
+def main():
+    """Takes no parameters and generates, checks or probes tables, as given on the command line, printing
+    the results as JSON."""
+    parser = argparse.ArgumentParser(description='Generate or probe ChessVar endgame tablebases.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate_command = commands.add_parser('generate', help='solve a configuration and its smaller ones')
+    generate_command.add_argument('pieces', help='pieces on the board in from_fen letters, such as KQkr')
+    generate_command.add_argument('--counts', default='000000/000000', help='capture counts, as in to_fen')
+    generate_command.add_argument('--directory', default='tablebase', help='directory to write the tables to')
+    generate_command.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                                  help='number of worker processes for the first pass')
+    check_command = commands.add_parser('check', help="check a table's capture positions against their moves")
+    check_command.add_argument('pieces', help='pieces on the board in from_fen letters, such as KQkr')
+    check_command.add_argument('--counts', default='000000/000000', help='capture counts, as in to_fen')
+    check_command.add_argument('--directory', default='tablebase', help='directory holding the tables')
+    probe_command = commands.add_parser('probe', help='look up a position and its best move')
+    probe_command.add_argument('directory', help='directory holding the tables')
+    probe_command.add_argument('--fen', required=True, help='position to look up, in the notation of ChessVar.to_fen')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'generate':
+        results = generate(arguments.pieces, arguments.counts, arguments.directory, arguments.workers)
+    elif arguments.command == 'check':
+        mismatches = check_table(canonical_pieces(arguments.pieces), parse_counts(arguments.counts), arguments.directory)
+        results = {'pieces': canonical_pieces(arguments.pieces), 'counts': arguments.counts,
+                   'mismatches': len(mismatches), 'first_mismatches': mismatches[:10]}
+    else:
+        from .chess_var import ChessVar
+        game = ChessVar.from_fen(arguments.fen)
+        tablebase = Tablebase(arguments.directory)
+        plies = tablebase.probe_game(game) if game.get_game_state() == 'UNFINISHED' else None
+        results = {'fen': game.to_fen(), 'found': plies is not None}
+        if plies is not None:
+            best = tablebase.best_move(game)
+            results.update(plies=plies, best_move=best[0] if best else None)
+        tablebase.close()
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
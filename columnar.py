@@ -0,0 +1,11 @@
+# Description: This program runs the command line of chess_variant/columnar.py, which exports and summarizes
+# games in the columnar format, so that python columnar.py keeps working now that the module is part of the
+# chess_variant package. It takes the same arguments as python -m chess_variant.columnar.
+
+import sys
+
+from chess_variant.columnar import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+# Description: This program runs the command line of chess_variant/fuzz.py, which checks ChessVar against a
+# reference implementation of the rules, so that python fuzz.py keeps working now that the module is part of
+# the chess_variant package. It takes the same arguments as python -m chess_variant.fuzz.
+
+import sys
+
+from chess_variant.fuzz import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
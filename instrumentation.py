@@ -0,0 +1,11 @@
+# Description: This program runs the command line of chess_variant/instrumentation.py, which replays a game
+# log with ChessVar instrumented, so that python instrumentation.py keeps working now that the module is part
+# of the chess_variant package. It takes the same arguments as python -m chess_variant.instrumentation.
+
+import sys
+
+from chess_variant.instrumentation import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
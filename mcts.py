@@ -0,0 +1,11 @@
+# Description: This program runs the command line of chess_variant/mcts.py, which runs the Monte Carlo player,
+# so that python mcts.py keeps working now that the module is part of the chess_variant package. It takes the
+# same arguments as python -m chess_variant.mcts.
+
+import sys
+
+from chess_variant.mcts import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+# Description: This program runs the command line of chess_variant/parallel.py, which runs searches and self-
+# play games across worker processes, so that python parallel.py keeps working now that the module is part of
+# the chess_variant package. It takes the same arguments as python -m chess_variant.parallel.
+
+import sys
+
+from chess_variant.parallel import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
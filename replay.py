@@ -0,0 +1,11 @@
+# Description: This program runs the command line of chess_variant/replay.py, which checks archived games, so
+# that python replay.py keeps working now that the module is part of the chess_variant package. It takes the
+# same arguments as python -m chess_variant.replay.
+
+import sys
+
+from chess_variant.replay import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+# Description: This program runs the command line of chess_variant/result_cache.py, which builds and probes
+# result caches, so that python result_cache.py keeps working now that the module is part of the chess_variant
+# package. It takes the same arguments as python -m chess_variant.result_cache.
+
+import sys
+
+from chess_variant.result_cache import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+# Description: This program runs the command line of chess_variant/server.py, which hosts games over TCP and
+# generates load against them, so that python server.py keeps working now that the module is part of the
+# chess_variant package. It takes the same arguments as python -m chess_variant.server.
+
+import sys
+
+from chess_variant.server import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
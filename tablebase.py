@@ -0,0 +1,11 @@
+# Description: This program runs the command line of chess_variant/tablebase.py, which generates, checks and
+# probes endgame tablebases, so that python tablebase.py keeps working now that the module is part of the
+# chess_variant package. It takes the same arguments as python -m chess_variant.tablebase.
+
+import sys
+
+from chess_variant.tablebase import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,6 @@
+# The ChessVar class as it was before the board was stored as bitboards, kept unchanged so that the
+# parity tests can compare the two. It is not used outside the tests.
+
 
 # Author: Matthew Holmstrom
 # GitHub username: matthewholmstrom
@@ -0,0 +1,7 @@
+# Description: This file lets the tests import the ChessVar modules from the repository's root directory
+# when pytest is run from any directory.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,73 @@
+# Description: Tests of the NumPy batch move validator, which must give the same answers as is_valid_move.
+
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from chess_variant.batch import BoardBatch, capture_column, square_indices
+from chess_variant.chess_var import PIECES, ChessVar
+
+
+def random_games(count, seed):
+    """Takes as parameters a number of games and a seed, and returns that many games each played some
+    random legal moves from the start."""
+    generator = random.Random(seed)
+    games = []
+    for number in range(count):
+        game = ChessVar()
+        for ply in range(generator.randrange(80)):
+            moves = list(game.legal_moves())
+            if not moves:
+                break
+            game.make_move(*generator.choice(moves))
+        games.append(game)
+    return games
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_every_move_agrees_with_is_valid_move(seed):
+    games = random_games(8, seed)
+    batch = BoardBatch.from_games(games)
+    board_indices, starts, ends = zip(*[(index, start, end) for index in range(len(games))
+                                        for start in range(64) for end in range(64)])
+    valid, captured = batch.validate(board_indices, starts, ends)
+    for number, (index, start, end) in enumerate(zip(board_indices, starts, ends)):
+        game = games[index]
+        assert valid[number] == game.is_valid_move(start // 8, start % 8, end // 8, end % 8), (index, start, end)
+        target = game.get_game_board()[end // 8][end % 8]
+        expected = target if valid[number] and target != '-' else None
+        assert (PIECES[capture_column(np.array([captured[number]]))[0]] if captured[number] else None) == expected
+
+
+def test_an_empty_batch():
+    batch = BoardBatch.from_games([])
+    assert len(batch) == 0
+    valid, captured = batch.validate([], [], [])
+    assert valid.shape == (0,) and captured.shape == (0,)
+
+
+def test_no_moves_on_a_batch_of_boards():
+    valid, captured = BoardBatch.from_games([ChessVar()]).validate([], [], [])
+    assert len(valid) == 0 and len(captured) == 0
+
+
+def test_squares_and_boards_out_of_range_are_invalid():
+    batch = BoardBatch.from_games([ChessVar()])
+    valid, captured = batch.validate([0, 0, 0, 0, 1, -1, 0], [-1, 12, 64, 12, 12, 12, 12], [20, -1, 28, 99, 28, 28, 28])
+    assert valid.tolist() == [False, False, False, False, False, False, True]
+    assert not captured.any()
+
+
+def test_squares_not_on_the_board_become_minus_one():
+    assert square_indices(['a1', 'h8', 'i1', 'e9', '']).tolist() == [0, 63, -1, -1, -1]
+
+
+def test_update_captures_counts_each_capture():
+    game = ChessVar.from_fen('4k3/8/8/8/8/8/3q4/3QK3 w 000000/000000 0 0')
+    batch = BoardBatch.from_games([game, game])
+    valid, captured = batch.validate([0, 1, 1], [3, 3, 4], [11, 11, 11], update_captures=True)
+    assert valid.all()
+    assert batch.get_capture_counts()[:, PIECES.index('Q')].tolist() == [1, 2]
+    assert game.get_capture_counts()['Q'] == 0
@@ -0,0 +1,124 @@
+# Description: Tests that the bitboard ChessVar plays exactly as the list-of-lists ChessVar it replaced,
+# kept in baseline_chess_var.py. Seeded random games are played on both, mixing legal moves with moves
+# between random squares, and after each move the results of make_move, the boards, the capture counts,
+# the game states and the current players are compared. At some positions is_valid_move is compared for
+# every move from every occupied square.
+
+import copy
+import random
+
+import pytest
+
+from baseline_chess_var import ChessVar as BaselineChessVar
+from chess_variant.chess_var import PIECES, SQUARE_INDEX, SQUARE_NAMES, ChessVar
+
+
+# The name the baseline gives the capture count of each game piece, in the order of PIECES.
+BASELINE_COUNTS = ['_ChessVar__' + side + '_' + name + '_count' for side in ('w', 'b')
+                   for name in ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')]
+
+SEEDS = range(12)
+
+
+def baseline_capture_counts(game):
+    """Takes as a parameter a baseline game and returns its capture counts as a dictionary keyed by piece."""
+    return {piece: getattr(game, name) for piece, name in zip(PIECES, BASELINE_COUNTS)}
+
+
+def baseline_is_valid_move(game, start_row, start_col, end_row, end_col):
+    """Takes as parameters a baseline game and the squares of a move, and returns what its is_valid_move
+    returns. A white pawn on the last row makes the baseline read past the board and raise IndexError; the
+    bitboard ChessVar gives such a pawn no moves, so the error is taken as False. Any other IndexError is
+    raised."""
+    try:
+        return game.is_valid_move(start_row, start_col, end_row, end_col)
+    except IndexError:
+        if start_row == 7 and game.get_game_board()[start_row][start_col] == 'p':
+            return False
+        raise
+
+
+def is_rank_seven_pawn(board, start_row, start_col):
+    """Takes as parameters a list-of-lists game board and a starting square, and returns True if the square
+    holds a white pawn on rank 7 with a vacant square in front of it. The baseline looks two rows ahead of
+    such a pawn, past the board, and raises IndexError for any of its moves, while the bitboard ChessVar
+    lets it move up or capture as on any other rank. The difference is intended and is tested on its own."""
+    return start_row == 6 and board[start_row][start_col] == 'p' and board[7][start_col] == '-'
+
+
+def assert_same_position(game, baseline):
+    """Takes as parameters a ChessVar game and a baseline game and asserts that their positions agree."""
+    assert game.get_game_board() == baseline.get_game_board()
+    assert game.get_capture_counts() == baseline_capture_counts(baseline)
+    assert game.get_game_state() == baseline.get_game_state()
+    assert game.get_current_player() == baseline.get_current_player()
+    assert game.get_w_pawn_count() == baseline.get_w_pawn_count()
+    assert game.get_b_pawn_count() == baseline.get_b_pawn_count()
+
+
+def assert_same_validation(game, baseline):
+    """Takes as parameters a ChessVar game and a baseline game in the same position, and asserts that
+    is_valid_move agrees for every move from every occupied square. The checks are made on copies, since
+    the baseline counts the captures it checks."""
+    game, baseline = game.copy(), copy.deepcopy(baseline)
+    board = baseline.get_game_board()
+    for start in range(64):
+        start_row, start_col = divmod(start, 8)
+        if board[start_row][start_col] == '-' or is_rank_seven_pawn(board, start_row, start_col):
+            continue
+        for end in range(64):
+            end_row, end_col = divmod(end, 8)
+            expected = baseline_is_valid_move(baseline, start_row, start_col, end_row, end_col)
+            assert game.is_valid_move(start_row, start_col, end_row, end_col) == expected, \
+                (SQUARE_NAMES[start], SQUARE_NAMES[end], board)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_seeded_games_play_the_same(seed):
+    generator = random.Random(seed)
+    game, baseline = ChessVar(), BaselineChessVar()
+    for ply in range(300):
+        if game.get_game_state() != 'UNFINISHED':
+            break
+        moves = list(game.legal_moves())
+        if not moves:
+            break
+        if generator.random() < 0.2: # Most moves between random squares are rejected, by both, it is checked
+            move = (generator.choice(SQUARE_NAMES), generator.choice(SQUARE_NAMES))
+        else:
+            move = generator.choice(moves)
+        start = SQUARE_INDEX.get(move[0])
+        if start is not None and is_rank_seven_pawn(game.get_game_board(), *divmod(start, 8)):
+            break # The baseline can't move this pawn, as test_a_rank_seven_pawn_can_move checks
+        assert game.make_move(*move) == baseline.make_move(*move), move
+        assert_same_position(game, baseline)
+        if ply % 25 == 0:
+            assert_same_validation(game, baseline)
+    assert_same_validation(game, baseline)
+
+
+def test_a_won_game_rejects_further_moves():
+    game, baseline = ChessVar(), BaselineChessVar()
+    for move in (('e2', 'e4'), ('d7', 'd5'), ('e4', 'd5'), ('d8', 'd5'), ('b1', 'c3'), ('d5', 'd2'),
+                 ('e1', 'd2')):
+        assert game.make_move(*move) == baseline.make_move(*move), move
+        assert_same_position(game, baseline)
+    assert game.get_game_state() == 'WHITE_WON'
+    assert game.make_move('e8', 'd8') is False and baseline.make_move('e8', 'd8') is False
+
+
+def test_a_rank_seven_pawn_can_move():
+    # The white pawn on e7 can move up to e8 or capture the rook on d8. The baseline raises IndexError
+    # for any move of this pawn; the bitboard ChessVar intentionally allows them.
+    game = ChessVar.from_fen('3r3k/4P3/8/8/8/8/8/4K3 w 000000/000000 0 0')
+    baseline = BaselineChessVar()
+    baseline._ChessVar__game_board = game.get_game_board()
+    assert game.is_valid_move(6, 4, 7, 4) and game.is_valid_move(6, 4, 7, 3)
+    assert not game.is_valid_move(6, 4, 7, 5)
+    for end_col in (3, 4, 5):
+        with pytest.raises(IndexError):
+            baseline.is_valid_move(6, 4, 7, end_col)
+    assert game.get_destinations('e7') == ['d8', 'e8']
+    assert game.make_move('e7', 'd8')
+    assert game.get_capture_counts()['R'] == 1
+    assert game.get_destinations('d8') == [] # There is no promotion, so the pawn has no moves on the last row
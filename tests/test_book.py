@@ -0,0 +1,147 @@
+# Description: Tests of the opening book: a book built through several run files holds the same counts as
+# a naive count of the games, positions reached by different move orders are one entry, book moves are
+# chosen for either side, and a truncated book or a failed build leaves nothing behind.
+
+import os
+import random
+
+import pytest
+
+from chess_variant import book as book_module
+from chess_variant.book import BookBuilder, OpeningBook
+from chess_variant.chess_var import ChessVar, encode_move
+
+
+PLIES = 8
+
+
+def random_games(count, seed):
+    """Takes as parameters the number of games and a seed, and returns a list of games played with random
+    legal moves, each a list of moves. The first moves are drawn from a few openings, so the games share
+    positions, and some games transpose into the same position."""
+    generator = random.Random(seed)
+    openings = [[('g1', 'f3'), ('b8', 'c6'), ('b1', 'c3')], [('b1', 'c3'), ('b8', 'c6'), ('g1', 'f3')],
+                [('e2', 'e4'), ('e7', 'e5')], []]
+    games = []
+    for number in range(count):
+        game, moves = ChessVar(), []
+        for move in generator.choice(openings):
+            game.make_move(*move)
+            moves.append(move)
+        while game.get_game_state() == 'UNFINISHED' and len(moves) < 200:
+            move = generator.choice(list(game.legal_moves()))
+            game.make_move(*move)
+            moves.append(move)
+        games.append(moves)
+    return games
+
+
+def naive_counts(games):
+    """Takes as a parameter a list of games and returns a dictionary of the games, white wins and black wins
+    of each (position hash, encoded move) pair in their first plies, counting each game once for each pair."""
+    counts = {}
+    for moves in games:
+        game, keys = ChessVar(), set()
+        for ply, move in enumerate(moves):
+            if ply < PLIES:
+                keys.add((game.get_position_hash(), encode_move(*move)))
+            game.make_move(*move)
+        state = game.get_game_state()
+        for key in keys:
+            games_played, white_wins, black_wins = counts.get(key, (0, 0, 0))
+            counts[key] = (games_played + 1, white_wins + (state == 'WHITE_WON'), black_wins + (state == 'BLACK_WON'))
+    return counts
+
+
+@pytest.fixture
+def built_book(tmp_path):
+    """Builds a book of seeded random games with few enough records in memory to write several run files,
+    and returns a tuple of its path, the games and the statistics finish returned."""
+    path = str(tmp_path / 'opening.book')
+    games = random_games(40, seed=3)
+    with BookBuilder(path, plies=PLIES, memory_records=20, cache_size=30) as builder:
+        for moves in games:
+            assert builder.add_moves(moves) is not None
+        statistics = builder.finish()
+    return path, games, statistics
+
+
+def test_merged_counts_match_a_naive_count(built_book):
+    path, games, statistics = built_book
+    assert statistics['runs'] > 2 and statistics['games'] == len(games)
+    expected = naive_counts(games)
+    assert statistics['records'] == len(expected)
+    found = {}
+    with OpeningBook(path) as book:
+        assert len(book) == len(expected)
+        for position_hash, move in expected:
+            for book_move in book.probe(position_hash):
+                found[(position_hash, encode_move(*book_move.move))] = tuple(book_move[1:])
+    assert found == expected
+    assert os.listdir(os.path.dirname(path)) == ['opening.book'] # The run files and their directory are gone
+
+
+def test_transposed_positions_are_one_entry(built_book):
+    path, games, statistics = built_book
+    one, other = ChessVar(), ChessVar()
+    for move in (('g1', 'f3'), ('b8', 'c6'), ('b1', 'c3')):
+        one.make_move(*move)
+    for move in (('b1', 'c3'), ('b8', 'c6'), ('g1', 'f3')):
+        other.make_move(*move)
+    assert one.get_position_hash() == other.get_position_hash()
+    with OpeningBook(path) as book:
+        moves = book.probe_game(one)
+        assert moves and moves == book.probe_game(other)
+        reaching = sum(1 for game in games if game[:3] in ([('g1', 'f3'), ('b8', 'c6'), ('b1', 'c3')],
+                                                         [('b1', 'c3'), ('b8', 'c6'), ('g1', 'f3')]))
+        assert sum(book_move.games for book_move in moves) == reaching
+        assert book.probe(12345) == []
+
+
+def test_a_book_move_is_chosen_for_each_side(built_book):
+    path, games, statistics = built_book
+    game = ChessVar()
+    with OpeningBook(path) as book:
+        for player in ('White', 'Black'):
+            assert game.get_current_player() == player
+            scores = {book_move.move: score_for(book_move, player) for book_move in book.probe_game(game)}
+            move = book.choose_move(game)
+            assert move in set(game.legal_moves())
+            assert scores[move] == max(scores.values())
+            assert game.make_move(*move)
+        assert book.choose_move(game, min_games=len(games) + 1) is None
+
+
+def score_for(book_move, player):
+    """Takes as parameters a BookMove and the player to move, and returns the move's score for that player,
+    counting a win as 1 and any other result as half."""
+    wins, losses = book_move.white_wins, book_move.black_wins
+    if player == 'Black':
+        wins, losses = losses, wins
+    return (wins + (book_move.games - wins - losses) / 2) / book_move.games
+
+
+def test_a_truncated_book_is_rejected(built_book):
+    path, games, statistics = built_book
+    with open(path, 'rb') as book_file:
+        data = book_file.read()
+    for length in (len(data) - 1, book_module.HEADER_SIZE + 3, 5, 0):
+        with open(path, 'wb') as book_file:
+            book_file.write(data[:length])
+        with pytest.raises(ValueError):
+            OpeningBook(path)
+
+
+def test_a_failed_finish_leaves_no_temporary_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'opening.book')
+
+    def fail(*arguments):
+        raise OSError('disk full')
+
+    with BookBuilder(path, plies=PLIES) as builder:
+        builder.add_moves([('e2', 'e4'), ('e7', 'e5')])
+        monkeypatch.setattr(book_module.os, 'replace', fail)
+        with pytest.raises(OSError):
+            builder.finish()
+        assert os.path.exists(path + '.tmp')
+    assert os.listdir(str(tmp_path)) == []
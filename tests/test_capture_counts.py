@@ -0,0 +1,35 @@
+# Description: Tests that checking a move never changes the capture counts, and that make_move counts
+# each capture once.
+
+import pytest
+
+from chess_variant.chess_var import ChessVar
+
+
+FEN = '4k3/8/8/8/8/8/3q4/3QK3 w 000000/000000 0 0' # The white queen can capture the black queen
+
+
+def test_repeated_validation_changes_nothing():
+    game = ChessVar.from_fen(FEN)
+    before = (game.get_capture_counts(), game.get_position_hash(), game.to_bytes())
+    for repeat in range(20):
+        assert game.is_valid_move(0, 3, 1, 3)
+    assert (game.get_capture_counts(), game.get_position_hash(), game.to_bytes()) == before
+    assert game.get_game_state() == 'UNFINISHED'
+
+
+def test_make_move_counts_the_capture():
+    game = ChessVar.from_fen(FEN)
+    assert game.make_move('d1', 'd2')
+    assert game.get_capture_counts()['Q'] == 1
+    assert game.get_game_state() == 'WHITE_WON'
+    assert game.to_fen() == ChessVar.from_fen(game.to_fen()).to_fen()
+
+
+def test_an_impossible_count_raises_value_error():
+    game = ChessVar()
+    with pytest.raises(ValueError):
+        game.update_captured_piece('q', -1)
+    game.update_captured_piece('q')
+    with pytest.raises(ValueError):
+        game.update_captured_piece('q')
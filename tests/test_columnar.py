@@ -0,0 +1,136 @@
+# Description: Tests of the columnar store: games written and flushed are read back as they were played,
+# a chunk directory left by a stopped writer is not written over, long games fit the columns, and a
+# damaged manifest or column is rejected.
+
+import json
+import os
+import random
+
+import pytest
+
+numpy = pytest.importorskip('numpy') # Reading a store needs NumPy
+
+from chess_variant.chess_var import PIECES, SQUARE_INDEX, ChessVar, encode_move
+from chess_variant.columnar import GAME_STATES, MANIFEST, ColumnarReader, ColumnarWriter, read_manifest
+
+
+def random_game(seed):
+    """Takes as a parameter a seed and returns a tuple of a ChessVar game played with random legal moves until
+    it is won or 300 moves were made, and the list of its moves."""
+    generator = random.Random(seed)
+    game, moves = ChessVar(), []
+    while game.get_game_state() == 'UNFINISHED' and len(moves) < 300:
+        move = generator.choice(list(game.legal_moves()))
+        row, col = divmod(SQUARE_INDEX[move[1]], 8)
+        captured = game.get_game_board()[row][col]
+        game.make_move(*move)
+        moves.append((move, captured))
+    return game, moves
+
+
+def test_written_games_read_back(tmp_path):
+    directory = str(tmp_path / 'store')
+    games = [random_game(seed) for seed in range(7)]
+    with ColumnarWriter(directory, chunk_size=3) as writer:
+        for game, moves in games:
+            assert writer.write_game(game, [move for move, captured in moves]) == game.get_game_state()
+        assert writer.write_moves([('e2', 'e4'), ('e7', 'e2')]) == 'UNFINISHED'
+        assert writer.get_games_written() == 8
+
+    reader = ColumnarReader(directory)
+    assert len(reader) == 8 and reader.get_chunk_count() == 3
+    for number, (game, moves) in enumerate(games):
+        chunk_index, game_index = divmod(number, 3)
+        row = {column: values[game_index] for column, values in reader.load_chunk(chunk_index)['games'].items()}
+        assert row['game_number'] == number
+        assert GAME_STATES[row['outcome']] == game.get_game_state()
+        assert (row['white_turns'], row['black_turns']) == (game.get_white_turn_count(), game.get_black_turn_count())
+        assert row['first_illegal_move'] == -1
+        assert list(reader.game_moves(chunk_index, game_index)) == [encode_move(*move) for move, captured in moves]
+
+        captures = reader.game_captures(chunk_index, game_index)
+        expected = [(ply, captured) for ply, (move, captured) in enumerate(moves) if captured != '-']
+        assert [(int(ply), PIECES[piece]) for ply, piece in zip(captures['ply'], captures['captured_piece'])] == expected
+        if game.get_game_state() != 'UNFINISHED':
+            assert PIECES[row['deciding_piece']] == expected[-1][1]
+
+    last = reader.load_chunk(2)['games']
+    assert last['first_illegal_move'][1] == 1 and list(reader.game_moves(2, 1)) == [encode_move('e2', 'e4')]
+    assert reader.summary()['games'] == 8
+
+
+def test_a_game_its_moves_do_not_lead_to_is_not_written(tmp_path):
+    directory = str(tmp_path / 'store')
+    game, moves = random_game(0)
+    with ColumnarWriter(directory) as writer:
+        with pytest.raises(ValueError):
+            writer.write_game(game, [move for move, captured in moves[:-1]])
+        writer.write_moves([('e2', 'e4')])
+    reader = ColumnarReader(directory)
+    assert len(reader) == 1
+    assert list(reader.game_moves(0, 0)) == [encode_move('e2', 'e4')]
+    assert len(reader.load_column(0, 'captures', 'ply')) == 0
+
+
+def test_a_chunk_left_by_a_stopped_writer_is_not_written_over(tmp_path):
+    directory = tmp_path / 'store'
+    stale = directory / 'chunk_000000'
+    stale.mkdir(parents=True)
+    (stale / 'games.outcome.npy').write_bytes(b'left by a writer that stopped')
+    with ColumnarWriter(str(directory)) as writer:
+        writer.write_moves([('e2', 'e4')])
+    assert (stale / 'games.outcome.npy').read_bytes() == b'left by a writer that stopped'
+    assert [chunk['name'] for chunk in read_manifest(str(directory))['chunks']] == ['chunk_000001']
+    assert len(ColumnarReader(str(directory))) == 1
+
+
+def test_a_long_game_fits_the_columns(tmp_path):
+    directory = str(tmp_path / 'store')
+    shuffle = [('g1', 'f3'), ('g8', 'f6'), ('f3', 'g1'), ('f6', 'g8')] * 8300 # More plies than an int16 holds
+    moves = shuffle + [('e2', 'e4'), ('d7', 'd5'), ('e4', 'd5')]
+    with ColumnarWriter(directory) as writer:
+        writer.write_moves(moves)
+    reader = ColumnarReader(directory)
+    games = reader.load_chunk(0)['games']
+    assert games['white_turns'][0] == len(shuffle) // 2 + 2
+    assert list(reader.game_captures(0, 0)['ply']) == [len(moves) - 1]
+    assert reader.game_lengths()[0] == len(moves)
+
+
+@pytest.mark.parametrize('damage', [
+    lambda text: text[:len(text) // 2],
+    lambda text: '[]',
+    lambda text: text.replace('"format": 2', '"format": 99'),
+    lambda text: text.replace('"chunk_000000"', '"../elsewhere"'),
+    lambda text: text.replace('"games": 2', '"games": -1'),
+])
+def test_a_damaged_manifest_is_rejected(tmp_path, damage):
+    directory = str(tmp_path / 'store')
+    with ColumnarWriter(directory) as writer:
+        writer.write_moves([('e2', 'e4')])
+        writer.write_moves([('d2', 'd4')])
+    path = os.path.join(directory, MANIFEST)
+    with open(path) as file:
+        text = file.read()
+    damaged = damage(text)
+    assert damaged != text
+    with open(path, 'w') as file:
+        file.write(damaged)
+    with pytest.raises(ValueError):
+        ColumnarReader(directory)
+    with pytest.raises(ValueError):
+        ColumnarWriter(directory)
+
+
+def test_a_column_shorter_than_the_manifest_says_is_rejected(tmp_path):
+    directory = str(tmp_path / 'store')
+    with ColumnarWriter(directory) as writer:
+        writer.write_moves([('e2', 'e4')])
+    path = os.path.join(directory, MANIFEST)
+    with open(path) as file:
+        manifest = json.load(file)
+    manifest['chunks'][0]['moves'] = 5
+    with open(path, 'w') as file:
+        json.dump(manifest, file)
+    with pytest.raises(ValueError):
+        ColumnarReader(directory).load_column(0, 'moves', 'move')
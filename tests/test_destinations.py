@@ -0,0 +1,86 @@
+# Description: Tests that the destination cache, which is kept up to date move by move, always matches
+# destinations found from scratch: after quiet moves, captures, push and pop, and in copies that go on to
+# play different moves from the original.
+
+import random
+
+from chess_variant.chess_var import SQUARE_NAMES, ChessVar
+
+
+def cached_destinations(game):
+    """Takes as a parameter a ChessVar game and returns the destination bitboard of every square, from the
+    game's own cache."""
+    return [game.get_destination_board(square) for square in SQUARE_NAMES]
+
+
+def regenerated_destinations(game):
+    """Takes as a parameter a ChessVar game and returns the destination bitboard of every square, found from
+    scratch in a new game of the same position."""
+    return cached_destinations(ChessVar.from_fen(game.to_fen()))
+
+
+def play_random_move(game, generator):
+    """Takes as parameters a ChessVar game and a random number generator, makes a random legal move if the
+    game is unfinished, and returns True if one was made."""
+    moves = list(game.legal_moves())
+    if game.get_game_state() != 'UNFINISHED' or not moves:
+        return False
+    return game.make_move(*generator.choice(moves))
+
+
+def test_the_cache_follows_moves_and_captures():
+    for seed in range(6):
+        generator = random.Random(seed)
+        game = ChessVar()
+        cached_destinations(game) # Builds the cache, which the moves must then keep up to date
+        while play_random_move(game, generator):
+            if game.get_game_state() == 'UNFINISHED':
+                assert cached_destinations(game) == regenerated_destinations(game), game.to_fen()
+        assert sum(game.get_capture_counts().values()) > 0
+
+
+def test_the_cache_follows_push_and_pop():
+    generator = random.Random(7)
+    game = ChessVar()
+    cached_destinations(game)
+    for ply in range(60):
+        if not play_random_move(game, generator):
+            break
+        for move in sorted(game.legal_moves()):
+            game.push(move)
+            if game.get_game_state() == 'UNFINISHED':
+                assert cached_destinations(game) == regenerated_destinations(game), (game.to_fen(), move)
+            game.pop()
+        assert cached_destinations(game) == regenerated_destinations(game), game.to_fen()
+
+
+def test_copies_keep_their_own_cache():
+    generator = random.Random(11)
+    game = ChessVar()
+    for ply in range(10):
+        play_random_move(game, generator)
+    cached_destinations(game)
+    copies = [game.copy() for number in range(3)]
+    for number, copy in enumerate(copies):
+        copy_generator = random.Random(100 + number)
+        for ply in range(30):
+            if not play_random_move(copy, copy_generator):
+                break
+            if copy.get_game_state() == 'UNFINISHED':
+                assert cached_destinations(copy) == regenerated_destinations(copy), copy.to_fen()
+    assert cached_destinations(game) == regenerated_destinations(game) # The original is untouched by the copies
+    for ply in range(30):
+        if not play_random_move(game, generator):
+            break
+    if game.get_game_state() == 'UNFINISHED':
+        assert cached_destinations(game) == regenerated_destinations(game)
+
+
+def test_a_cache_built_after_moves_matches():
+    generator = random.Random(5)
+    game = ChessVar()
+    for ply in range(25):
+        play_random_move(game, generator)
+    copy = game.copy()
+    assert cached_destinations(copy) == regenerated_destinations(game)
+    assert game.get_destinations('zz') == [] and game.get_destinations('') == []
@@ -0,0 +1,75 @@
+# Description: Tests of the encoded-move path: encode_move and decode_move, the SQUARE_INDEX lookup, the
+# rejection of out-of-range and illegal encoded moves, and make_encoded_move giving the same results as
+# make_move for every possible move from positions along seeded games.
+
+import random
+
+import pytest
+
+from chess_variant.chess_var import MOVE_LIMIT, SQUARE_INDEX, SQUARE_NAMES, ChessVar, decode_move, encode_move
+
+
+def test_every_move_encodes_and_decodes():
+    for move in range(MOVE_LIMIT):
+        assert encode_move(*decode_move(move)) == move
+    assert encode_move('a1', 'h8') == 63 and encode_move('h8', 'a1') == 63 << 6
+
+
+def test_square_index_holds_only_the_board():
+    assert len(SQUARE_INDEX) == 64
+    assert all(SQUARE_NAMES[SQUARE_INDEX[name]] == name for name in SQUARE_NAMES)
+    assert SQUARE_INDEX['a1'] == 0 and SQUARE_INDEX['h1'] == 7 and SQUARE_INDEX['a2'] == 8
+    for square in ('', 'a0', 'a9', 'i1', 'A1', 'e22', ' e2', '2e', None):
+        assert square not in SQUARE_INDEX
+        with pytest.raises(ValueError):
+            encode_move(square, 'e4')
+
+
+@pytest.mark.parametrize('move', [-1, -4096, MOVE_LIMIT, MOVE_LIMIT + 1, 1 << 64])
+def test_an_out_of_range_move_is_rejected(move):
+    game = ChessVar()
+    assert game.make_encoded_move(move) is False
+    assert game.to_fen() == ChessVar().to_fen()
+
+
+@pytest.mark.parametrize('squares', [('e2', 'e2'), ('e2', 'e5'), ('e7', 'e5'), ('e4', 'e5'), ('b1', 'd2'),
+                                     ('a1', 'a3'), ('c1', 'e3')])
+def test_an_illegal_move_is_rejected(squares):
+    game = ChessVar()
+    assert game.make_encoded_move(encode_move(*squares)) is False
+    assert game.to_fen() == ChessVar().to_fen()
+    assert game.get_position_hash() == ChessVar().get_position_hash()
+
+
+def test_no_move_is_made_once_the_game_is_won():
+    game = ChessVar.from_fen('4k3/8/8/8/8/8/3q4/3QK3 w 000000/000000 0 0')
+    assert game.make_encoded_move(encode_move('d1', 'd2'))
+    assert game.get_game_state() == 'WHITE_WON'
+    fen = game.to_fen()
+    assert not any(game.make_encoded_move(move) for move in range(MOVE_LIMIT))
+    assert game.to_fen() == fen
+
+
+def test_every_encoded_move_matches_make_move():
+    for seed in range(3):
+        generator = random.Random(seed)
+        game = ChessVar()
+        for ply in range(120):
+            if ply % 30 == 0:
+                position_hash = game.get_position_hash()
+                for move in range(MOVE_LIMIT):
+                    encoded = game.copy()
+                    if encoded.make_encoded_move(move):
+                        by_name = game.copy()
+                        assert by_name.make_move(*decode_move(move)), (game.to_fen(), decode_move(move))
+                        assert encoded.to_fen() == by_name.to_fen()
+                        assert encoded.get_position_hash() == by_name.get_position_hash()
+                    else: # A rejected move changes nothing, so make_move can be tried on the game itself
+                        assert encoded.get_position_hash() == position_hash
+                        assert not game.make_move(*decode_move(move)), (game.to_fen(), decode_move(move))
+                legal = {encode_move(*move) for move in game.legal_moves()}
+                assert legal == set(game.legal_encoded_moves())
+            moves = list(game.legal_encoded_moves())
+            if game.get_game_state() != 'UNFINISHED' or not moves:
+                break
+            assert game.make_encoded_move(generator.choice(moves))
@@ -0,0 +1,48 @@
+# Description: Tests of the engine's scores for won and lost positions, which must give the distance to the
+# deciding capture wherever a position is met, and of the root searching the table's best move first.
+
+import random
+
+from chess_variant.chess_var import ChessVar
+from chess_variant.engine import WIN_SCORE, Engine, score_from_table, score_to_table
+
+
+def test_a_stored_win_is_counted_from_the_node():
+    # A win two plies below a node three plies from the root, stored there, and probed one ply from the root.
+    stored = score_to_table(WIN_SCORE - 5, 3)
+    assert stored == WIN_SCORE - 2
+    assert score_from_table(stored, 1) == WIN_SCORE - 3
+    assert score_from_table(score_to_table(-(WIN_SCORE - 6), 4), 2) == -(WIN_SCORE - 4)
+    assert score_from_table(score_to_table(150, 4), 0) == 150
+
+
+def test_the_capture_of_the_last_queen_is_found_in_one_ply():
+    game = ChessVar.from_fen('4k3/8/8/8/8/8/3q4/3QK3 w 000000/000000 0 0')
+    result = Engine().search(game, 4)
+    assert result.best_move in (('d1', 'd2'), ('e1', 'd2'))
+    assert result.score == WIN_SCORE - 1
+
+
+def test_an_engine_reused_through_a_game_scores_decided_positions_as_a_new_one_does():
+    for seed in range(3):
+        generator = random.Random(seed)
+        game, engine = ChessVar(), Engine()
+        for ply in range(30):
+            if game.get_game_state() != 'UNFINISHED':
+                break
+            reused, new = engine.search(game, 3), Engine().search(game, 3)
+            if abs(new.score) > WIN_SCORE - 100:
+                assert reused.score == new.score, game.to_fen()
+            moves = list(game.legal_moves())
+            if not moves:
+                break
+            game.make_move(*(generator.choice(moves) if ply % 2 else reused.best_move))
+
+
+def test_the_root_searches_the_table_move_first():
+    # Every quiet opening move scores the same at depth 1, so the first move searched is the one returned
+    game = ChessVar()
+    for move in (('h2', 'h3'), ('b1', 'a3'), ('g2', 'g4')):
+        engine = Engine()
+        engine.get_transposition_table().store(game.get_position_hash(), 0, 0, 'UPPER', move)
+        assert engine.search(game, max_depth=1).best_move == move
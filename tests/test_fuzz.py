@@ -0,0 +1,66 @@
+# Description: Tests of the fuzzer itself: seeded games find no difference between ChessVar and the
+# reference, the same seed always plays the same game, and a reference broken on purpose is caught and
+# its difference shrunk, both through fuzz and through the command line.
+
+import json
+import sys
+
+from chess_variant.fuzz import ReferenceGame, find_difference, fuzz, main, play_game, shrink
+
+
+def test_seeded_games_find_no_difference():
+    results = fuzz(6, seed=0, max_actions=120)
+    assert results['games'] == 6 and results['actions'] > 0
+    assert results['differences'] == []
+
+
+def test_a_seed_always_plays_the_same_game():
+    assert play_game(11, 80) == play_game(11, 80)
+    assert play_game(11, 80)[0] != play_game(12, 80)[0]
+
+
+def test_the_broken_reference_is_caught_and_shrunk():
+    results = fuzz(5, seed=0, max_actions=120, check_passed_square=True)
+    assert results['differences']
+    for found in results['differences']:
+        actions = [tuple(action) for action in found['actions']]
+        assert find_difference(actions, True, True) is not None
+        assert find_difference(actions, True, False) is None # Only the broken rule makes the difference
+        assert all(find_difference(actions[:index] + actions[index + 1:], True, True) is None
+                   for index in range(len(actions))) # No single action can be removed
+
+
+def test_shrink_keeps_only_what_is_needed():
+    assert shrink(list(range(40)), lambda candidate: 7 in candidate and 23 in candidate) == [7, 23]
+
+
+def test_the_reference_starts_as_chess_var_does():
+    reference = ReferenceGame()
+    assert reference.get_game_state() == 'UNFINISHED'
+    assert len(reference.legal_moves()) == 20
+
+
+def run_main(monkeypatch, capsys, *arguments):
+    """Takes as parameters pytest's monkeypatch and capsys fixtures and the command line arguments, runs the
+    fuzzer's main with them, and returns a tuple of its exit status and the JSON it printed."""
+    monkeypatch.setattr(sys, 'argv', ['fuzz.py'] + list(arguments))
+    status = main()
+    return status, json.loads(capsys.readouterr().out)
+
+
+def test_the_command_line_fuzzes_and_self_tests(monkeypatch, capsys):
+    status, results = run_main(monkeypatch, capsys, '--games', '3', '--max-actions', '80')
+    assert status == 0 and results['ok'] and results['games'] == 3
+    status, results = run_main(monkeypatch, capsys, '--games', '5', '--self-test')
+    assert status == 0 and results['ok'] and results['differences']
+
+
+def test_the_command_line_replays_actions(monkeypatch, capsys):
+    status, results = run_main(monkeypatch, capsys, '--replay', '[["move", "e2", "e4"], ["random", "e7", "e4"]]')
+    assert status == 0 and results['difference'] is None
+
+
+def test_worker_processes_give_the_same_results():
+    one = fuzz(4, seed=3, max_actions=60, check_moves=False, chunk_size=2)
+    many = fuzz(4, seed=3, workers=2, max_actions=60, check_moves=False, chunk_size=2)
+    assert (one['games'], one['actions'], one['differences']) == (many['games'], many['actions'], many['differences'])
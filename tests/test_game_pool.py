@@ -0,0 +1,48 @@
+# Description: Tests of the game pool, whose records must each belong to at most one game.
+
+import pytest
+
+from chess_variant.game_pool import GamePool
+
+
+def test_released_records_are_reused_once():
+    pool = GamePool()
+    first, second = pool.new_game(), pool.new_game()
+    first.release()
+    third, fourth = pool.new_game(), pool.new_game()
+    third.make_move('e2', 'e4')
+    assert fourth.get_current_player() == 'White' and second.get_current_player() == 'White'
+    assert len(pool) == 3
+
+
+def test_releasing_a_record_twice_raises_value_error():
+    pool = GamePool()
+    game = pool.new_game()
+    pool.release(0)
+    with pytest.raises(ValueError):
+        pool.release(0)
+    assert len(pool) == 0
+
+
+def test_a_released_record_cannot_be_loaded():
+    pool = GamePool()
+    pool.new_game()
+    pool.release(0)
+    for method in (pool.load, pool.get_game_state, pool.get_current_player, pool.copy_game):
+        with pytest.raises(ValueError):
+            method(0)
+    with pytest.raises(ValueError):
+        pool.load(5)
+
+
+def test_a_released_handle_cannot_be_released_or_used():
+    pool = GamePool()
+    game = pool.new_game()
+    game.release()
+    with pytest.raises(ValueError):
+        game.release()
+    with pytest.raises(ValueError):
+        game.make_move('e2', 'e4')
+    other = pool.new_game() # Reuses the record the first handle held
+    other.make_move('e2', 'e4')
+    assert other.get_current_player() == 'Black'
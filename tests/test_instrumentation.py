@@ -0,0 +1,28 @@
+# Description: Tests that enabling the instrumentation counts moves without changing what ChessVar returns.
+
+import pytest
+
+from chess_variant.chess_var import ChessVar
+from chess_variant.instrumentation import Instrumentation
+
+
+BAD_MOVES = [('e', 'e4'), ('e2', 'e'), ('ex', 'e4'), ('e2', 'e9'), ('i2', 'e4'), ('', ''), (None, 'e4')]
+
+
+@pytest.mark.parametrize('start_square, end_square', BAD_MOVES)
+def test_squares_that_are_not_on_the_board_are_rejected_as_before(start_square, end_square):
+    assert ChessVar().make_move(start_square, end_square) is False
+    with Instrumentation() as instrumentation:
+        assert ChessVar().make_move(start_square, end_square) is False
+    assert instrumentation.get_move_rejections()['invalid_square'] == 1
+
+
+def test_each_rejection_is_counted():
+    with Instrumentation() as instrumentation:
+        game = ChessVar()
+        game.make_move('e7', 'e5')  # Not the player's piece
+        game.make_move('e2', 'e5')  # Not a move a pawn can make
+        game.make_move('e2', 'e4')
+    assert instrumentation.get_move_rejections() == {'game_over': 0, 'invalid_square': 0, 'not_players_piece': 1,
+                                                     'invalid_move': 1}
+    assert not instrumentation.is_enabled()
@@ -0,0 +1,72 @@
+# Description: Tests of the Monte Carlo tree search player: seeded searches always return a legal move, a
+# move that wins at once is found, and the tree kept between searches still holds the visit counts of the
+# position reached after a move and a reply.
+
+import random
+
+from chess_variant.chess_var import ChessVar, decode_move
+from chess_variant.mcts import MonteCarloPlayer
+
+
+def test_the_chosen_move_is_always_legal():
+    for seed in range(3):
+        generator = random.Random(seed)
+        game = ChessVar()
+        with MonteCarloPlayer(batch_size=8, playout_limit=40, seed=seed) as player:
+            for ply in range(6):
+                fen = game.to_fen()
+                move = player.choose_move(game, playouts=40)
+                assert game.to_fen() == fen # The search leaves the game as it was
+                assert move in set(game.legal_moves()), (fen, move)
+                assert game.make_move(*move)
+                if game.get_game_state() != 'UNFINISHED':
+                    break
+                game.make_move(*generator.choice(list(game.legal_moves()))) # The opponent replies at random
+
+
+def test_a_move_that_wins_at_once_is_found():
+    for seed in range(3):
+        game = ChessVar.from_fen('4k3/8/8/8/8/8/3q4/3QK3 w 000000/000000 0 0')
+        with MonteCarloPlayer(batch_size=16, seed=seed) as player:
+            result = player.search(game, playouts=400)
+        assert result.best_move[1] == 'd2', result
+        assert result.win_rate == 1.0
+        assert game.make_move(*result.best_move) and game.get_game_state() == 'WHITE_WON'
+
+
+def test_a_finished_game_has_no_move():
+    game = ChessVar.from_fen('4k3/8/8/8/8/8/3q4/3QK3 w 000000/000000 0 0')
+    game.make_move('d1', 'd2')
+    with MonteCarloPlayer(seed=0) as player:
+        assert player.choose_move(game, playouts=20) is None
+
+
+def test_the_tree_is_reused_after_a_move_and_a_reply():
+    game = ChessVar()
+    with MonteCarloPlayer(batch_size=16, playout_limit=40, seed=4) as player:
+        first = player.search(game, playouts=600)
+        assert first.reused_visits == 0
+        child = next(node for node in player.get_root().children if decode_move(node.move) == first.best_move)
+        reply = max(child.children, key=lambda node: node.visits)
+        child_visits, reply_visits = child.visits, reply.visits
+        assert reply_visits > 0
+
+        game.make_move(*first.best_move)
+        assert player.search(game, playouts=0).reused_visits == child_visits
+        assert player.get_root() is child
+
+        game.make_move(*decode_move(reply.move))
+        second = player.search(game, playouts=100)
+        assert second.reused_visits == reply_visits
+        assert player.get_root() is reply and reply.parent is None
+        assert reply.visits == reply_visits + 100
+
+
+def test_an_unrelated_position_starts_a_new_tree():
+    game = ChessVar()
+    with MonteCarloPlayer(batch_size=8, playout_limit=20, seed=1) as player:
+        player.search(game, playouts=50)
+        for move in (('a2', 'a3'), ('a7', 'a6'), ('b2', 'b3')):
+            game.make_move(*move)
+        assert player.search(game, playouts=10).reused_visits == 0
+        assert player.get_root().visits == 10
@@ -0,0 +1,42 @@
+# Description: Tests of the parallel search, which must only compare the scores of searches of one depth and
+# must score every root move, including those of a worker that completed no depth.
+
+from chess_variant.chess_var import ChessVar
+from chess_variant.engine import WIN_SCORE
+from chess_variant.parallel import parallel_search
+
+
+FEN = '4k3/8/8/8/8/8/3q4/3QK3 w 000000/000000 0 0' # The white king can capture the black queen and win
+
+
+# The white king has five moves. With two workers, the first share (e1d1, e1d2, e1f2) holds the winning
+# capture and needs three nodes to complete depth 1, and the second (e1f1, e1e2) needs two.
+KING_FEN = '4k3/8/8/8/8/8/3q4/4K3 w 000000/000000 0 0'
+
+
+def test_a_small_node_budget_still_finds_the_win():
+    move, score, depth, statistics = parallel_search(ChessVar.from_fen(FEN), 4, node_limit=3)
+    assert move == ('e1', 'd2')
+    assert score == WIN_SCORE - 1
+    assert depth >= 1
+
+
+def test_scores_are_compared_at_one_depth():
+    move, score, depth, statistics = parallel_search(ChessVar(), 2, max_depth=2, node_limit=200)
+    assert depth >= 1
+    assert move in list(ChessVar().legal_moves())
+
+
+def test_the_share_of_a_worker_that_completed_no_depth_is_searched_again():
+    game = ChessVar.from_fen(KING_FEN)
+    moves = list(game.legal_moves())
+    assert moves[0::2] == [('e1', 'd1'), ('e1', 'd2'), ('e1', 'f2')]
+    move, score, depth, statistics = parallel_search(game, 2, node_limit=3) # Only the second share completes depth 1
+    assert move == ('e1', 'd2')
+    assert score == WIN_SCORE - 1
+    assert depth == 1
+
+
+def test_every_share_is_searched_again_when_no_worker_completed_a_depth():
+    move, score, depth, statistics = parallel_search(ChessVar.from_fen(KING_FEN), 2, node_limit=1)
+    assert (move, score, depth) == (('e1', 'd2'), WIN_SCORE - 1, 1)
@@ -0,0 +1,23 @@
+# Description: Tests of the FEN-like and packed binary position formats.
+
+import pytest
+
+from chess_variant.chess_var import POSITION_SIZE, ChessVar
+
+
+def test_a_packed_position_round_trips():
+    game = ChessVar()
+    game.make_move('e2', 'e4')
+    game.make_move('d7', 'd5')
+    game.make_move('e4', 'd5')
+    data = bytes(3) + game.to_bytes()
+    assert len(data) == 3 + POSITION_SIZE
+    assert ChessVar.from_bytes(data, 3).to_fen() == game.to_fen()
+    assert ChessVar.from_fen(game.to_fen()).to_bytes() == game.to_bytes()
+
+
+@pytest.mark.parametrize('size, offset', [(0, 0), (POSITION_SIZE - 1, 0), (POSITION_SIZE, 1), (POSITION_SIZE, -1)])
+def test_a_short_buffer_raises_value_error(size, offset):
+    data = (ChessVar().to_bytes() * 2)[:size]
+    with pytest.raises(ValueError):
+        ChessVar.from_bytes(data, offset)
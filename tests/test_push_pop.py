@@ -0,0 +1,71 @@
+# Description: Tests that pop takes back exactly what push did, and that a move made with make_move can't
+# leave pop with a stale entry to take back.
+
+import random
+
+from chess_variant.chess_var import SQUARE_NAMES, ChessVar, encode_move
+
+
+def snapshot(game):
+    """Takes as a parameter a ChessVar game and returns everything pop must restore: the position, its hash,
+    the capture counts, the turn counts, the game state, the current player and the destinations of every
+    square."""
+    return (game.to_fen(), game.get_position_hash(), game.get_capture_counts(), game.get_white_turn_count(),
+            game.get_black_turn_count(), game.get_game_state(), game.get_current_player(),
+            [game.get_destinations(square) for square in SQUARE_NAMES])
+
+
+def test_pop_takes_back_quiet_moves_and_captures():
+    generator = random.Random(3)
+    game = ChessVar()
+    game.get_destinations('e2') # Builds the destination cache, so pop has to keep it up to date
+    snapshots = []
+    while game.get_game_state() == 'UNFINISHED' and len(snapshots) < 80:
+        snapshots.append(snapshot(game))
+        assert game.push(generator.choice(list(game.legal_moves())))
+    captures = sum(game.get_capture_counts().values())
+    assert captures > 0
+    while snapshots:
+        assert game.pop() is not None
+        assert snapshot(game) == snapshots.pop()
+    assert game.pop() is None
+
+
+def test_pop_takes_back_a_winning_capture():
+    game = ChessVar.from_fen('4k3/8/8/8/8/8/3q4/3QK3 w 000000/000000 3 3')
+    before = snapshot(game)
+    assert game.push(('d1', 'd2'))
+    assert game.get_game_state() == 'WHITE_WON'
+    assert game.get_capture_counts()['Q'] == 1
+    assert not game.push(('e8', 'e7')) # Nothing can be pushed once the game is won
+    assert game.pop() == ('d1', 'd2')
+    assert snapshot(game) == before
+    assert game.get_position_hash() == ChessVar.from_fen(game.to_fen()).get_position_hash()
+
+
+def test_make_move_after_push_leaves_nothing_to_pop():
+    game = ChessVar()
+    assert game.push(('e2', 'e4'))
+    assert game.make_move('e7', 'e5')
+    after = snapshot(game)
+    assert game.pop() is None
+    assert snapshot(game) == after
+    assert game.get_current_player() == 'White'
+    assert game.get_position_hash() == ChessVar.from_fen(game.to_fen()).get_position_hash()
+
+
+def test_make_encoded_move_after_push_leaves_nothing_to_pop():
+    game = ChessVar()
+    assert game.push(('e2', 'e4'))
+    assert game.make_encoded_move(encode_move('e7', 'e5'))
+    assert game.pop() is None
+    assert game.to_fen() == 'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w 000000/000000 1 1'
+
+
+def test_a_rejected_move_keeps_the_pushed_moves():
+    game = ChessVar()
+    assert game.push(('e2', 'e4'))
+    assert not game.make_move('e7', 'e3')
+    assert not game.make_encoded_move(encode_move('a1', 'a8'))
+    assert game.pop() == ('e2', 'e4')
+    assert game.to_fen() == ChessVar().to_fen()
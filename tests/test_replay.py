@@ -0,0 +1,31 @@
+# Description: Tests of reading game log lines, which must report a bad line rather than raise.
+
+import pytest
+
+from chess_variant.book import BookBuilder
+from chess_variant.replay import parse_game, replay_lines
+
+
+BAD_LINES = ['[1]', '[null]', '[["e2"]]', '[["e2", "e4", "e5"]]', '[["e2", 4]]', '[1', 'e2e4 e7']
+
+
+@pytest.mark.parametrize('line', BAD_LINES)
+def test_a_bad_line_raises_value_error(line):
+    with pytest.raises(ValueError):
+        parse_game(line)
+
+
+def test_good_lines_are_parsed():
+    assert parse_game('[["e2", "e4"], ["e7", "e5"]]') == [('e2', 'e4'), ('e7', 'e5')]
+    assert parse_game('e2e4 e7-e5') == [('e2', 'e4'), ('e7', 'e5')]
+
+
+def test_a_bad_line_is_reported_as_an_illegal_first_move():
+    results = list(replay_lines(BAD_LINES + ['e2e4']))
+    assert [result.first_illegal_move for result in results] == [0] * len(BAD_LINES) + [None]
+
+
+def test_the_book_builder_skips_a_bad_line(tmp_path):
+    builder = BookBuilder(str(tmp_path / 'opening.book'))
+    assert builder.add_log(BAD_LINES + ['e2e4 e7e5']) == 1
+    builder.finish()
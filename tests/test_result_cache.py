@@ -0,0 +1,76 @@
+# Description: Tests of the result cache and of how it chooses the positions one capture from winning.
+
+import random
+import struct
+import tracemalloc
+
+from chess_variant.chess_var import ChessVar
+from chess_variant.result_cache import (COUNT_BLOCK, HEADER_SIZE, RECORD_FORMAT, ResultCache, build,
+                                        is_one_capture_from_winning, near_win_positions, opening_positions)
+
+
+def test_the_starting_position_is_not_one_capture_from_winning():
+    assert not is_one_capture_from_winning(ChessVar())
+
+
+def test_a_capture_of_the_last_queen_is_one_capture_from_winning():
+    game = ChessVar.from_fen('4k3/8/8/8/8/8/3q4/3QK3 w 000000/000000 0 0')
+    assert is_one_capture_from_winning(game)
+
+
+def test_the_player_not_on_move_counts_too():
+    game = ChessVar.from_fen('4k3/8/8/8/8/8/3q4/3QK3 b 000000/000000 0 0')
+    assert is_one_capture_from_winning(game)
+
+
+def test_a_threat_to_a_type_with_pieces_left_does_not_count():
+    game = ChessVar.from_fen('4k3/8/8/8/8/8/4p3/4K3 w 000000/000000 0 0') # Black has seven pawns still to lose
+    assert not is_one_capture_from_winning(game)
+
+
+def test_near_win_positions_are_filtered():
+    for position in near_win_positions(5, seed=1):
+        assert is_one_capture_from_winning(ChessVar.from_bytes(position))
+
+
+def test_create_replaces_a_cache_without_cutting_it_short(tmp_path):
+    path = str(tmp_path / 'results.cache')
+    with ResultCache.create(path, 16) as cache:
+        cache.store(7, 3, 42, 'EXACT', ('e2', 'e4'))
+    with ResultCache(path) as old_cache:
+        ResultCache.create(path, 64).close()
+        assert old_cache.probe(7) == (7, 3, 42, 'EXACT', ('e2', 'e4')) # The old file is untouched
+    with ResultCache(path) as new_cache:
+        assert new_cache.get_size() == 64 and new_cache.probe(7) is None
+
+
+def test_build_stores_every_position(tmp_path):
+    path = str(tmp_path / 'results.cache')
+    positions = opening_positions(1)
+    results = build(path, 1 << 10, positions, 1)
+    assert results['stored'] == len(positions)
+    assert list(tmp_path.iterdir()) == [tmp_path / 'results.cache']
+    with ResultCache(path) as cache:
+        assert cache.probe_game(ChessVar()) is not None
+
+
+def test_len_counts_filled_slots_without_copying_the_file(tmp_path):
+    path = str(tmp_path / 'results.cache')
+    slots = COUNT_BLOCK * 16 + 5 # A last block shorter than the others
+    generator = random.Random(2)
+    with ResultCache.create(path, slots) as cache:
+        assert len(cache) == 0
+        stored = sum(cache.store(generator.getrandbits(64), 1, 0, 'LOWER') for entry in range(3000))
+        cache.store(slots - 1, 1, 0, 'EXACT') # The very last slot, if it's free
+    with ResultCache(path) as cache:
+        tracemalloc.start()
+        try:
+            filled = len(cache)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        with open(path, 'rb') as cache_file:
+            records = cache_file.read()[HEADER_SIZE:]
+        expected = sum(1 for record in struct.iter_unpack(RECORD_FORMAT, records) if record[4])
+    assert filled == expected and stored <= filled <= stored + 1
+    assert peak < len(records) // 4
@@ -0,0 +1,123 @@
+# Description: Tests of the game server over localhost: two clients play a game, a spectator receives every
+# move, illegal and out-of-turn moves are rejected, and the load client copes with a server that goes away
+# while one of its requests has timed out.
+
+import asyncio
+import json
+
+from chess_variant.server import GameServer, LoadClient, run_load
+
+
+TIMEOUT = 5 # Seconds a test waits for any one reply
+
+
+async def send(writer, message):
+    """Takes as parameters a stream writer and a message, a dictionary, and sends it as one line of JSON."""
+    writer.write((json.dumps(message) + '\n').encode())
+    await writer.drain()
+
+
+async def receive(reader):
+    """Takes as a parameter a stream reader and returns the next message from the server."""
+    return json.loads(await asyncio.wait_for(reader.readline(), TIMEOUT))
+
+
+async def request(reader, writer, message):
+    """Takes as parameters the streams of a connection and a request, sends it and returns its reply. Move
+    events that arrive first are skipped."""
+    await send(writer, message)
+    while True:
+        reply = await receive(reader)
+        if 'event' not in reply:
+            return reply
+
+
+async def play_a_game():
+    """Starts a server on localhost, plays a few moves between a white and a black client with a spectator
+    watching, and returns the replies and messages seen, keyed by what they show."""
+    server = await GameServer().serve('127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    white, black, spectator = [await asyncio.open_connection('127.0.0.1', port) for connection in range(3)]
+    seen = {}
+    try:
+        created = await request(*white, {'op': 'new', 'color': 'white', 'id': 1})
+        game = created['game']
+        seen['created'] = created
+        seen['joined'] = await request(*black, {'op': 'join', 'game': game, 'color': 'black'})
+        seen['taken'] = await request(*spectator, {'op': 'join', 'game': game, 'color': 'black'})
+        seen['watched'] = await request(*spectator, {'op': 'watch', 'game': game})
+
+        seen['out_of_turn'] = await request(*black, {'op': 'move', 'game': game, 'from': 'e7', 'to': 'e5'})
+        seen['first'] = await request(*white, {'op': 'move', 'game': game, 'from': 'e2', 'to': 'e4'})
+        seen['illegal'] = await request(*black, {'op': 'move', 'game': game, 'from': 'e7', 'to': 'e3'})
+        seen['off_board'] = await request(*black, {'op': 'move', 'game': game, 'from': 'e7', 'to': 'e9'})
+        seen['second'] = await request(*black, {'op': 'move', 'game': game, 'from': 'd7', 'to': 'd5'})
+        seen['capture'] = await request(*white, {'op': 'move', 'game': game, 'from': 'e4', 'to': 'd5'})
+        seen['spectator_events'] = [await receive(spectator[0]) for event in range(3)]
+        seen['not_an_object'] = await request(*white, 'not an object')
+        seen['no_game'] = await request(*white, {'op': 'move', 'game': 99, 'from': 'a2', 'to': 'a3'})
+    finally:
+        for reader, writer in (white, black, spectator):
+            writer.close()
+        server.close()
+        await server.wait_closed()
+    return seen
+
+
+def test_two_clients_play_and_a_spectator_sees_every_move():
+    seen = asyncio.run(play_a_game())
+    assert seen['created']['ok'] and seen['created']['id'] == 1
+    assert seen['joined']['ok'] and seen['joined']['fen'].startswith('rnbqkbnr/pppppppp/')
+    assert seen['taken'] == {'ok': False, 'error': 'color not available'}
+    assert seen['watched']['ok']
+    assert seen['out_of_turn'] == {'ok': False, 'error': 'not your turn'}
+    assert seen['first'] == {'ok': True, 'state': 'UNFINISHED'}
+    assert seen['illegal'] == {'ok': False, 'error': 'illegal move'}
+    assert seen['off_board'] == {'ok': False, 'error': 'illegal move'}
+    assert seen['second']['ok'] and seen['capture']['ok']
+    events = seen['spectator_events']
+    assert [(event['player'], event['from'], event['to']) for event in events] == \
+        [('white', 'e2', 'e4'), ('black', 'd7', 'd5'), ('white', 'e4', 'd5')]
+    assert all(event['event'] == 'move' and event['state'] == 'UNFINISHED' for event in events)
+    assert seen['not_an_object'] == {'ok': False, 'error': 'a request must be a JSON object'}
+    assert not seen['no_game']['ok']
+
+
+def test_the_load_generator_plays_its_games():
+    results = asyncio.run(run_load('127.0.0.1', None, games=4, connections=2, spectators=1, max_plies=20, seed=1))
+    assert results['moves'] > 0
+    assert results['events_per_spectator'] == [results['moves']]
+
+
+async def lose_the_server():
+    """Connects a LoadClient to a server that never replies, lets one request time out, and then has the
+    server close the connection while a second request waits. Returns the second request's exception."""
+    connected = asyncio.Event()
+
+    async def silent(reader, writer):
+        connected.set()
+        await reader.readline()
+        await reader.readline()
+        writer.close()
+
+    server = await asyncio.start_server(silent, '127.0.0.1', 0)
+    client = LoadClient(*await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1]))
+    try:
+        await connected.wait()
+        try:
+            await asyncio.wait_for(client.request({'op': 'new'}), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await asyncio.wait_for(client.request({'op': 'new'}), TIMEOUT)
+        except ConnectionError as error:
+            return error
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+    return None
+
+
+def test_a_lost_connection_fails_the_waiting_request_after_a_timeout():
+    assert isinstance(asyncio.run(lose_the_server()), ConnectionError)
@@ -0,0 +1,131 @@
+# Description: A stress test of SharedGame. One writer thread plays seeded games through make_move while
+# reader threads take snapshots, with Python switching threads far more often than usual so that reads
+# land in the middle of moves. Every snapshot must be consistent, versions must never go backwards, and
+# boards and counts handed to a reader must not be tied to the shared game.
+
+import random
+import sys
+import threading
+
+import pytest
+
+from chess_variant.chess_var import ChessVar
+from chess_variant.shared_game import SharedGame, is_consistent
+
+
+READERS = 4
+GAMES = 8 # Games played one after another by the writer in each test
+MAX_PLIES = 300
+
+
+@pytest.fixture
+def fast_switching():
+    """Makes Python switch threads every few microseconds for the length of a test."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def play(current, seeds, finished):
+    """Takes as parameters a list holding the SharedGame being played, the seeds of the games to play and an
+    event. For each seed, the method shares a new game in the list and plays random legal moves in it through
+    make_move until it is won or MAX_PLIES moves were made. The event is set when all are played."""
+    try:
+        for seed in seeds:
+            generator = random.Random(seed)
+            shared = current[0] = SharedGame()
+            for ply in range(MAX_PLIES):
+                snapshot = shared.snapshot()
+                moves = snapshot.legal_moves()
+                if snapshot.get_game_state() != 'UNFINISHED' or not moves:
+                    break
+                assert shared.make_move(*generator.choice(moves))
+    finally:
+        finished.set()
+
+
+def read(current, finished, failures):
+    """Takes as parameters a list holding the SharedGame being played, the event set when the writer is done
+    and a list, and reads snapshots until the writer is done, adding a description of each problem found to
+    the list. The boards and capture counts read are changed afterwards, which must change nothing shared.
+    The method returns the number of snapshots read."""
+    last_shared, last_version = None, -1
+    reads = 0
+    while not finished.is_set():
+        shared = current[0]
+        snapshot = shared.snapshot()
+        version = snapshot.get_version()
+        if shared is last_shared and version < last_version:
+            failures.append('version went from ' + str(last_version) + ' to ' + str(version))
+        last_shared, last_version = shared, version
+        reads += 1
+        if not snapshot.is_consistent():
+            failures.append('inconsistent snapshot at version ' + str(version))
+        if version != snapshot.get_white_turn_count() + snapshot.get_black_turn_count():
+            failures.append('version ' + str(version) + ' does not match the turn counts')
+
+        fen = snapshot.to_fen()
+        board = snapshot.get_game_board()
+        board[0][0], board[7][7] = 'q', 'Q'
+        counts = snapshot.get_capture_counts()
+        counts['Q'] = 99
+        shared.get_game_board()[3][3] = 'k'
+        if snapshot.to_fen() != fen:
+            failures.append('changing a returned board changed the snapshot at version ' + str(version))
+    return reads
+
+
+@pytest.mark.parametrize('seed', range(2))
+def test_readers_only_see_complete_moves(seed, fast_switching):
+    seeds = range(seed * GAMES, (seed + 1) * GAMES)
+    current = [SharedGame()]
+    finished = threading.Event()
+    failures, reads = [], []
+    readers = [threading.Thread(target=lambda: reads.append(read(current, finished, failures)))
+               for reader in range(READERS)]
+    for reader in readers:
+        reader.start()
+    writer = threading.Thread(target=play, args=(current, seeds, finished))
+    writer.start()
+    writer.join()
+    for reader in readers:
+        reader.join()
+
+    assert failures == []
+    assert len(reads) == READERS and sum(reads) > 0
+
+    # The last shared game is the game the writer's moves make, untouched by the readers' changes.
+    shared = current[0]
+    replayed = ChessVar()
+    generator = random.Random(seeds[-1])
+    for ply in range(shared.get_version()):
+        assert replayed.make_move(*generator.choice(list(replayed.legal_moves())))
+    assert shared.get_version() > 0
+    assert is_consistent(shared.snapshot())
+    assert shared.snapshot().to_fen() == replayed.to_fen()
+
+
+def test_returned_boards_and_counts_are_copies():
+    shared = SharedGame()
+    shared.make_move('e2', 'e4')
+    fen = shared.snapshot().to_fen()
+    shared.get_game_board()[1][0] = '-'
+    shared.get_capture_counts()['p'] = 8
+    snapshot = shared.snapshot()
+    snapshot.get_game_board()[6][0] = '-'
+    snapshot.to_chess_var().make_move('e7', 'e5')
+    assert shared.snapshot().to_fen() == fen
+    assert shared.get_capture_counts()['p'] == 0
+    assert shared.make_move('e7', 'e5')
+    assert snapshot.to_fen() == fen # An old snapshot keeps its position after later moves
+    assert shared.get_version() == 2
+
+
+def test_a_game_passed_in_is_copied():
+    game = ChessVar()
+    shared = SharedGame(game)
+    game.make_move('e2', 'e4')
+    assert shared.snapshot().to_fen() == ChessVar().to_fen()
+    assert shared.make_move('d2', 'd4')
+    assert game.get_game_board()[3][3] == '-'
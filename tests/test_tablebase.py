@@ -0,0 +1,30 @@
+# Description: Tests of the tablebase generator. A three piece configuration and the smaller ones its
+# captures lead to are generated once, and the results of its positions are checked against their moves.
+
+import pytest
+
+from chess_variant.tablebase import NO_LOSS, check_table, classify_positions, generate, parse_counts
+
+
+PIECES = 'KRk'
+COUNTS = parse_counts('000000/000000')
+
+
+@pytest.fixture(scope='module')
+def directory(tmp_path_factory):
+    """Generates the tables of the configuration and returns the directory holding them."""
+    directory = str(tmp_path_factory.mktemp('tables'))
+    generate(PIECES, COUNTS, directory)
+    return directory
+
+
+def test_capture_positions_agree_with_their_moves(directory):
+    assert check_table(PIECES, COUNTS, directory) == []
+
+
+def test_positions_with_a_winning_capture_are_never_lost(directory):
+    first, last = 0, 64 ** 2 * 8 # Every position with white to move and the white king on the first row
+    move_counts, loss_floors, decided = classify_positions(PIECES, COUNTS, directory, first, last)
+    wins = [index for index, plies in decided if plies > 0]
+    assert wins
+    assert all(loss_floors[index - first] == NO_LOSS for index in wins)